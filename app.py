@@ -12,12 +12,33 @@
 ========================================================
 """
 
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from collections import Counter, OrderedDict, deque
+from contextlib import asynccontextmanager
+import asyncio
+import bisect
+import contextvars
+import csv
+import gzip
+import hashlib
+import importlib.util
 import httpx
+import io
+import json
+import logging
+import math
 import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+import urllib.parse
+import numpy as np
 from datetime import datetime, timedelta
+from email.utils import formatdate, parsedate_to_datetime
 
 # ============================================
 #  API 키 (Render 환경변수)
@@ -28,8 +49,882 @@ DATA_GO_KR_KEY    = os.getenv("DATA_GO_KR_KEY", "")      # ASOS + TAAS 공용
 SEOUL_DATA_KEY    = os.getenv("SEOUL_DATA_KEY", "")        # 서울 열린데이터광장
 ITS_CCTV_KEY      = os.getenv("ITS_CCTV_KEY", "")
 
-app = FastAPI(title="기능성 포장 플랫폼 API", version="1.1")
+# 업스트림 기본 주소 (부하 테스트 시 mock_upstream.py 등 로컬 대역 서버로 교체)
+VWORLD_BASE_URL     = os.getenv("VWORLD_BASE_URL", "https://api.vworld.kr").rstrip("/")
+DATA_GO_KR_BASE_URL = os.getenv("DATA_GO_KR_BASE_URL", "http://apis.data.go.kr").rstrip("/")
+SEOUL_DATA_BASE_URL = os.getenv("SEOUL_DATA_BASE_URL", "http://openapi.seoul.go.kr:8088").rstrip("/")
+ITS_BASE_URL        = os.getenv("ITS_BASE_URL", "https://openapi.its.go.kr:9443").rstrip("/")
+ANTHROPIC_BASE_URL  = os.getenv("ANTHROPIC_BASE_URL", "https://api.anthropic.com").rstrip("/")
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STORE_DIR = os.getenv("STORE_DIR", os.path.join(BASE_DIR, "store"))   # 로컬 캐시/수집 데이터 저장 위치
+
+# ============================================
+#  계측 (엔드포인트/업스트림 지연 히스토그램, Server-Timing, 샘플링 프로파일러)
+# ============================================
+log = logging.getLogger("pavement")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)   # 초
+HEALTH_WINDOW   = int(os.getenv("HEALTH_WINDOW", "50"))            # 업스트림 상태 판정에 쓰는 최근 호출 수
+HEALTH_IDLE     = float(os.getenv("HEALTH_IDLE_SECONDS", "600"))   # 이 시간 동안 호출이 없으면 idle
+HEALTH_DOWN_AFTER = 5                                              # 연속 실패 횟수 → down
+
+class Histogram:
+    """Prometheus 누적 버킷 히스토그램"""
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.sum, self.count = 0.0, 0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def lines(self, name: str, labels: str) -> list:
+        out, acc = [], 0
+        for le, n in zip(LATENCY_BUCKETS + ("+Inf",), self.counts):
+            acc += n
+            out.append(f'{name}_bucket{{{labels},le="{le}"}} {acc}')
+        return out + [f"{name}_sum{{{labels}}} {self.sum:.6f}", f"{name}_count{{{labels}}} {self.count}"]
+
+def _label(v) -> str:
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class Metrics:
+    """엔드포인트(라우트 템플릿 기준) / 업스트림별 요청 수, 지연, 오류, 응답 바이트"""
+    def __init__(self):
+        self.http = {}       # (method, route) -> {"status": {code: n}, "hist", "bytes"}
+        self.upstream = {}   # name -> {...}
+
+    def observe_http(self, method: str, route: str, status: int, seconds: float, nbytes: int):
+        m = self.http.get((method, route))
+        if m is None:
+            m = self.http[(method, route)] = {"status": {}, "hist": Histogram(), "bytes": 0}
+        m["status"][status] = m["status"].get(status, 0) + 1
+        m["hist"].observe(seconds)
+        m["bytes"] += nbytes
+
+    def _up(self, name: str) -> dict:
+        u = self.upstream.get(name)
+        if u is None:
+            u = self.upstream[name] = {"status": {}, "timeouts": 0, "errors": 0, "cancelled": 0, "bytes": 0, "hist": Histogram(),
+                                       "recent": deque(maxlen=HEALTH_WINDOW), "consecutive_failures": 0,
+                                       "last_ok": None, "last_error": None, "last_error_at": None}
+        return u
+
+    def observe_upstream(self, name: str, seconds: float, status: int = None, error: str = None):
+        """status: HTTP 상태 코드, error: "timeout" / "cancelled" / 예외 유형 (응답을 못 받은 경우)"""
+        u = self._up(name)
+        if error == "cancelled":   # 호출자 쪽 타임아웃/연결 종료 - 업스트림 상태 판정에서는 제외
+            u["cancelled"] += 1
+            return
+        key = status if error is None else ("timeout" if error == "timeout" else "error")
+        u["status"][key] = u["status"].get(key, 0) + 1
+        u["hist"].observe(seconds)
+        ok = error is None and status < 500 and status != 429
+        if error == "timeout": u["timeouts"] += 1
+        elif not ok: u["errors"] += 1
+        now = time.time()
+        u["recent"].append((now, ok, seconds))
+        if ok:
+            u["consecutive_failures"], u["last_ok"] = 0, now
+        else:
+            u["consecutive_failures"] += 1
+            u["last_error"], u["last_error_at"] = error or f"HTTP {status}", now
+
+    def health(self, name: str) -> dict:
+        """최근 HEALTH_WINDOW 건 기준 상태 - ok / degraded / down / idle"""
+        u = self.upstream.get(name)
+        if not u or not u["recent"]:
+            return {"state": "idle", "requests": 0}
+        recent = list(u["recent"])
+        lat = sorted(r[2] for r in recent)
+        error_rate = sum(1 for r in recent if not r[1]) / len(recent)
+        p95 = lat[int(0.95 * (len(lat) - 1))]
+        if u["consecutive_failures"] >= HEALTH_DOWN_AFTER: state = "down"
+        elif error_rate >= 0.2 or p95 >= UPSTREAM_CONFIG.get(name, {}).get("timeout", 30.0) * 0.5: state = "degraded"
+        elif time.time() - recent[-1][0] > HEALTH_IDLE: state = "idle"
+        else: state = "ok"
+        stamp = lambda t: datetime.fromtimestamp(t).isoformat(timespec="seconds") if t else None
+        return {"state": state, "requests": sum(u["status"].values()), "window": len(recent), "error_rate": round(error_rate, 3),
+                "p50_ms": round(lat[len(lat) // 2] * 1000, 1), "p95_ms": round(p95 * 1000, 1), "timeouts": u["timeouts"],
+                "consecutive_failures": u["consecutive_failures"], "last_ok": stamp(u["last_ok"]),
+                "last_error": u["last_error"], "last_error_at": stamp(u["last_error_at"])}
+
+    def render(self) -> str:
+        """Prometheus 텍스트 형식"""
+        out = ["# TYPE pavement_http_requests_total counter"]
+        for (method, route), m in sorted(self.http.items()):
+            out += [f'pavement_http_requests_total{{method="{method}",route="{_label(route)}",status="{s}"}} {n}' for s, n in sorted(m["status"].items())]
+        out.append("# TYPE pavement_http_request_duration_seconds histogram")
+        for (method, route), m in sorted(self.http.items()):
+            out += m["hist"].lines("pavement_http_request_duration_seconds", f'method="{method}",route="{_label(route)}"')
+        out.append("# TYPE pavement_http_response_bytes_total counter")
+        out += [f'pavement_http_response_bytes_total{{method="{method}",route="{_label(route)}"}} {m["bytes"]}' for (method, route), m in sorted(self.http.items())]
+        out.append("# TYPE pavement_upstream_requests_total counter")
+        for name, u in sorted(self.upstream.items()):
+            out += [f'pavement_upstream_requests_total{{upstream="{name}",status="{s}"}} {n}' for s, n in sorted(u["status"].items(), key=lambda kv: str(kv[0]))]
+        out.append("# TYPE pavement_upstream_duration_seconds histogram")
+        for name, u in sorted(self.upstream.items()):
+            out += u["hist"].lines("pavement_upstream_duration_seconds", f'upstream="{name}"')
+        for metric, key in (("timeouts", "timeouts"), ("errors", "errors"), ("cancelled", "cancelled"), ("response_bytes", "bytes")):
+            out.append(f"# TYPE pavement_upstream_{metric}_total counter")
+            out += [f'pavement_upstream_{metric}_total{{upstream="{name}"}} {u[key]}' for name, u in sorted(self.upstream.items())]
+        out.append("# TYPE pavement_upstream_up gauge")
+        out += [f'pavement_upstream_up{{upstream="{name}"}} {0 if self.health(name)["state"] == "down" else 1}' for name in sorted(self.upstream)]
+        return "\n".join(out) + "\n"
+
+METRICS = Metrics()
+_TIMINGS = contextvars.ContextVar("server_timing", default=None)   # 요청별 [(업스트림, 초)] - Server-Timing 용
+
+class _CountingStream(httpx.AsyncByteStream):
+    """업스트림 응답 본문 바이트 집계 (압축 해제 전 전송량)"""
+    def __init__(self, stream, name: str):
+        self._stream, self._name = stream, name
+
+    async def __aiter__(self):
+        u = METRICS._up(self._name)
+        async for chunk in self._stream:
+            u["bytes"] += len(chunk)
+            yield chunk
+
+    async def aclose(self):
+        await self._stream.aclose()
+
+def _server_timing(timings: list, total: float) -> str:
+    per = {}
+    for name, seconds in timings:
+        d = per.setdefault(name, [0.0, 0])
+        d[0] += seconds; d[1] += 1
+    parts = [f'app;dur={total * 1000:.1f}']
+    parts += [f'{name};dur={d[0] * 1000:.1f};desc="{d[1]} call{"s" if d[1] > 1 else ""}"' for name, d in per.items()]
+    return ", ".join(parts)
+
+class MetricsMiddleware:
+    """순수 ASGI 미들웨어 - 응답을 버퍼링하지 않으므로 SSE/스트리밍에 영향 없음.
+    지연은 응답 헤더 전송 시점까지 (스트림은 첫 바이트까지), 바이트는 스트림 끝까지 집계."""
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        timings, state = [], {"status": 500, "latency": None, "bytes": 0}
+        token = _TIMINGS.set(timings)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                state["status"], state["latency"] = message["status"], time.perf_counter() - started
+                message = {**message, "headers": [*message.get("headers", []), (b"server-timing", _server_timing(timings, state["latency"]).encode()), (b"timing-allow-origin", b"*")]}
+            elif message["type"] == "http.response.body":
+                state["bytes"] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _TIMINGS.reset(token)
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            METRICS.observe_http(scope["method"], route, state["status"],
+                                 state["latency"] if state["latency"] is not None else time.perf_counter() - started, state["bytes"])
+
+class SamplingProfiler:
+    """이벤트 루프 스레드의 스택을 주기적으로 샘플링 (folded stack - flamegraph.pl / speedscope 호환).
+    실행 중에만 비용이 들며 /api/profiler 로 켜고 끈다."""
+    MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "300"))
+
+    def __init__(self):
+        self._thread, self._stop = None, threading.Event()
+        self.samples, self.total = Counter(), 0
+        self.interval, self.target, self.started_at, self.until = 0.01, None, None, None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval: float, duration: float, thread_id: int):
+        self.stop()
+        self.samples, self.total = Counter(), 0
+        self.interval, self.target = max(0.001, interval), thread_id
+        self.started_at = time.time()
+        self.until = time.monotonic() + min(duration, self.MAX_SECONDS)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join(timeout=2)
+
+    def _run(self):
+        while not self._stop.wait(self.interval) and time.monotonic() < self.until:
+            frame, stack = sys._current_frames().get(self.target), []
+            while frame is not None and len(stack) < 64:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+                self.total += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {n}\n" for stack, n in self.samples.most_common())
+
+    def report(self, limit: int = 30) -> dict:
+        leaf, inclusive = Counter(), Counter()
+        for stack, n in self.samples.items():
+            frames = stack.split(";")
+            leaf[frames[-1]] += n
+            for f in set(frames): inclusive[f] += n
+        pct = lambda n: round(100 * n / self.total, 1) if self.total else 0.0
+        return {"running": self.running, "samples": self.total, "interval_ms": self.interval * 1000,
+                "started_at": datetime.fromtimestamp(self.started_at).isoformat(timespec="seconds") if self.started_at else None,
+                "self": [{"frame": f, "samples": n, "pct": pct(n)} for f, n in leaf.most_common(limit)],
+                "inclusive": [{"frame": f, "samples": n, "pct": pct(n)} for f, n in inclusive.most_common(limit)]}
+
+PROFILER = SamplingProfiler()
+
+# ============================================
+#  업스트림 커넥션 풀 (업스트림별 공유 클라이언트)
+# ============================================
+# 요청마다 AsyncClient 를 새로 만들면 매번 TCP/TLS 핸드셰이크가 발생하므로
+# 업스트림별로 keep-alive 풀을 하나씩 두고 lifespan 에서 열고 닫는다.
+# 타임아웃/풀 크기는 환경변수 UPSTREAM_<NAME>_TIMEOUT / _MAX_CONN 으로 조정.
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+def _upstream_cfg(name: str, timeout: float, max_conn: int = 20, http2: bool = False, **extra) -> dict:
+    env = name.upper()
+    return {
+        "timeout": float(os.getenv(f"UPSTREAM_{env}_TIMEOUT", timeout)),
+        "max_connections": int(os.getenv(f"UPSTREAM_{env}_MAX_CONN", max_conn)),
+        "max_keepalive": int(os.getenv(f"UPSTREAM_{env}_MAX_KEEPALIVE", max_conn)),
+        "http2": http2 and HTTP2_AVAILABLE,
+        **extra,
+    }
+
+UPSTREAM_CONFIG = {
+    "vworld":    _upstream_cfg("vworld", 15.0, http2=True),
+    "datagokr":  _upstream_cfg("datagokr", 30.0),                         # http:// 전용 → HTTP/1.1
+    "seoul":     _upstream_cfg("seoul", 15.0),                            # openapi.seoul.go.kr:8088
+    "its":       _upstream_cfg("its", 60.0, max_conn=10, verify=False),   # openapi.its.go.kr:9443
+    "anthropic": _upstream_cfg("anthropic", 60.0, max_conn=10, http2=True),
+    "cctv":      _upstream_cfg("cctv", 15.0, max_conn=50, verify=False, follow_redirects=True),  # CCTV 영상 서버 (다중 호스트)
+}
+
+class _PoolTransport(httpx.AsyncHTTPTransport):
+    """빈 슬롯 대기 횟수 등 풀 통계 + 호출별 지연/오류/바이트(METRICS)를 집계하는 트랜스포트"""
+    def __init__(self, name: str, max_connections: int, **kwargs):
+        super().__init__(**kwargs)
+        self.name = name
+        self.max_connections = max_connections
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.waits = 0
+
+    async def handle_async_request(self, request):
+        self.requests += 1
+        if self.in_flight >= self.max_connections:
+            self.waits += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        started = time.perf_counter()
+        try:
+            response = await super().handle_async_request(request)
+        except httpx.TimeoutException:
+            METRICS.observe_upstream(self.name, time.perf_counter() - started, error="timeout")
+            raise
+        except asyncio.CancelledError:
+            METRICS.observe_upstream(self.name, time.perf_counter() - started, error="cancelled")
+            raise
+        except Exception as e:
+            METRICS.observe_upstream(self.name, time.perf_counter() - started, error=type(e).__name__)
+            raise
+        finally:
+            self.in_flight -= 1
+        # 지연은 응답 헤더 수신까지 (본문은 스트리밍으로 나중에 읽힐 수 있음)
+        elapsed = time.perf_counter() - started
+        METRICS.observe_upstream(self.name, elapsed, status=response.status_code)
+        timings = _TIMINGS.get()
+        if timings is not None: timings.append((self.name, elapsed))
+        response.stream = _CountingStream(response.stream, self.name)
+        return response
+
+    def stats(self) -> dict:
+        # httpcore 풀 내부는 공개 API 가 아니므로 없으면 직접 센 값으로 대체 (버전이 바뀌어도 메트릭은 계속 동작)
+        pool = getattr(self, "_pool", None)
+        conns = list(getattr(pool, "connections", None) or [])
+        idle = sum(1 for c in conns if _probe(c, "is_idle"))
+        waiting = getattr(pool, "_requests", None)
+        queued = sum(1 for r in waiting if _probe(r, "is_queued")) if waiting is not None else max(0, self.in_flight - self.max_connections)
+        return {"open": len(conns), "idle": idle, "active": len(conns) - idle, "queued": queued,
+                "max_connections": self.max_connections, "requests": self.requests,
+                "in_flight": self.in_flight, "peak_in_flight": self.peak_in_flight, "waits": self.waits}
+
+def _probe(obj, method: str) -> bool:
+    fn = getattr(obj, method, None)
+    return bool(fn()) if callable(fn) else False
+
+UPSTREAMS: dict = {}
+UPSTREAM_TRANSPORTS: dict = {}   # name -> _PoolTransport (클라이언트의 비공개 _transport 대신 직접 보관)
+
+def _make_client(name: str) -> httpx.AsyncClient:
+    cfg = UPSTREAM_CONFIG[name]
+    limits = httpx.Limits(max_connections=cfg["max_connections"], max_keepalive_connections=cfg["max_keepalive"], keepalive_expiry=30.0)
+    transport = UPSTREAM_TRANSPORTS[name] = _PoolTransport(name, cfg["max_connections"], limits=limits, http2=cfg["http2"], verify=cfg.get("verify", True))
+    return httpx.AsyncClient(transport=transport, timeout=cfg["timeout"], follow_redirects=cfg.get("follow_redirects", False))
+
+def upstream(name: str) -> httpx.AsyncClient:
+    """업스트림 공유 클라이언트 (lifespan 밖에서 호출되면 지연 생성)"""
+    c = UPSTREAMS.get(name)
+    if c is None or c.is_closed:
+        c = UPSTREAMS[name] = _make_client(name)
+    return c
+
+UPSTREAM_RETRIES = int(os.getenv("UPSTREAM_RETRIES", "3"))
+UPSTREAM_BACKOFF = float(os.getenv("UPSTREAM_BACKOFF", "0.5"))   # 첫 재시도 대기 (초), 이후 2배씩
+
+async def upstream_get(name: str, url: str, params: dict, retries: int = UPSTREAM_RETRIES) -> httpx.Response:
+    """대량 수집용 GET - 네트워크 오류/429/5xx 는 지수 백오프(+지터)로 재시도"""
+    for attempt in range(retries + 1):
+        try:
+            r = await upstream(name).get(url, params=params)
+        except httpx.TransportError:
+            if attempt == retries: raise
+        else:
+            if (r.status_code != 429 and r.status_code < 500) or attempt == retries:
+                return r.raise_for_status()
+        await asyncio.sleep(UPSTREAM_BACKOFF * (2 ** attempt) * (0.5 + random.random()))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    for name in UPSTREAM_CONFIG: upstream(name)
+    # 공유 모드에서는 강우 폴링도 리더 선출 루프가 맡는다
+    if SHARED_SNAPSHOTS: SHARED.start()
+    else: FLOOD_MONITOR.start()
+    try:
+        yield
+    finally:
+        await SHARED.stop()
+        await FLOOD_MONITOR.stop()
+        TILE_STORE.close()
+        WEATHER_STORE.close()
+        ACCIDENT_STORE.close()
+        SHARED_STORE.close()
+        for c in list(UPSTREAMS.values()): await c.aclose()
+        UPSTREAMS.clear()
+
+app = FastAPI(title="기능성 포장 플랫폼 API", version="1.1", lifespan=lifespan)
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+app.add_middleware(MetricsMiddleware)
+
+# ============================================
+#  응답 캐시 (TTL + stale-while-revalidate, 단일 비행)
+# ============================================
+# 엔드포인트별 (신선 TTL, 추가 stale 허용 시간) 초 — CACHE_TTL_<NAME> / CACHE_STALE_<NAME> 로 조정
+def _cache_ttl(name: str, ttl: float, stale: float) -> tuple:
+    env = name.upper()
+    return float(os.getenv(f"CACHE_TTL_{env}", ttl)), float(os.getenv(f"CACHE_STALE_{env}", stale))
+
+CACHE_TTL = {
+    "weather":         _cache_ttl("weather", 1800, 3600),              # ASOS 시간자료: 최대 1시간 단위 갱신
+    "weather_daily":   _cache_ttl("weather_daily", 6 * 3600, 86400),
+    "accident":        _cache_ttl("accident", 7 * 86400, 30 * 86400),  # TAAS 연간 통계
+    "geocode":         _cache_ttl("geocode", 30 * 86400, 30 * 86400),
+    "reverse_geocode": _cache_ttl("reverse_geocode", 30 * 86400, 30 * 86400),
+}
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "4096"))
+
+class ResponseCache:
+    """비동기 응답 캐시 - LRU 제한, 만료 후 stale 응답 + 백그라운드 재검증, 동일 키 동시 미스는 1회만 호출"""
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._data = OrderedDict()   # key -> (value, fresh_until, stale_until)
+        self._inflight = {}          # key -> asyncio.Task
+        self.hits = self.stale_hits = self.misses = self.coalesced = 0
+        self.revalidations = self.evictions = self.errors = 0
+
+    async def get(self, key, fetch, ttl: float, stale: float = 0.0, cacheable=None):
+        now = time.monotonic()
+        entry = self._data.get(key)
+        if entry is not None:
+            value, fresh_until, stale_until = entry
+            if now < fresh_until:
+                self._data.move_to_end(key); self.hits += 1
+                return value
+            if now < stale_until:
+                self._data.move_to_end(key); self.stale_hits += 1
+                if key not in self._inflight:
+                    self.revalidations += 1
+                    self._start(key, fetch, ttl, stale, cacheable)
+                return value
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            task = self._start(key, fetch, ttl, stale, cacheable)
+        else:
+            self.coalesced += 1
+        # 호출자가 취소돼도 다른 대기자를 위해 업스트림 호출은 계속한다
+        return await asyncio.shield(task)
+
+    def _start(self, key, fetch, ttl, stale, cacheable):
+        task = asyncio.create_task(self._run(key, fetch, ttl, stale, cacheable))
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._inflight[key] = task
+        return task
+
+    async def _run(self, key, fetch, ttl, stale, cacheable):
+        try:
+            value = await fetch()
+        except Exception as e:
+            self.errors += 1
+            log.warning("업스트림 조회 실패 (%s): %s", key[0], str(e) or type(e).__name__)
+            raise
+        finally:
+            self._inflight.pop(key, None)
+        if cacheable is None or cacheable(value):
+            self.set(key, value, ttl, stale)
+        return value
+
+    def get_cached(self, key):
+        """신선한 항목만 조회 (업스트림 호출 없음)"""
+        entry = self._data.get(key)
+        if entry is None or time.monotonic() >= entry[1]: return None
+        self._data.move_to_end(key); self.hits += 1
+        return entry[0]
+
+    def set(self, key, value, ttl: float, stale: float = 0.0):
+        now = time.monotonic()
+        self._data[key] = (value, now + ttl, now + ttl + stale)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False); self.evictions += 1
+
+    def invalidate(self, prefix: str = ""):
+        for k in [k for k in self._data if k[0].startswith(prefix)]: del self._data[k]
+
+    def stats(self) -> dict:
+        return {"entries": len(self._data), "max_entries": self.max_entries, "inflight": len(self._inflight),
+                "hits": self.hits, "stale_hits": self.stale_hits, "misses": self.misses, "coalesced": self.coalesced,
+                "revalidations": self.revalidations, "evictions": self.evictions, "errors": self.errors}
+
+RESPONSE_CACHE = ResponseCache(CACHE_MAX_ENTRIES)
+
+class ByteLRU:
+    """바이트 용량 상한 LRU (항목별 TTL) - 이미지/타일 등 바이너리 응답용"""
+    def __init__(self, max_bytes: int, ttl: float = 0.0):
+        self.max_bytes = max_bytes
+        self.ttl = ttl                # 0 = 만료 없음
+        self.bytes = 0
+        self._data = OrderedDict()    # key -> (entry, expires_at)
+        self.evictions = 0
+
+    def get(self, key):
+        item = self._data.get(key)
+        if item is None: return None
+        entry, expires = item
+        if expires and time.monotonic() >= expires:
+            self._drop(key)
+            return None
+        self._data.move_to_end(key)
+        return entry
+
+    def put(self, key, entry: dict):
+        size = len(entry["body"])
+        if size > self.max_bytes: return False
+        if key in self._data: self._drop(key)
+        self._data[key] = (entry, time.monotonic() + self.ttl if self.ttl else 0)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            self._drop(next(iter(self._data))); self.evictions += 1
+        return True
+
+    def _drop(self, key):
+        entry, _ = self._data.pop(key)
+        self.bytes -= len(entry["body"])
+
+    def stats(self) -> dict:
+        return {"entries": len(self._data), "bytes": self.bytes, "max_bytes": self.max_bytes, "ttl": self.ttl, "evictions": self.evictions}
+
+def cache_key(endpoint: str, **params) -> tuple:
+    """정규화된 파라미터 키 (공백 정리, 순서 무관)"""
+    return (endpoint, tuple(sorted((k, " ".join(str(v).split())) for k, v in params.items())))
+
+async def cached(endpoint: str, fetch, cacheable=None, **params):
+    ttl, stale = CACHE_TTL[endpoint]
+    return await RESPONSE_CACHE.get(cache_key(endpoint, **params), lambda: fetch(**params), ttl, stale, cacheable)
+
+def _datagokr_check(data):
+    """data.go.kr 오류 응답(키 오류, 일일 트래픽 초과 등)은 캐시되지 않도록 예외로 변환 (00=정상, 03=데이터 없음)"""
+    header = data.get("response", {}).get("header", {}) if isinstance(data, dict) else {}
+    if header.get("resultCode") not in ("00", "03"):
+        raise RuntimeError(f"data.go.kr {header.get('resultCode', '?')}: {header.get('resultMsg', 'unexpected response')}")
+    return data
+
+# ============================================
+#  워커 간 공유 스냅샷 (멀티 프로세스 배포)
+# ============================================
+# WORKERS>1 (또는 SHARED_SNAPSHOTS=1) 이면 파일 잠금을 잡은 워커 하나(리더)만 업스트림 스냅샷을 갱신하고,
+# 나머지 워커는 같은 SQLite(WAL) 파일에서 버전이 바뀐 스냅샷만 읽는다 - 워커 수와 무관하게 갱신 주기당 1회 호출
+WORKERS              = int(os.getenv("WORKERS", "1"))
+SHARED_SNAPSHOTS     = os.getenv("SHARED_SNAPSHOTS", "1" if WORKERS > 1 else "0") == "1"
+SHARED_DB            = os.getenv("SHARED_DB", os.path.join(STORE_DIR, "shared.sqlite"))
+SHARED_LOCK_FILE     = os.getenv("SHARED_LOCK_FILE", os.path.join(STORE_DIR, "shared.leader.lock"))
+SHARED_SYNC_INTERVAL = float(os.getenv("SHARED_SYNC_INTERVAL", "2"))   # 팔로워 버전 확인 / 리더 재선출 시도 주기(초)
+SHARED_WAIT          = float(os.getenv("SHARED_WAIT", "5"))            # 팔로워가 첫 스냅샷을 기다리는 최대 시간
+SHARED_DEMAND_TTL    = float(os.getenv("SHARED_DEMAND_TTL", "600"))    # 이 시간 동안 요청이 없던 키는 리더가 갱신하지 않음
+FCNTL_AVAILABLE = importlib.util.find_spec("fcntl") is not None
+if FCNTL_AVAILABLE: import fcntl
+
+class SharedStore:
+    """공유 스냅샷 저장소 - 이름별 (버전, 갱신 시각, JSON) 한 행 + 팔로워가 리더에 알리는 요청 키(수요)"""
+    def __init__(self, path: str):
+        self.path = path
+        self._db = None
+        self._lock = threading.Lock()
+        self.reads = self.writes = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("PRAGMA mmap_size=67108864")   # 읽기는 메모리 매핑 (워커 간 페이지 캐시 공유)
+            self._db.execute("CREATE TABLE IF NOT EXISTS snapshots (name TEXT PRIMARY KEY, version INTEGER, updated_at REAL, body BLOB)")
+            self._db.execute("CREATE TABLE IF NOT EXISTS demand (name TEXT, key TEXT, seen_at REAL, PRIMARY KEY (name, key)) WITHOUT ROWID")
+            self._db.commit()
+        return self._db
+
+    def put(self, name: str, data) -> int:
+        body = json_bytes(data)
+        with self._lock:
+            conn = self._conn()
+            conn.execute("INSERT INTO snapshots VALUES (?, 1, ?, ?) ON CONFLICT(name) DO UPDATE SET "
+                         "version=version+1, updated_at=excluded.updated_at, body=excluded.body", (name, time.time(), body))
+            version = conn.execute("SELECT version FROM snapshots WHERE name=?", (name,)).fetchone()[0]
+            conn.commit()
+            self.writes += 1
+        return version
+
+    def versions(self) -> dict:
+        """이름 -> (버전, 갱신 시각) - 본문은 읽지 않는다"""
+        with self._lock:
+            return {n: (v, u) for n, v, u in self._conn().execute("SELECT name, version, updated_at FROM snapshots")}
+
+    def get(self, name: str):
+        with self._lock:
+            row = self._conn().execute("SELECT version, updated_at, body FROM snapshots WHERE name=?", (name,)).fetchone()
+            self.reads += 1
+        return None if row is None else (row[0], row[1], json.loads(row[2]))
+
+    def touch(self, wants: dict):
+        """{(name, key): 마지막 요청 시각} 기록"""
+        with self._lock:
+            conn = self._conn()
+            conn.executemany("INSERT INTO demand VALUES (?, ?, ?) ON CONFLICT(name, key) DO UPDATE SET seen_at=MAX(seen_at, excluded.seen_at)",
+                             [(n, k, t) for (n, k), t in wants.items()])
+            conn.commit()
+
+    def demand(self, name: str, since: float) -> list:
+        """since 이후 요청된 키 (오래된 수요는 정리)"""
+        with self._lock:
+            conn = self._conn()
+            conn.execute("DELETE FROM demand WHERE seen_at < ?", (since,))
+            conn.commit()
+            return [r[0] for r in conn.execute("SELECT key FROM demand WHERE name=? ORDER BY key", (name,))]
+
+    def stats(self) -> dict:
+        size = sum(os.path.getsize(self.path + ext) for ext in ("", "-wal") if os.path.exists(self.path + ext))
+        return {"path": self.path, "bytes": size, "reads": self.reads, "writes": self.writes}
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+class LeaderLock:
+    """fcntl 파일 잠금 리더 선출 - 리더 프로세스가 죽으면 OS 가 잠금을 풀고 다른 워커가 다음 시도에서 이어받는다"""
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = None
+        self.since = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self._fd is not None
+
+    def try_acquire(self) -> bool:
+        if self._fd is not None: return True
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        if FCNTL_AVAILABLE:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._fd, self.since = fd, datetime.now().isoformat()
+        return True
+
+    def holder(self):
+        try:
+            with open(self.path) as f: return int(f.read().strip() or 0) or None
+        except (OSError, ValueError):
+            return None
+
+    def release(self):
+        if self._fd is None: return
+        if FCNTL_AVAILABLE: fcntl.flock(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+        self._fd = self.since = None
+
+class SharedSnapshots:
+    """등록된 스냅샷을 리더는 주기마다 갱신해 저장하고, 팔로워는 버전이 바뀐 것만 읽어 반영"""
+    def __init__(self, store: SharedStore, lock: LeaderLock):
+        self.store = store
+        self.lock = lock
+        self.jobs = {}      # name -> (갱신 주기, refresh 코루틴 함수, apply 함수)
+        self.applied = {}   # name -> (버전, 갱신 시각) 이 프로세스에 반영된 스냅샷
+        self.due = {}       # name -> 다음 갱신 시각 (리더)
+        self.wants = {}     # (name, key) -> 마지막 요청 시각 (다음 동기화 때 저장소에 기록)
+        self.errors = {}
+        self._task = None
+
+    def register(self, name: str, interval: float, refresh, apply):
+        self.jobs[name] = (interval, refresh, apply)
+
+    @property
+    def leader(self) -> bool:
+        return not SHARED_SNAPSHOTS or self.lock.is_leader
+
+    @property
+    def role(self) -> str:
+        """disabled (단일 프로세스) / leader / follower"""
+        if not SHARED_SNAPSHOTS: return "disabled"
+        return "leader" if self.lock.is_leader else "follower"
+
+    def want(self, name: str, key: str):
+        self.wants[(name, key)] = time.time()
+
+    def age(self, name: str) -> float:
+        return time.time() - self.applied[name][1] if name in self.applied else float("inf")
+
+    async def sync(self, names=None) -> list:
+        versions = await asyncio.to_thread(self.store.versions)
+        changed = [n for n, (v, _) in versions.items()
+                   if n in self.jobs and (names is None or n in names) and self.applied.get(n, (None,))[0] != v]
+        for name in changed:
+            got = await asyncio.to_thread(self.store.get, name)
+            if got is None: continue
+            self.jobs[name][2](got[2])
+            self.applied[name] = (got[0], got[1])
+        return changed
+
+    async def wait_for(self, name: str, timeout: float = SHARED_WAIT) -> bool:
+        deadline = time.monotonic() + timeout
+        while name not in self.applied and time.monotonic() < deadline:
+            await self.sync([name])
+            if name not in self.applied: await asyncio.sleep(0.2)
+        return name in self.applied
+
+    async def _refresh(self, name: str):
+        interval, refresh, apply = self.jobs[name]
+        try:
+            data = await refresh()
+            version = await asyncio.to_thread(self.store.put, name, data)
+            apply(data)
+            self.applied[name] = (version, time.time())
+            self.errors.pop(name, None)
+        except Exception as e:
+            self.errors[name] = str(e) or type(e).__name__
+            log.warning("공유 스냅샷 갱신 실패 (%s): %s", name, self.errors[name])
+
+    async def step(self):
+        if not self.lock.is_leader and await asyncio.to_thread(self.lock.try_acquire):
+            # 직전 리더의 스냅샷을 먼저 반영하고 그 갱신 시각 기준으로 일정을 이어간다
+            await self.sync()
+            self.due = {n: self.applied[n][1] + self.jobs[n][0] if n in self.applied else 0 for n in self.jobs}
+            log.info("공유 스냅샷 리더 선출 (pid %d)", os.getpid())
+        if self.wants:
+            wants, self.wants = self.wants, {}
+            await asyncio.to_thread(self.store.touch, wants)
+        if not self.lock.is_leader:
+            await self.sync()
+            return
+        now = time.time()
+        names = [n for n in self.jobs if now >= self.due.get(n, 0)]
+        for n in names: self.due[n] = now + self.jobs[n][0]
+        await asyncio.gather(*[self._refresh(n) for n in names])
+
+    async def _run(self):
+        while True:
+            try:
+                await self.step()
+            except Exception as e:
+                log.warning("공유 스냅샷 동기화 실패: %s", str(e) or type(e).__name__)
+            await asyncio.sleep(SHARED_SYNC_INTERVAL)
+
+    def start(self):
+        if not FCNTL_AVAILABLE: log.warning("fcntl 없음 - 리더 선출 없이 모든 워커가 직접 갱신")
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try: await self._task
+            except asyncio.CancelledError: pass
+            self._task = None
+        self.lock.release()
+
+    def stats(self) -> dict:
+        return {"enabled": SHARED_SNAPSHOTS, "workers": WORKERS, "pid": os.getpid(), "role": self.role,
+                "leader_pid": self.lock.holder(), "leader_since": self.lock.since, "sync_interval": SHARED_SYNC_INTERVAL,
+                "running": self._task is not None and not self._task.done(), "pending_wants": len(self.wants),
+                "snapshots": {n: {"interval": self.jobs[n][0], "version": self.applied.get(n, (None,))[0],
+                                  "age_s": round(self.age(n), 1) if n in self.applied else None, "error": self.errors.get(n)} for n in self.jobs},
+                "store": self.store.stats()}
+
+SHARED_STORE = SharedStore(SHARED_DB)
+SHARED = SharedSnapshots(SHARED_STORE, LeaderLock(SHARED_LOCK_FILE))
+
+# ============================================
+#  공간 인덱스 (격자 버킷 + 하버사인 거리)
+# ============================================
+EARTH_RADIUS_M = 6371008.8
+M_PER_DEG_LAT = EARTH_RADIUS_M * np.pi / 180   # 하버사인과 같은 구면 기준 (bbox 가 원을 빠짐없이 덮도록)
+
+def haversine_m(lat1, lng1, lat2, lng2):
+    """하버사인 거리 (m) - 배열 입력 지원"""
+    p1, p2 = np.radians(lat1), np.radians(lat2)
+    dp, dl = p2 - p1, np.radians(np.asarray(lng2) - lng1)
+    a = np.sin(dp / 2) ** 2 + np.cos(p1) * np.cos(p2) * np.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+class SpatialIndex:
+    """위경도 격자 버킷 인덱스 - 반경(m) / k-최근접 / bbox 질의"""
+    def __init__(self, lat, lng, cell_deg: float = 0.01):
+        self.lat = np.asarray(lat, dtype=float)
+        self.lng = np.asarray(lng, dtype=float)
+        self.cell = cell_deg
+        self.buckets = {}
+        if len(self.lat):
+            ci = np.floor(self.lat / cell_deg).astype(np.int64)
+            cj = np.floor(self.lng / cell_deg).astype(np.int64)
+            order = np.lexsort((cj, ci))
+            keys = np.stack([ci[order], cj[order]], axis=1)
+            starts = np.flatnonzero(np.r_[True, np.any(keys[1:] != keys[:-1], axis=1)])
+            for s, e in zip(starts, np.r_[starts[1:], len(order)]):
+                self.buckets[(int(keys[s, 0]), int(keys[s, 1]))] = order[s:e]
+            self.bounds = (int(ci.min()), int(ci.max()), int(cj.min()), int(cj.max()))
+
+    def __len__(self):
+        return len(self.lat)
+
+    def _candidates(self, min_lat, max_lat, min_lng, max_lng) -> np.ndarray:
+        if not self.buckets: return np.zeros(0, dtype=np.int64)
+        i0, i1 = max(int(np.floor(min_lat / self.cell)), self.bounds[0]), min(int(np.floor(max_lat / self.cell)), self.bounds[1])
+        j0, j1 = max(int(np.floor(min_lng / self.cell)), self.bounds[2]), min(int(np.floor(max_lng / self.cell)), self.bounds[3])
+        if i0 > i1 or j0 > j1: return np.zeros(0, dtype=np.int64)
+        if (i1 - i0 + 1) * (j1 - j0 + 1) > len(self.buckets):
+            # 질의 범위가 격자 전체보다 넓으면 버킷 순회가 더 비싸므로 전체를 후보로
+            return np.arange(len(self.lat))
+        parts = [b for i in range(i0, i1 + 1) for j in range(j0, j1 + 1) if (b := self.buckets.get((i, j))) is not None]
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+
+    def bbox(self, min_lat, min_lng, max_lat, max_lng) -> np.ndarray:
+        idx = self._candidates(min_lat, max_lat, min_lng, max_lng)
+        la, lo = self.lat[idx], self.lng[idx]
+        return np.sort(idx[(la >= min_lat) & (la <= max_lat) & (lo >= min_lng) & (lo <= max_lng)])
+
+    def radius(self, lat: float, lng: float, radius_m: float):
+        """반경 내 (인덱스, 거리m) - 가까운 순"""
+        dlat = radius_m / M_PER_DEG_LAT
+        # 원의 경도 폭은 극 쪽 가장자리에서 가장 넓다
+        dlng = radius_m / (M_PER_DEG_LAT * max(np.cos(np.radians(min(abs(lat) + dlat, 90.0))), 1e-6))
+        idx = self._candidates(lat - dlat, lat + dlat, lng - dlng, lng + dlng)
+        d = haversine_m(lat, lng, self.lat[idx], self.lng[idx])
+        keep = d <= radius_m
+        idx, d = idx[keep], d[keep]
+        order = np.argsort(d, kind="stable")
+        return idx[order], d[order]
+
+    def nearest(self, lat: float, lng: float, k: int = 1, max_m: float = float("inf")):
+        """k-최근접 (인덱스, 거리m) - 후보가 k개 찾아질 때까지 격자 링을 넓힌 뒤 k번째 거리로 정확히 재검색"""
+        k = min(k, len(self.lat))
+        if k <= 0: return np.zeros(0, dtype=np.int64), np.zeros(0)
+        ring = 1
+        while True:
+            span = ring * self.cell
+            idx = self._candidates(lat - span, lat + span, lng - span, lng + span)
+            if len(idx) >= k or len(idx) == len(self.lat): break
+            ring *= 2
+        d = haversine_m(lat, lng, self.lat[idx], self.lng[idx])
+        kth = np.partition(d, k - 1)[k - 1]
+        idx, d = self.radius(lat, lng, min(kth, max_m))
+        return idx[:k], d[:k]
+
+class SpatialLayer:
+    """공간 질의용 레이어 - 항목 목록 + 인덱스, 데이터 재적재 시 인덱스 재생성"""
+    def __init__(self, name: str, loader=None, cell_deg: float = 0.01):
+        self.name = name
+        self.loader = loader
+        self.cell_deg = cell_deg
+        self.items = []
+        self.index = SpatialIndex([], [], cell_deg)
+        self.source = None
+        self.loaded_at = None
+
+    def load(self, items: list, source: str = ""):
+        items = [it for it in items if it.get("lat") is not None and it.get("lng") is not None]
+        index = SpatialIndex([float(it["lat"]) for it in items], [float(it["lng"]) for it in items], self.cell_deg)
+        self.items, self.index, self.source, self.loaded_at = items, index, source, datetime.now().isoformat()
+
+    def reload(self):
+        if self.loader is not None:
+            items, source = self.loader()
+            self.load(items, source)
+
+    def rows(self, idx, dist=None) -> list:
+        if dist is None: return [self.items[i] for i in idx]
+        return [{**self.items[i], "distance_m": round(float(d), 1)} for i, d in zip(idx, dist)]
+
+    def stats(self) -> dict:
+        return {"count": len(self.items), "cells": len(self.index.buckets), "cell_deg": self.cell_deg,
+                "source": self.source, "loaded_at": self.loaded_at}
+
+SPATIAL_LAYERS = {}
+
+def _csv_value(v):
+    """CSV 문자열 → 숫자 (앞자리 0 코드값은 문자열 유지)"""
+    if not isinstance(v, str) or (len(v) > 1 and v[0] == "0" and v[1] != "."): return v
+    for cast in (int, float):
+        try: return cast(v)
+        except ValueError: pass
+    return v
+
+def load_points_file(path: str) -> list:
+    """포인트 데이터 적재 - CSV(lat,lng 컬럼) 또는 GeoJSON(Point FeatureCollection)"""
+    if path.lower().endswith((".geojson", ".json")):
+        with open(path, encoding="utf-8") as f:
+            fc = json.load(f)
+        items = []
+        for feat in fc.get("features", []):
+            geom = feat.get("geometry") or {}
+            if geom.get("type") != "Point": continue
+            lng, lat = geom["coordinates"][:2]
+            items.append({**(feat.get("properties") or {}), "lat": float(lat), "lng": float(lng)})
+        return items
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        return [{k: _csv_value(v) for k, v in row.items()} for row in csv.DictReader(f)]
 
 # ============================================
 #  VWorld 지도 API
@@ -37,166 +932,1102 @@ app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], all
 @app.get("/api/vworld/tile-info")
 async def get_vworld_tile_info():
     if VWORLD_API_KEY:
+        if TILE_PROXY:
+            # 로컬 타일 캐시 경로 (상대 경로 - 프런트엔드가 API_BASE 를 붙인다)
+            return {"status": "live", "proxy": True,
+                    **{name: f"/api/tiles/{layer}/{{z}}/{{x}}/{{y}}" for name, layer in
+                       (("base", "Base"), ("satellite", "Satellite"), ("hybrid", "Hybrid"), ("midnight", "midnight"), ("white", "white"))}}
         return {
             "status": "live",
-            "base": f"https://api.vworld.kr/req/wmts/1.0.0/{VWORLD_API_KEY}/Base/{{z}}/{{y}}/{{x}}.png",
-            "satellite": f"https://api.vworld.kr/req/wmts/1.0.0/{VWORLD_API_KEY}/Satellite/{{z}}/{{y}}/{{x}}.jpeg",
-            "hybrid": f"https://api.vworld.kr/req/wmts/1.0.0/{VWORLD_API_KEY}/Hybrid/{{z}}/{{y}}/{{x}}.png",
-            "midnight": f"https://api.vworld.kr/req/wmts/1.0.0/{VWORLD_API_KEY}/midnight/{{z}}/{{y}}/{{x}}.png",
-            "white": f"https://api.vworld.kr/req/wmts/1.0.0/{VWORLD_API_KEY}/white/{{z}}/{{y}}/{{x}}.png",
+            "base": f"{VWORLD_BASE_URL}/req/wmts/1.0.0/{VWORLD_API_KEY}/Base/{{z}}/{{y}}/{{x}}.png",
+            "satellite": f"{VWORLD_BASE_URL}/req/wmts/1.0.0/{VWORLD_API_KEY}/Satellite/{{z}}/{{y}}/{{x}}.jpeg",
+            "hybrid": f"{VWORLD_BASE_URL}/req/wmts/1.0.0/{VWORLD_API_KEY}/Hybrid/{{z}}/{{y}}/{{x}}.png",
+            "midnight": f"{VWORLD_BASE_URL}/req/wmts/1.0.0/{VWORLD_API_KEY}/midnight/{{z}}/{{y}}/{{x}}.png",
+            "white": f"{VWORLD_BASE_URL}/req/wmts/1.0.0/{VWORLD_API_KEY}/white/{{z}}/{{y}}/{{x}}.png",
         }
     return {"status": "unavailable"}
 
+def _vworld_ok(data) -> bool:
+    return isinstance(data, dict) and data.get("response", {}).get("status") in ("OK", "NOT_FOUND")
+
+async def _fetch_geocode(address: str):
+    r = await upstream("vworld").get(f"{VWORLD_BASE_URL}/req/address", params={"service":"address","request":"getcoord","key":VWORLD_API_KEY,"address":address,"type":"road","format":"json"})
+    return r.json()
+
+async def _fetch_reverse_geocode(lat: float, lng: float):
+    r = await upstream("vworld").get(f"{VWORLD_BASE_URL}/req/address", params={"service":"address","request":"getaddr","key":VWORLD_API_KEY,"point":f"{lng},{lat}","type":"road","format":"json"})
+    return r.json()
+
 @app.get("/api/vworld/geocode")
 async def geocode(address: str):
     if not VWORLD_API_KEY: return {"status": "error", "message": "VWorld 키 미설정"}
-    async with httpx.AsyncClient(timeout=15.0) as c:
-        r = await c.get("https://api.vworld.kr/req/address", params={"service":"address","request":"getcoord","key":VWORLD_API_KEY,"address":address,"type":"road","format":"json"})
-        return r.json()
+    return await cached("geocode", _fetch_geocode, cacheable=_vworld_ok, address=" ".join(address.split()))
 
 @app.get("/api/vworld/reverse-geocode")
 async def reverse_geocode(lat: float, lng: float):
     if not VWORLD_API_KEY: return {"status": "error", "message": "VWorld 키 미설정"}
-    async with httpx.AsyncClient(timeout=15.0) as c:
-        r = await c.get("https://api.vworld.kr/req/address", params={"service":"address","request":"getaddr","key":VWORLD_API_KEY,"point":f"{lng},{lat}","type":"road","format":"json"})
-        return r.json()
+    # 좌표는 소수 6자리(약 0.1m)로 정규화해 캐시 키를 공유
+    return await cached("reverse_geocode", _fetch_reverse_geocode, cacheable=_vworld_ok, lat=round(lat, 6), lng=round(lng, 6))
+
+# ============================================
+#  VWorld 타일 캐시 (MBTiles 디스크 저장 + 메모리 LRU)
+# ============================================
+# 레이어별 MBTiles(SQLite) 파일에 타일을 영구 저장하고, 자주 쓰는 타일은 메모리 LRU 에 둔다.
+# 브라우저에는 VWorld 키가 들어간 원본 URL 대신 /api/tiles/... 를 내려준다.
+TILE_PROXY        = os.getenv("TILE_PROXY", "1") != "0"          # 0 이면 VWorld 원본 URL 전달 (기존 동작)
+TILE_DIR          = os.path.join(STORE_DIR, "tiles")
+TILE_MEM_MB       = float(os.getenv("TILE_MEM_MB", "128"))
+TILE_BROWSER_TTL  = int(os.getenv("TILE_BROWSER_TTL", str(7 * 86400)))
+TILE_LAYERS       = {"Base": "png", "Satellite": "jpeg", "Hybrid": "png", "midnight": "png", "white": "png"}
+TILE_MAX_ZOOM     = 19
+SEOUL_BBOX        = (37.41, 126.76, 37.72, 127.19)   # min_lat, min_lng, max_lat, max_lng
+
+class TileStore:
+    """레이어별 MBTiles 저장소 (tile_row 는 MBTiles 규약대로 TMS 기준)"""
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._conns = {}
+        self._lock = threading.Lock()
+
+    def _conn(self, layer: str) -> sqlite3.Connection:
+        conn = self._conns.get(layer)
+        if conn is None:
+            os.makedirs(self.directory, exist_ok=True)
+            conn = sqlite3.connect(os.path.join(self.directory, f"{layer}.mbtiles"), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT)")
+            conn.execute("CREATE TABLE IF NOT EXISTS tiles (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB)")
+            conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS tile_index ON tiles (zoom_level, tile_column, tile_row)")
+            conn.executemany("INSERT OR IGNORE INTO metadata VALUES (?, ?)",
+                             [("name", f"vworld-{layer}"), ("format", TILE_LAYERS[layer].replace("jpeg", "jpg")), ("type", "baselayer")])
+            conn.commit()
+            self._conns[layer] = conn
+        return conn
+
+    def get(self, layer: str, z: int, x: int, y: int):
+        with self._lock:
+            row = self._conn(layer).execute("SELECT tile_data FROM tiles WHERE zoom_level=? AND tile_column=? AND tile_row=?",
+                                            (z, x, (1 << z) - 1 - y)).fetchone()
+        return row[0] if row else None
+
+    def put_many(self, layer: str, tiles: list):
+        """tiles: [(z, x, y, data), ...]"""
+        with self._lock:
+            conn = self._conn(layer)
+            conn.executemany("INSERT OR REPLACE INTO tiles VALUES (?, ?, ?, ?)", [(z, x, (1 << z) - 1 - y, d) for z, x, y, d in tiles])
+            conn.commit()
+
+    def existing(self, layer: str, z: int, x0: int, x1: int, y0: int, y1: int) -> set:
+        with self._lock:
+            rows = self._conn(layer).execute(
+                "SELECT tile_column, tile_row FROM tiles WHERE zoom_level=? AND tile_column BETWEEN ? AND ? AND tile_row BETWEEN ? AND ?",
+                (z, x0, x1, (1 << z) - 1 - y1, (1 << z) - 1 - y0)).fetchall()
+        return {(x, (1 << z) - 1 - r) for x, r in rows}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {layer: self._conn(layer).execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(tile_data)), 0) FROM tiles").fetchone()
+                    for layer in TILE_LAYERS if os.path.exists(os.path.join(self.directory, f"{layer}.mbtiles"))}
+
+    def close(self):
+        with self._lock:
+            for conn in self._conns.values(): conn.close()
+            self._conns.clear()
+
+TILE_STORE = TileStore(TILE_DIR)
+TILE_MEM = ByteLRU(int(TILE_MEM_MB * 1024 * 1024))
+TILE_STATS = {"mem_hits": 0, "disk_hits": 0, "upstream": 0, "coalesced": 0, "errors": 0}
+_tile_inflight = {}   # (layer, z, x, y) -> Task
+
+def lnglat_to_tile(lat: float, lng: float, z: int) -> tuple:
+    n = 1 << z
+    x = int((lng + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+async def _fetch_tile_upstream(layer: str, z: int, x: int, y: int) -> bytes:
+    r = await upstream("vworld").get(f"{VWORLD_BASE_URL}/req/wmts/1.0.0/{VWORLD_API_KEY}/{layer}/{z}/{y}/{x}.{TILE_LAYERS[layer]}")
+    r.raise_for_status()
+    if not r.headers.get("content-type", "").startswith("image/"):
+        raise ValueError(f"타일 응답 형식 오류: {r.headers.get('content-type', '')}")
+    return r.content
+
+async def _load_tile(layer: str, z: int, x: int, y: int):
+    """디스크 → 업스트림 순으로 조회, 업스트림에서 받으면 디스크에 저장. (데이터, 출처)
+    키가 없으면 업스트림은 건너뛰고 (None, "unavailable") - 미리 받아 둔 타일만 제공"""
+    data = await asyncio.to_thread(TILE_STORE.get, layer, z, x, y)
+    if data is not None:
+        TILE_STATS["disk_hits"] += 1
+        return data, "disk"
+    if not VWORLD_API_KEY: return None, "unavailable"
+    TILE_STATS["upstream"] += 1
+    data = await _fetch_tile_upstream(layer, z, x, y)
+    await asyncio.to_thread(TILE_STORE.put_many, layer, [(z, x, y, data)])
+    return data, "upstream"
+
+async def get_tile(layer: str, z: int, x: int, y: int):
+    key = (layer, z, x, y)
+    entry = TILE_MEM.get(key)
+    if entry is not None:
+        TILE_STATS["mem_hits"] += 1
+        return entry["body"], "mem"
+    task = _tile_inflight.get(key)
+    if task is None:
+        task = _tile_inflight[key] = asyncio.create_task(_load_tile(*key))
+        task.add_done_callback(lambda t: _tile_inflight.pop(key, None))
+    else:
+        TILE_STATS["coalesced"] += 1
+    data, source = await asyncio.shield(task)
+    if data is not None: TILE_MEM.put(key, {"body": data})
+    return data, source
+
+@app.get("/api/tiles/{layer}/{z}/{x}/{y}")
+async def get_tile_image(layer: str, z: int, x: int, y: int):
+    """VWorld WMTS 타일 프록시 (메모리 → MBTiles → VWorld)"""
+    if layer not in TILE_LAYERS:
+        return JSONResponse(status_code=404, content={"error": f"레이어 없음: {layer}"})
+    if not (0 <= z <= TILE_MAX_ZOOM and 0 <= x < (1 << z) and 0 <= y < (1 << z)):
+        return JSONResponse(status_code=400, content={"error": "타일 좌표 범위 오류"})
+    try:
+        data, source = await get_tile(layer, z, x, y)
+    except Exception as e:
+        TILE_STATS["errors"] += 1
+        log.warning("타일 조회 실패 %s/%s/%s/%s: %s", layer, z, x, y, str(e) or type(e).__name__)
+        return JSONResponse(status_code=502, content={"error": f"타일 조회 실패: {type(e).__name__}"})
+    if data is None:
+        return JSONResponse(status_code=503, content={"error": "VWorld 키 미설정"})
+    return Response(content=data, media_type=f"image/{TILE_LAYERS[layer]}",
+                    headers={"Cache-Control": f"public, max-age={TILE_BROWSER_TTL}", "X-Tile-Cache": source})
+
+@app.get("/api/tiles/stats")
+async def get_tile_stats():
+    """타일 캐시 통계"""
+    disk = await asyncio.to_thread(TILE_STORE.stats)
+    return {"status": "success", **TILE_STATS, "memory": TILE_MEM.stats(), "inflight": len(_tile_inflight),
+            "disk": {layer: {"tiles": n, "bytes": b} for layer, (n, b) in disk.items()}}
+
+async def seed_tiles(layers: list, zooms: list, bbox: tuple = SEOUL_BBOX, concurrency: int = 8, progress=print) -> dict:
+    """bbox 범위 타일을 미리 받아 MBTiles 에 저장 (이미 있는 타일은 건너뜀)"""
+    min_lat, min_lng, max_lat, max_lng = bbox
+    sem = asyncio.Semaphore(concurrency)
+    result = {"fetched": 0, "skipped": 0, "failed": 0}
+    for layer in layers:
+        for z in zooms:
+            x0, y0 = lnglat_to_tile(max_lat, min_lng, z)
+            x1, y1 = lnglat_to_tile(min_lat, max_lng, z)
+            have = await asyncio.to_thread(TILE_STORE.existing, layer, z, x0, x1, y0, y1)
+            todo = [(x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1) if (x, y) not in have]
+            result["skipped"] += (x1 - x0 + 1) * (y1 - y0 + 1) - len(todo)
+            batch = []
+
+            async def fetch(x, y):
+                async with sem:
+                    try:
+                        batch.append((z, x, y, await _fetch_tile_upstream(layer, z, x, y)))
+                    except Exception:
+                        result["failed"] += 1
+
+            for i in range(0, len(todo), 256):
+                await asyncio.gather(*[fetch(x, y) for x, y in todo[i:i + 256]])
+                if batch:
+                    await asyncio.to_thread(TILE_STORE.put_many, layer, batch)
+                    result["fetched"] += len(batch)
+                    batch.clear()
+            progress(f"  {layer} z{z}: {len(todo)}개 대상, 누적 {result}")
+    return result
 
 # ============================================
 #  Claude AI 분석
 # ============================================
+ANALYZE_CONCURRENCY       = int(os.getenv("ANALYZE_CONCURRENCY", "4"))       # 동시 Claude 호출 수
+ANALYZE_QUEUE_MAX         = int(os.getenv("ANALYZE_QUEUE_MAX", "32"))        # 대기열 한도 (초과 시 429)
+ANALYZE_QUEUE_TIMEOUT     = float(os.getenv("ANALYZE_QUEUE_TIMEOUT", "60"))  # 대기 최대 시간 (초)
+ANALYZE_BATCH_CONCURRENCY = int(os.getenv("ANALYZE_BATCH_CONCURRENCY", "3"))
+ANALYZE_BATCH_MAX         = int(os.getenv("ANALYZE_BATCH_MAX", "200"))
+CACHE_TTL["analyze"] = _cache_ttl("analyze", 7 * 86400, 0)
+
+class AnalyzeBusy(Exception):
+    pass
+
+class ConcurrencyLimiter:
+    """전역 동시 실행 제한 + 대기열 (대기열이 차거나 대기 시간이 지나면 AnalyzeBusy)"""
+    def __init__(self, limit: int, queue_max: int, timeout: float):
+        self.limit, self.queue_max, self.timeout = limit, queue_max, timeout
+        self._sem = asyncio.Semaphore(limit)
+        self.active = self.waiting = self.rejected = self.timeouts = self.completed = 0
+
+    def full(self) -> bool:
+        return self.active >= self.limit and self.waiting >= self.queue_max
+
+    @asynccontextmanager
+    async def slot(self):
+        if self.full():
+            self.rejected += 1
+            raise AnalyzeBusy("분석 요청 대기열 초과, 잠시 후 다시 시도")
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._sem.acquire(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise AnalyzeBusy("분석 대기 시간 초과")
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self.completed += 1
+            self._sem.release()
+
+    def stats(self) -> dict:
+        return {"limit": self.limit, "queue_max": self.queue_max, "active": self.active, "waiting": self.waiting,
+                "completed": self.completed, "rejected": self.rejected, "timeouts": self.timeouts}
+
+ANALYZE_LIMITER = ConcurrencyLimiter(ANALYZE_CONCURRENCY, ANALYZE_QUEUE_MAX, ANALYZE_QUEUE_TIMEOUT)
+ANTHROPIC_HEADERS = {"Content-Type":"application/json","x-api-key":ANTHROPIC_API_KEY,"anthropic-version":"2023-06-01"}
+
+def _analysis_payload(body: dict) -> dict:
+    payload = {"model":body.get("model","claude-sonnet-4-20250514"),"max_tokens":body.get("max_tokens",1000),"messages":body.get("messages",[])}
+    if body.get("system"): payload["system"] = body["system"]
+    return payload
+
+def _analysis_key(payload: dict) -> tuple:
+    """모델+메시지 내용 해시 캐시 키"""
+    return ("analyze", hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode()).hexdigest())
+
+def _analysis_ok(data) -> bool:
+    return isinstance(data, dict) and data.get("type") == "message" and data.get("stop_reason") != "error"
+
+async def _call_messages(payload: dict) -> dict:
+    async with ANALYZE_LIMITER.slot():
+        r = await upstream("anthropic").post(f"{ANTHROPIC_BASE_URL}/v1/messages", headers=ANTHROPIC_HEADERS, json=payload)
+    return r.json()
+
+async def _analyze_cached(payload: dict) -> dict:
+    ttl, stale = CACHE_TTL["analyze"]
+    return await RESPONSE_CACHE.get(_analysis_key(payload), lambda: _call_messages(payload), ttl, stale, _analysis_ok)
+
+def _replay_sse(message: dict):
+    """캐시된 메시지를 Messages API 스트리밍 이벤트 형식으로 재생"""
+    yield _sse("message_start", {"type": "message_start", "message": {**message, "content": [], "stop_reason": None}})
+    for i, block in enumerate(message.get("content", [])):
+        yield _sse("content_block_start", {"type": "content_block_start", "index": i, "content_block": {"type": "text", "text": ""}})
+        yield _sse("content_block_delta", {"type": "content_block_delta", "index": i, "delta": {"type": "text_delta", "text": block.get("text", "")}})
+        yield _sse("content_block_stop", {"type": "content_block_stop", "index": i})
+    yield _sse("message_delta", {"type": "message_delta", "delta": {"stop_reason": message.get("stop_reason"), "stop_sequence": None}, "usage": message.get("usage", {})})
+    yield _sse("message_stop", {"type": "message_stop"})
+
+async def _stream_analysis(payload: dict, use_cache: bool):
+    """업스트림 SSE 를 받는 즉시 그대로 중계하면서, 완료되면 최종 메시지를 조립해 캐시에 저장"""
+    key = _analysis_key(payload)
+    hit = RESPONSE_CACHE.get_cached(key) if use_cache else None
+    if hit is not None:
+        for chunk in _replay_sse(hit): yield chunk
+        return
+    try:
+        async with ANALYZE_LIMITER.slot():
+            c = upstream("anthropic")
+            r = await c.send(c.build_request("POST", f"{ANTHROPIC_BASE_URL}/v1/messages", headers=ANTHROPIC_HEADERS,
+                                             json={**payload, "stream": True}), stream=True)
+            try:
+                if r.status_code != 200:
+                    body = (await r.aread()).decode("utf-8", "replace")
+                    try: err = json.loads(body)
+                    except ValueError: err = {"type": "error", "error": {"type": "upstream_error", "message": body[:500]}}
+                    yield _sse("error", err)
+                    return
+                message, texts, pending = None, {}, ""
+                async for chunk in r.aiter_text():
+                    yield chunk
+                    pending += chunk
+                    *lines, pending = pending.split("\n")
+                    for line in lines:
+                        if not line.startswith("data:"): continue
+                        try: ev = json.loads(line[5:])
+                        except ValueError: continue
+                        t = ev.get("type")
+                        if t == "message_start": message = ev["message"]
+                        elif t == "content_block_delta" and ev.get("delta", {}).get("type") == "text_delta":
+                            texts[ev["index"]] = texts.get(ev["index"], "") + ev["delta"]["text"]
+                        elif t == "message_delta" and message is not None:
+                            message.update(ev.get("delta", {}))
+                            message["usage"] = {**message.get("usage", {}), **ev.get("usage", {})}
+                        elif t == "message_stop" and message is not None and use_cache:
+                            message["content"] = [{"type": "text", "text": texts[i]} for i in sorted(texts)]
+                            ttl, stale = CACHE_TTL["analyze"]
+                            RESPONSE_CACHE.set(key, message, ttl, stale)
+            finally:
+                await r.aclose()
+    except AnalyzeBusy as e:
+        yield _sse("error", {"type": "error", "error": {"type": "overloaded_error", "message": str(e)}})
+    except httpx.HTTPError as e:
+        log.warning("Claude 스트리밍 실패: %s", type(e).__name__)
+        yield _sse("error", {"type": "error", "error": {"type": "upstream_error", "message": type(e).__name__}})
+
+def _segment_prompt(rec: dict) -> str:
+    """구간 심화 분석 프롬프트 (index.html deepAnalyze 와 동일 형식)"""
+    f = rec["features"]
+    return ("당신은 40년 경력의 도로포장 전문가입니다.\n\n"
+            f"구간: {rec['name']} (서울시)\n추천: {rec['recommendation']} 포장, 위험점수: {rec['risk_score']:g}/100\n"
+            f"경사도: {f['slope']:g}%, 폭우: {f['rain_days']:g}회/년, 사고: {f['accidents']:g}건/년\n"
+            f"교통량: {f['traffic']:g}대/일, 불투수면: {f['impervious']:g}%\n\n"
+            '심화 분석을 JSON으로:\n{"alternatives":[{"name":"대안명","pros":"장점","cons":"단점"}],"phasing":"시공전략","maintenance":"유지보수","similar_cases":"유사사례","budget_note":"예산전략"}')
+
 @app.post("/api/analyze")
 async def analyze(request: Request):
+    """Claude 분석 - body.stream=true 면 SSE 로 토큰 단위 중계, 동일 요청은 캐시 응답"""
     body = await request.json()
     if ANTHROPIC_API_KEY == "여기에_API_키_입력":
         return JSONResponse(status_code=400, content={"error": "API 키 미설정"})
-    async with httpx.AsyncClient(timeout=60.0) as c:
-        r = await c.post("https://api.anthropic.com/v1/messages", headers={"Content-Type":"application/json","x-api-key":ANTHROPIC_API_KEY,"anthropic-version":"2023-06-01"},
-            json={"model":body.get("model","claude-sonnet-4-20250514"),"max_tokens":body.get("max_tokens",1000),"messages":body.get("messages",[])})
-        return r.json()
+    payload = _analysis_payload(body)
+    use_cache = body.get("cache", True) is not False
+    if body.get("stream"):
+        if ANALYZE_LIMITER.full():
+            return JSONResponse(status_code=429, content={"error": "분석 요청 대기열 초과, 잠시 후 다시 시도"})
+        return StreamingResponse(_stream_analysis(payload, use_cache), media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    try:
+        return await _analyze_cached(payload) if use_cache else await _call_messages(payload)
+    except AnalyzeBusy as e:
+        return JSONResponse(status_code=429, content={"error": str(e)})
+
+@app.post("/api/analyze/batch")
+async def analyze_batch(request: Request):
+    """여러 구간 일괄 분석 (병렬 수 제한)
+    body.items: [{"id":..., "messages":[...]}] 또는 body.segment_ids: 적재된 구간 ID 목록(심화 분석 프롬프트 자동 생성)"""
+    body = await request.json()
+    if ANTHROPIC_API_KEY == "여기에_API_키_입력":
+        return JSONResponse(status_code=400, content={"error": "API 키 미설정"})
+    items = list(body.get("items", []))
+    if body.get("segment_ids"):
+        res = SEGMENTS.scored()
+        pos = {sid: i for i, sid in enumerate(SEGMENTS.ids)}
+        for sid in body["segment_ids"]:
+            if sid in pos:
+                items.append({"id": sid, "messages": [{"role": "user", "content": _segment_prompt(SEGMENTS.record(pos[sid], res))}]})
+            else:
+                items.append({"id": sid, "error": "구간 없음"})
+    if len(items) > ANALYZE_BATCH_MAX:
+        return JSONResponse(status_code=400, content={"error": f"한 번에 최대 {ANALYZE_BATCH_MAX}건"})
+    sem = asyncio.Semaphore(max(1, min(int(body.get("concurrency", ANALYZE_BATCH_CONCURRENCY)), ANALYZE_BATCH_CONCURRENCY)))
+
+    async def run(item):
+        if item.get("error"): return {"id": item.get("id"), "status": "error", "error": item["error"]}
+        async with sem:
+            try:
+                data = await _analyze_cached(_analysis_payload({**body, **item}))
+            except Exception as e:
+                return {"id": item.get("id"), "status": "error", "error": str(e) or type(e).__name__}
+        if data.get("type") == "error":
+            return {"id": item.get("id"), "status": "error", "error": data.get("error", {}).get("message", "")}
+        return {"id": item.get("id"), "status": "ok", "text": "".join(b.get("text", "") for b in data.get("content", [])), "response": data}
+
+    results = await asyncio.gather(*[run(it) for it in items])
+    return {"status": "success", "count": len(results), "ok": sum(1 for r in results if r["status"] == "ok"), "results": results}
+
+@app.get("/api/analyze/stats")
+async def get_analyze_stats():
+    return {"status": "success", "limiter": ANALYZE_LIMITER.stats(), "base_url": ANTHROPIC_BASE_URL}
 
 # ============================================
-#  기상청 ASOS (data.go.kr)
+#  기상청 ASOS (data.go.kr) - 일/시간자료 로컬 저장소
 # ============================================
+# 장기 통계(호우일수, 월강수량, 분위수)는 업스트림 대신 로컬 SQLite 에서 계산한다.
+# 수집은 페이지 단위 병렬 + 저장소에 없는 날짜만 요청 (ingest-weather 명령 또는 /api/weather-store/ingest).
+WEATHER_DB              = os.getenv("WEATHER_DB", os.path.join(STORE_DIR, "weather.sqlite"))
+ASOS_PAGE_ROWS          = int(os.getenv("ASOS_PAGE_ROWS", "999"))          # data.go.kr 페이지당 최대 행 수
+ASOS_INGEST_CONCURRENCY = int(os.getenv("ASOS_INGEST_CONCURRENCY", "4"))   # 동시 페이지 요청 수
+HEAVY_RAIN_MM           = float(os.getenv("HEAVY_RAIN_MM", "30"))          # 호우일 기준 일강수량 (mm)
+WET_DAY_MM              = 0.1
+
+ASOS_KINDS = {
+    "daily":  {"url": f"{DATA_GO_KR_BASE_URL}/1360000/AsosDalyInfoService/getWthrDataList", "dateCd": "DAY",
+               "table": "asos_daily", "fmt": "%Y-%m-%d", "step": timedelta(days=1), "chunk": timedelta(days=366),
+               "fields": [("avg_ta", "avgTa"), ("max_ta", "maxTa"), ("min_ta", "minTa"), ("sum_rn", "sumRn"), ("avg_rhm", "avgRhm")], "rain": "sum_rn"},
+    "hourly": {"url": f"{DATA_GO_KR_BASE_URL}/1360000/AsosHourlyInfoService/getWthrDataList", "dateCd": "HR",
+               "table": "asos_hourly", "fmt": "%Y-%m-%d %H:%M", "step": timedelta(hours=1), "chunk": timedelta(days=31),
+               "fields": [("ta", "ta"), ("rn", "rn"), ("hm", "hm"), ("ws", "ws")], "rain": "rn"},
+}
+
+def _asos_num(v):
+    try: return float(v) if v not in ("", None) else None
+    except ValueError: return None
+
+class WeatherStore:
+    """ASOS 일/시간자료 저장소 - 통계용 일강수 시계열은 관측소별 numpy 배열로 메모리에 둔다"""
+    def __init__(self, path: str):
+        self.path = path
+        self._db = None
+        self._lock = threading.Lock()
+        self._series = {}   # stn -> (dates datetime64[D], rain float64)
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            for spec in ASOS_KINDS.values():
+                cols = ", ".join(f"{col} REAL" for col, _ in spec["fields"])
+                self._db.execute(f"CREATE TABLE IF NOT EXISTS {spec['table']} (stn TEXT, tm TEXT, {cols}, PRIMARY KEY (stn, tm)) WITHOUT ROWID")
+            self._db.commit()
+        return self._db
+
+    def put(self, kind: str, stn: str, items: list) -> int:
+        """업스트림 item 목록 저장 - 강수량 공란은 무강수(0)"""
+        spec = ASOS_KINDS[kind]
+        rows = []
+        for it in items:
+            if not it.get("tm"): continue
+            vals = [_asos_num(it.get(key)) for _, key in spec["fields"]]
+            vals = [0.0 if v is None and col == spec["rain"] else v for (col, _), v in zip(spec["fields"], vals)]
+            rows.append((stn, it["tm"], *vals))
+        if not rows: return 0
+        with self._lock:
+            conn = self._conn()
+            conn.executemany(f"INSERT OR REPLACE INTO {spec['table']} VALUES ({', '.join('?' * (len(spec['fields']) + 2))})", rows)
+            conn.commit()
+            if kind == "daily": self._series.pop(stn, None)
+        return len(rows)
+
+    def existing(self, kind: str, stn: str, start: datetime, end: datetime) -> set:
+        spec = ASOS_KINDS[kind]
+        with self._lock:
+            rows = self._conn().execute(f"SELECT tm FROM {spec['table']} WHERE stn=? AND tm BETWEEN ? AND ?",
+                                        (stn, start.strftime(spec["fmt"]), end.strftime(spec["fmt"]))).fetchall()
+        return {r[0] for r in rows}
+
+    def rows(self, kind: str, stn: str, start: datetime, end: datetime) -> list:
+        spec = ASOS_KINDS[kind]
+        with self._lock:
+            return self._conn().execute(f"SELECT * FROM {spec['table']} WHERE stn=? AND tm BETWEEN ? AND ? ORDER BY tm",
+                                        (stn, start.strftime(spec["fmt"]), end.strftime(spec["fmt"]))).fetchall()
+
+    def coverage(self) -> dict:
+        with self._lock:
+            conn = self._conn()
+            return {kind: [{"station": s, "first": a, "last": b, "count": n} for s, a, b, n in
+                           conn.execute(f"SELECT stn, MIN(tm), MAX(tm), COUNT(*) FROM {spec['table']} GROUP BY stn").fetchall()]
+                    for kind, spec in ASOS_KINDS.items()}
+
+    def series(self, stn: str) -> tuple:
+        with self._lock:
+            s = self._series.get(stn)
+            if s is None:
+                rows = self._conn().execute("SELECT tm, sum_rn FROM asos_daily WHERE stn=? ORDER BY tm", (stn,)).fetchall()
+                s = self._series[stn] = (np.array([r[0] for r in rows], dtype="datetime64[D]"),
+                                         np.array([r[1] or 0.0 for r in rows], dtype=np.float64))
+        return s
+
+    def _window(self, stn: str, start_year=None, end_year=None) -> tuple:
+        dates, rain = self.series(stn)
+        years = dates.astype("datetime64[Y]").astype(np.int64) + 1970
+        m = np.ones(len(dates), dtype=bool)
+        if start_year: m &= years >= int(start_year)
+        if end_year: m &= years <= int(end_year)
+        return dates[m], rain[m], years[m]
+
+    def heavy_rain_days(self, stn: str, threshold: float = HEAVY_RAIN_MM, start_year=None, end_year=None):
+        """연도별 호우일수 (일강수량 >= threshold)"""
+        _, rain, years = self._window(stn, start_year, end_year)
+        if not len(rain): return None
+        base = int(years.min())
+        observed = np.bincount(years - base)
+        heavy = np.bincount(years - base, weights=rain >= threshold, minlength=len(observed))
+        idx = np.nonzero(observed)[0]
+        return {"threshold_mm": threshold, "years": len(idx), "annual_mean": round(float(heavy[idx].mean()), 1),
+                "by_year": [{"year": base + int(i), "days": int(heavy[i]), "observed_days": int(observed[i])} for i in idx]}
+
+    def monthly_totals(self, stn: str, start_year=None, end_year=None):
+        """연-월별 강수량 합계와 월별 평년값"""
+        dates, rain, _ = self._window(stn, start_year, end_year)
+        if not len(rain): return None
+        months = dates.astype("datetime64[M]").astype(np.int64)
+        base = int(months.min())
+        totals = np.bincount(months - base, weights=rain)
+        idx = np.nonzero(np.bincount(months - base))[0]
+        cal = (base + idx) % 12
+        counts = np.bincount(cal, minlength=12)
+        mean = np.bincount(cal, weights=totals[idx], minlength=12) / np.maximum(counts, 1)
+        by_year = {}
+        for i, c in zip(idx, cal):
+            by_year.setdefault(1970 + (base + int(i)) // 12, [None] * 12)[c] = round(float(totals[i]), 1)
+        return {"monthly_mean": [round(float(v), 1) if n else None for v, n in zip(mean, counts)],
+                "by_year": [{"year": y, "monthly": v} for y, v in sorted(by_year.items())]}
+
+    def percentiles(self, stn: str, q: list, wet_only: bool = True, start_year=None, end_year=None):
+        """일강수량 분위수 (wet_only: 0.1mm 이상 강수일만)"""
+        _, rain, _ = self._window(stn, start_year, end_year)
+        if wet_only: rain = rain[rain >= WET_DAY_MM]
+        if not len(rain): return None
+        return {"days": int(len(rain)), "wet_only": wet_only, "max": float(rain.max()),
+                "percentiles": {f"p{v:g}": round(float(p), 1) for v, p in zip(q, np.percentile(rain, q))}}
+
+    def close(self):
+        with self._lock:
+            if self._db is not None: self._db.close()
+            self._db = None
+            self._series.clear()
+
+WEATHER_STORE = WeatherStore(WEATHER_DB)
+
+async def asos_fetch_range(kind: str, stn: str, start: datetime, end: datetime, sem: asyncio.Semaphore = None) -> list:
+    """기간 전체 조회 - 첫 페이지의 totalCount 로 나머지 페이지를 병렬 요청"""
+    spec = ASOS_KINDS[kind]
+    params = {"serviceKey": DATA_GO_KR_KEY, "numOfRows": str(ASOS_PAGE_ROWS), "dataType": "JSON", "dataCd": "ASOS",
+              "dateCd": spec["dateCd"], "stnIds": stn, "startDt": start.strftime("%Y%m%d"), "endDt": end.strftime("%Y%m%d")}
+    if kind == "hourly": params.update(startHh=start.strftime("%H"), endHh=end.strftime("%H"))
+    sem = sem or asyncio.Semaphore(ASOS_INGEST_CONCURRENCY)
+
+    async def page(n: int):
+        async with sem:
+            r = await upstream_get("datagokr", spec["url"], {**params, "pageNo": str(n)})
+        body = _datagokr_check(r.json()).get("response", {}).get("body", {})
+        items = (body.get("items") or {}).get("item", []) or []
+        return [items] if isinstance(items, dict) else items, int(body.get("totalCount") or 0)
+
+    items, total = await page(1)
+    for more, _ in await asyncio.gather(*[page(n) for n in range(2, -(-total // ASOS_PAGE_ROWS) + 1)]):
+        items.extend(more)
+    return items
+
+def _missing_ranges(kind: str, start: datetime, end: datetime, have: set) -> list:
+    """저장소에 없는 시점을 연속 구간으로 묶고 요청 단위(chunk)로 자른다"""
+    spec = ASOS_KINDS[kind]
+    ranges, t, run = [], start, None
+    while t <= end:
+        if t.strftime(spec["fmt"]) in have:
+            run = None
+        elif run is None or t - run[0] >= spec["chunk"]:
+            run = [t, t]; ranges.append(run)
+        else:
+            run[1] = t
+        t += spec["step"]
+    return [tuple(r) for r in ranges]
+
+def _asos_last_available(kind: str) -> datetime:
+    """ASOS 일/시간자료는 전일까지만 제공"""
+    y = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=1)
+    return y if kind == "daily" else y.replace(hour=23)
+
+async def ingest_asos(stations: list, start: datetime, end: datetime, kind: str = "daily",
+                      concurrency: int = ASOS_INGEST_CONCURRENCY, progress=print) -> dict:
+    """관측소 x 기간 수집 - 저장소에 없는 날짜(시각)만 요청하고 구간별로 바로 저장"""
+    end = min(end, _asos_last_available(kind))
+    sem = asyncio.Semaphore(max(1, concurrency))
+    result = {"kind": kind, "requests": 0, "fetched": 0, "stored": 0, "skipped": 0, "errors": []}
+
+    async def run(stn, a, b):
+        try:
+            items = await asos_fetch_range(kind, stn, a, b, sem)
+            stored = await asyncio.to_thread(WEATHER_STORE.put, kind, stn, items)
+            result["fetched"] += len(items)
+            result["stored"] += stored
+        except Exception as e:
+            result["errors"].append({"station": stn, "start": a.strftime("%Y%m%d"), "end": b.strftime("%Y%m%d"), "error": str(e) or type(e).__name__})
+
+    async def station(stn):
+        have = await asyncio.to_thread(WEATHER_STORE.existing, kind, stn, start, end)
+        ranges = _missing_ranges(kind, start, end, have)
+        result["skipped"] += len(have)
+        result["requests"] += len(ranges)
+        await asyncio.gather(*[run(stn, a, b) for a, b in ranges])
+        progress(f"  {stn} ({kind}): 구간 {len(ranges)}개, 누적 저장 {result['stored']}행, 오류 {len(result['errors'])}건")
+
+    await asyncio.gather(*[station(stn) for stn in stations])
+    return result
+
+def _weather_row(kind: str, row: tuple) -> dict:
+    """저장소 행 → 기존 API 응답 형식"""
+    fmt = lambda v: "" if v is None else f"{v:g}"
+    if kind == "daily":
+        return {"date": row[1], "avg_temp": fmt(row[2]), "max_temp": fmt(row[3]), "min_temp": fmt(row[4]), "rain_total": fmt(row[5]), "avg_humidity": fmt(row[6])}
+    return {"time": row[1], "temp": fmt(row[2]), "rain": fmt(row[3]), "humidity": fmt(row[4]), "wind_speed": fmt(row[5])}
+
+async def _from_store(kind: str, stn: str, start: datetime, end: datetime):
+    """요청 기간이 저장소에 모두 있으면 그 행을, 아니면 None"""
+    rows = await asyncio.to_thread(WEATHER_STORE.rows, kind, stn, start, end)
+    expected = int((end - start) / ASOS_KINDS[kind]["step"]) + 1
+    return [_weather_row(kind, r) for r in rows] if rows and len(rows) >= expected else None
+
+async def _fetch_weather(station_id: str, date: str):
+    day = datetime.strptime(date, "%Y%m%d")
+    raw = await asos_fetch_range("hourly", station_id, day, day.replace(hour=23))
+    await asyncio.to_thread(WEATHER_STORE.put, "hourly", station_id, raw)
+    items = [{"time":item.get("tm",""),"temp":item.get("ta",""),"rain":item.get("rn",""),"humidity":item.get("hm",""),"wind_speed":item.get("ws","")} for item in raw]
+    return {"status":"live","station_id":station_id,"date":date,"count":len(items),"data":items}
+
 @app.get("/api/weather/{station_id}")
 async def get_weather(station_id: str, date: str = ""):
     """ASOS 시간자료 - station_id: 108=서울"""
-    if DATA_GO_KR_KEY:
-        if not date: date = (datetime.now() - timedelta(days=1)).strftime("%Y%m%d")
-        try:
-            async with httpx.AsyncClient(timeout=30.0) as c:
-                r = await c.get("http://apis.data.go.kr/1360000/AsosHourlyInfoService/getWthrDataList",
-                    params={"serviceKey":DATA_GO_KR_KEY,"numOfRows":"24","pageNo":"1","dataType":"JSON","dataCd":"ASOS","dateCd":"HR","stnIds":station_id,"startDt":date,"startHh":"00","endDt":date,"endHh":"23"})
-                data = r.json()
-                items = []
-                try:
-                    for item in data["response"]["body"]["items"]["item"]:
-                        items.append({"time":item.get("tm",""),"temp":item.get("ta",""),"rain":item.get("rn",""),"humidity":item.get("hm",""),"wind_speed":item.get("ws","")})
-                except: pass
-                return {"status":"live","station_id":station_id,"date":date,"count":len(items),"data":items}
-        except Exception as e:
-            return {"status":"error","message":str(e)}
+    if not date: date = (datetime.now() - timedelta(days=1)).strftime("%Y%m%d")
+    try:
+        day = datetime.strptime(date, "%Y%m%d")
+        items = await _from_store("hourly", station_id, day, day.replace(hour=23))
+        if items is not None:
+            return {"status":"live","source":"store","station_id":station_id,"date":date,"count":len(items),"data":items}
+        if DATA_GO_KR_KEY:
+            return await cached("weather", _fetch_weather, station_id=station_id, date=date)
+    except Exception as e:
+        return {"status":"error","message":str(e)}
+    heavy = await asyncio.to_thread(WEATHER_STORE.heavy_rain_days, station_id)
+    if heavy:
+        monthly = await asyncio.to_thread(WEATHER_STORE.monthly_totals, station_id)
+        return {"status":"store","data":{"station_id":station_id,"years":heavy["years"],"annual_heavy_rain_days":heavy["annual_mean"],"monthly_rain":monthly["monthly_mean"]}}
     return {"status":"sample","data":{"station_id":station_id,"annual_heavy_rain_days":42,"monthly_rain":[22,28,45,62,88,133,394,348,145,52,35,18]}}
 
+async def _fetch_weather_daily(station_id: str, start_date: str, end_date: str):
+    raw = await asos_fetch_range("daily", station_id, datetime.strptime(start_date, "%Y%m%d"), datetime.strptime(end_date, "%Y%m%d"))
+    await asyncio.to_thread(WEATHER_STORE.put, "daily", station_id, raw)
+    items = [{"date":item.get("tm",""),"avg_temp":item.get("avgTa",""),"max_temp":item.get("maxTa",""),"min_temp":item.get("minTa",""),"rain_total":item.get("sumRn",""),"avg_humidity":item.get("avgRhm","")} for item in raw]
+    return {"status":"live","period":f"{start_date}~{end_date}","count":len(items),"data":items}
+
 @app.get("/api/weather-daily/{station_id}")
 async def get_weather_daily(station_id: str, start_date: str = "", end_date: str = ""):
-    """ASOS 일자료"""
-    if DATA_GO_KR_KEY:
-        if not end_date: end_date = (datetime.now() - timedelta(days=1)).strftime("%Y%m%d")
-        if not start_date: start_date = (datetime.now() - timedelta(days=30)).strftime("%Y%m%d")
+    """ASOS 일자료 - 저장소에 있는 기간은 로컬에서, 없으면 전체 페이지를 받아 저장"""
+    if not end_date: end_date = (datetime.now() - timedelta(days=1)).strftime("%Y%m%d")
+    if not start_date: start_date = (datetime.now() - timedelta(days=30)).strftime("%Y%m%d")
+    try:
+        items = await _from_store("daily", station_id, datetime.strptime(start_date, "%Y%m%d"), datetime.strptime(end_date, "%Y%m%d"))
+        if items is not None:
+            return {"status":"live","source":"store","period":f"{start_date}~{end_date}","count":len(items),"data":items}
+        if DATA_GO_KR_KEY:
+            return await cached("weather_daily", _fetch_weather_daily, station_id=station_id, start_date=start_date, end_date=end_date)
+    except Exception as e:
+        return {"status":"error","message":str(e)}
+    return {"status":"sample","message":"data.go.kr 키 미설정"}
+
+# ---------- 저장소 통계 / 수집 API ----------
+def _store_stat(result):
+    if result is None:
+        return JSONResponse(status_code=404, content={"status": "empty", "message": "저장소에 해당 관측소 일자료 없음 (ingest-weather 로 수집)"})
+    return {"status": "success", **result}
+
+@app.get("/api/weather-stats/{station_id}/heavy-rain-days")
+async def get_heavy_rain_days(station_id: str, threshold: float = HEAVY_RAIN_MM, start_year: int = 0, end_year: int = 0):
+    return _store_stat(await asyncio.to_thread(WEATHER_STORE.heavy_rain_days, station_id, threshold, start_year, end_year))
+
+@app.get("/api/weather-stats/{station_id}/monthly")
+async def get_monthly_rain(station_id: str, start_year: int = 0, end_year: int = 0):
+    return _store_stat(await asyncio.to_thread(WEATHER_STORE.monthly_totals, station_id, start_year, end_year))
+
+@app.get("/api/weather-stats/{station_id}/percentiles")
+async def get_rain_percentiles(station_id: str, q: str = "50,90,95,99", wet_only: bool = True, start_year: int = 0, end_year: int = 0):
+    try: qs = [float(v) for v in q.split(",") if v.strip()]
+    except ValueError: raise HTTPException(400, "q 는 쉼표 구분 숫자 (예: 50,90,99)")
+    if not qs or any(not 0 <= v <= 100 for v in qs): raise HTTPException(400, "q 는 0~100")
+    return _store_stat(await asyncio.to_thread(WEATHER_STORE.percentiles, station_id, qs, wet_only, start_year, end_year))
+
+INGEST_JOBS: dict = {}   # job_id -> 백그라운드 수집 작업 상태 (ASOS/TAAS 공용)
+
+def start_ingest_job(job_id: str, meta: dict, work) -> dict:
+    """같은 작업이 돌고 있으면 그대로 두고, 아니면 work(progress) 코루틴을 백그라운드로 실행"""
+    job = INGEST_JOBS.get(job_id)
+    if job and job["status"] == "running":
+        return {"status": "running", "job_id": job_id}
+    job = INGEST_JOBS[job_id] = {"status": "running", **meta, "started_at": datetime.now().isoformat(timespec="seconds"), "log": []}
+
+    async def run():
         try:
-            async with httpx.AsyncClient(timeout=30.0) as c:
-                r = await c.get("http://apis.data.go.kr/1360000/AsosDalyInfoService/getWthrDataList",
-                    params={"serviceKey":DATA_GO_KR_KEY,"numOfRows":"31","pageNo":"1","dataType":"JSON","dataCd":"ASOS","dateCd":"DAY","stnIds":station_id,"startDt":start_date,"endDt":end_date})
-                data = r.json()
-                items = []
-                try:
-                    for item in data["response"]["body"]["items"]["item"]:
-                        items.append({"date":item.get("tm",""),"avg_temp":item.get("avgTa",""),"max_temp":item.get("maxTa",""),"min_temp":item.get("minTa",""),"rain_total":item.get("sumRn",""),"avg_humidity":item.get("avgRhm","")})
-                except: pass
-                return {"status":"live","period":f"{start_date}~{end_date}","count":len(items),"data":items}
+            job["result"] = await work(lambda msg: job["log"].append(msg.strip()))
+            job["status"] = "done"
         except Exception as e:
-            return {"status":"error","message":str(e)}
-    return {"status":"sample","message":"data.go.kr 키 미설정"}
+            job["status"], job["error"] = "error", str(e) or type(e).__name__
+            log.exception("수집 작업 실패 %s", job_id)
+        job.pop("task", None)
+
+    job["task"] = asyncio.create_task(run())
+    return {"status": "started", "job_id": job_id}
+
+def ingest_jobs(source: str) -> dict:
+    return {k: {kk: vv for kk, vv in j.items() if kk != "task"} for k, j in INGEST_JOBS.items() if j["source"] == source}
+
+@app.get("/api/weather-store")
+async def get_weather_store():
+    return {"status": "success", "path": WEATHER_DB, "coverage": await asyncio.to_thread(WEATHER_STORE.coverage), "jobs": ingest_jobs("asos")}
+
+@app.post("/api/weather-store/ingest")
+async def post_weather_ingest(request: Request):
+    """백그라운드 수집 시작 - {"stations": ["108"], "start_year": 1995, "end_year": 2024, "kind": "daily"}"""
+    if not DATA_GO_KR_KEY:
+        return JSONResponse(status_code=400, content={"status": "error", "message": "data.go.kr 키 미설정"})
+    body = await request.json()
+    kind = body.get("kind", "daily")
+    if kind not in ASOS_KINDS: raise HTTPException(400, "kind 는 daily 또는 hourly")
+    stations = [str(s) for s in body.get("stations") or RAIN_NETWORK.ids]
+    now = datetime.now()
+    start = datetime(int(body.get("start_year", now.year - 10)), 1, 1)
+    end = datetime(int(body.get("end_year", now.year)), 12, 31, 23)
+    concurrency = int(body.get("concurrency", ASOS_INGEST_CONCURRENCY))
+    job_id = hashlib.sha1(f"asos|{kind}|{','.join(stations)}|{start:%Y}|{end:%Y}".encode()).hexdigest()[:12]
+    return start_ingest_job(job_id, {"source": "asos", "kind": kind, "stations": stations, "start": f"{start:%Y%m%d}", "end": f"{end:%Y%m%d}"},
+                            lambda progress: ingest_asos(stations, start, end, kind, concurrency, progress))
+
+@app.get("/api/ingest/{job_id}")
+@app.get("/api/weather-store/ingest/{job_id}")
+async def get_ingest_job(job_id: str):
+    job = INGEST_JOBS.get(job_id)
+    if job is None: raise HTTPException(404, "작업 없음")
+    return {"job_id": job_id, **{k: v for k, v in job.items() if k != "task"}}
 
 # ============================================
-#  TAAS 교통사고 (data.go.kr)
+#  TAAS 교통사고 (data.go.kr) - 시도 x 연도 로컬 저장소
 # ============================================
+# 시도 x 연도 단위로 수집해 SQLite 에 두고, 지역/연도/사고유형별 집계는 메모리에서 바로 응답.
+# 수집 단위마다 작업 상태(done/empty/error)를 남겨 중단 후 다시 실행하면 남은 것만 이어서 받는다.
+TAAS_URL                = f"{DATA_GO_KR_BASE_URL}/B552061/AccidentDeath/getRestTrafficAccidentDeath"
+ACCIDENT_DB             = os.getenv("ACCIDENT_DB", os.path.join(STORE_DIR, "accidents.sqlite"))
+TAAS_PAGE_ROWS          = int(os.getenv("TAAS_PAGE_ROWS", "100"))
+TAAS_INGEST_CONCURRENCY = int(os.getenv("TAAS_INGEST_CONCURRENCY", "6"))
+ACCIDENT_ROLLUP_CACHE   = int(os.getenv("ACCIDENT_ROLLUP_CACHE", "256"))   # 메모리에 둘 집계 결과 수 (필터 조합별)
+SIDO_CODES = {"11": "서울", "26": "부산", "27": "대구", "28": "인천", "29": "광주", "30": "대전", "31": "울산", "36": "세종",
+              "41": "경기", "42": "강원", "43": "충북", "44": "충남", "45": "전북", "46": "전남", "47": "경북", "48": "경남", "50": "제주"}
+ACCIDENT_METRICS = ("accidents", "deaths", "injuries")
+ACCIDENT_GROUPS = ("region", "year", "type")
+
+def _taas_check(data):
+    """TAAS 는 헤더 없이 최상위 resultCode 로 응답 (00=정상, 03=데이터 없음)"""
+    code = str(data.get("resultCode", "00")) if isinstance(data, dict) else "?"
+    if code not in ("00", "03"):
+        raise RuntimeError(f"TAAS {code}: {data.get('resultMsg', 'unexpected response') if isinstance(data, dict) else 'unexpected response'}")
+    return data
+
+def _accident_item(item: dict) -> dict:
+    num = lambda v: int(float(v)) if v not in ("", None) else 0
+    return {"type": item.get("acc_ty_nm", ""), "accidents": num(item.get("occrrnc_cnt")),
+            "deaths": num(item.get("dth_dnv_cnt")), "injuries": num(item.get("injpsn_cnt"))}
+
+async def taas_fetch_all(region_code: str, year: str, sem: asyncio.Semaphore = None) -> tuple:
+    """시도 x 연도 전체 페이지 조회 → (item 목록, 원본 페이지 목록)"""
+    params = {"serviceKey": DATA_GO_KR_KEY, "searchYearCd": year, "siDo": region_code, "numOfRows": str(TAAS_PAGE_ROWS), "type": "json"}
+    sem = sem or asyncio.Semaphore(TAAS_INGEST_CONCURRENCY)
+
+    async def page(n: int):
+        async with sem:
+            r = await upstream_get("datagokr", TAAS_URL, {**params, "pageNo": str(n)})
+        data = _taas_check(r.json())
+        items = (data.get("items") or {}).get("item", []) or []
+        return [items] if isinstance(items, dict) else items, int(data.get("totalCount") or 0), data
+
+    items, total, first = await page(1)
+    pages = [first]
+    for more, _, data in await asyncio.gather(*[page(n) for n in range(2, -(-total // TAAS_PAGE_ROWS) + 1)]):
+        items.extend(more); pages.append(data)
+    return items, pages
+
+class AccidentStore:
+    """TAAS 사고유형별 통계 저장소 + 메모리 집계 (지역/연도/유형 조합별 결과를 적재 시점까지 재사용)"""
+    def __init__(self, path: str):
+        self.path = path
+        self._db = None
+        self._lock = threading.Lock()
+        self._cols = None     # 컬럼형 사본 {"region", "year", "type": ndarray, "values": (N, 3)}
+        self._rollups = OrderedDict()   # (group_by, region, year, type) -> 집계 결과 (최근 ACCIDENT_ROLLUP_CACHE 개)
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS accidents (region TEXT, year TEXT, type TEXT, accidents INTEGER, deaths INTEGER, injuries INTEGER, "
+                             "PRIMARY KEY (region, year, type)) WITHOUT ROWID")
+            self._db.execute("CREATE TABLE IF NOT EXISTS ingest_jobs (region TEXT, year TEXT, status TEXT, rows INTEGER, attempts INTEGER, error TEXT, updated_at TEXT, "
+                             "PRIMARY KEY (region, year)) WITHOUT ROWID")
+            self._db.commit()
+        return self._db
+
+    def _mark(self, conn, region: str, year: str, status: str, rows: int = 0, error: str = ""):
+        conn.execute("INSERT INTO ingest_jobs VALUES (?, ?, ?, ?, 1, ?, ?) ON CONFLICT (region, year) DO UPDATE SET "
+                     "status=excluded.status, rows=excluded.rows, attempts=attempts+1, error=excluded.error, updated_at=excluded.updated_at",
+                     (region, year, status, rows, error, datetime.now().isoformat(timespec="seconds")))
+
+    def put(self, region: str, year: str, items: list) -> int:
+        """시도 x 연도 단위로 교체 저장 (같은 유형은 합산) 후 작업 완료 표시
+        결과가 비면 (미공표 연도, 03 응답) 기존 행은 두고 empty 로만 기록 - 다음 조회/수집 때 다시 받는다"""
+        if not items:
+            with self._lock:
+                conn = self._conn()
+                if conn.execute("SELECT 1 FROM ingest_jobs WHERE region=? AND year=? AND status='done' AND rows > 0", (region, year)).fetchone() is None:
+                    self._mark(conn, region, year, "empty")
+                    conn.commit()
+            return 0
+        totals = {}
+        for it in items:
+            rec = _accident_item(it)
+            acc = totals.setdefault(rec["type"], [0, 0, 0])
+            for i, k in enumerate(ACCIDENT_METRICS): acc[i] += rec[k]
+        with self._lock:
+            conn = self._conn()
+            conn.execute("DELETE FROM accidents WHERE region=? AND year=?", (region, year))
+            conn.executemany("INSERT INTO accidents VALUES (?, ?, ?, ?, ?, ?)", [(region, year, t, *v) for t, v in totals.items()])
+            self._mark(conn, region, year, "done", len(totals))
+            conn.commit()
+            self._cols = None
+            self._rollups.clear()
+        return len(totals)
+
+    def fail(self, region: str, year: str, error: str):
+        with self._lock:
+            conn = self._conn()
+            self._mark(conn, region, year, "error", 0, error[:500])
+            conn.commit()
+
+    def jobs(self) -> dict:
+        with self._lock:
+            return {(r, y): s for r, y, s in self._conn().execute("SELECT region, year, status FROM ingest_jobs").fetchall()}
+
+    def has(self, region: str, year: str) -> bool:
+        with self._lock:
+            row = self._conn().execute("SELECT status, rows FROM ingest_jobs WHERE region=? AND year=?", (region, year)).fetchone()
+        return bool(row) and row[0] == "done" and row[1] > 0
+
+    def _columns(self) -> dict:
+        if self._cols is None:
+            rows = self._conn().execute("SELECT region, year, type, accidents, deaths, injuries FROM accidents").fetchall()
+            self._cols = {"region": np.array([r[0] for r in rows], dtype=object), "year": np.array([r[1] for r in rows], dtype=object),
+                          "type": np.array([r[2] for r in rows], dtype=object),
+                          "values": np.array([r[3:] for r in rows], dtype=np.int64).reshape(len(rows), len(ACCIDENT_METRICS))}
+        return self._cols
+
+    def rollup(self, group_by: tuple = ("region",), region: str = "", year: str = "", type: str = "") -> list:
+        """지역/연도/유형 조합별 합계 (filter 는 쉼표 구분 다중값 허용)"""
+        key = (group_by, region, year, type)
+        with self._lock:
+            if key in self._rollups:
+                self._rollups.move_to_end(key)
+                return self._rollups[key]
+            cols = self._columns()
+            m = np.ones(len(cols["values"]), dtype=bool)
+            for name, value in (("region", region), ("year", year), ("type", type)):
+                if value: m &= np.isin(cols[name], value.split(","))
+            values = cols["values"][m]
+            if not group_by:
+                out = [dict(zip(ACCIDENT_METRICS, values.sum(axis=0).tolist()))]
+            else:
+                uniq, codes = zip(*[np.unique(cols[g][m].astype(str), return_inverse=True) for g in group_by])
+                flat = np.ravel_multi_index(codes, [len(u) for u in uniq]) if len(values) else np.zeros(0, dtype=np.int64)
+                present, inv = np.unique(flat, return_inverse=True)
+                sums = np.zeros((len(present), len(ACCIDENT_METRICS)), dtype=np.int64)
+                np.add.at(sums, inv, values)
+                idx = np.unravel_index(present, [len(u) for u in uniq]) if len(present) else [[]] * len(group_by)
+                out = []
+                for r in range(len(present)):
+                    rec = {g: str(uniq[j][idx[j][r]]) for j, g in enumerate(group_by)}
+                    if "region" in rec: rec["region_name"] = SIDO_CODES.get(rec["region"], "")
+                    out.append({**rec, **dict(zip(ACCIDENT_METRICS, sums[r].tolist()))})
+            self._rollups[key] = out
+            while len(self._rollups) > ACCIDENT_ROLLUP_CACHE: self._rollups.popitem(last=False)
+        return out
+
+    def coverage(self) -> dict:
+        with self._lock:
+            conn = self._conn()
+            jobs = conn.execute("SELECT status, COUNT(*), MIN(year), MAX(year) FROM ingest_jobs GROUP BY status").fetchall()
+            errors = conn.execute("SELECT region, year, attempts, error FROM ingest_jobs WHERE status='error' ORDER BY region, year LIMIT 50").fetchall()
+            rows = conn.execute("SELECT COUNT(*) FROM accidents").fetchone()[0]
+        return {"rows": rows, "jobs": {s: {"count": n, "first_year": a, "last_year": b} for s, n, a, b in jobs},
+                "errors": [{"region": r, "year": y, "attempts": n, "error": e} for r, y, n, e in errors]}
+
+    def close(self):
+        with self._lock:
+            if self._db is not None: self._db.close()
+            self._db, self._cols = None, None
+            self._rollups.clear()
+
+ACCIDENT_STORE = AccidentStore(ACCIDENT_DB)
+
+async def ingest_accidents(regions: list, years: list, concurrency: int = TAAS_INGEST_CONCURRENCY, force: bool = False, progress=print) -> dict:
+    """시도 x 연도 병렬 수집 - 완료된 조합은 건너뜀 (올해 자료는 매번 갱신, force 면 전부 다시)"""
+    done = {k for k, s in (await asyncio.to_thread(ACCIDENT_STORE.jobs)).items() if s == "done"}
+    this_year = str(datetime.now().year)
+    sem = asyncio.Semaphore(max(1, concurrency))
+    result = {"requested": len(regions) * len(years), "skipped": 0, "done": 0, "empty": 0, "rows": 0, "errors": []}
+
+    async def run(region, year):
+        try:
+            items, _ = await taas_fetch_all(region, year, sem)
+            rows = await asyncio.to_thread(ACCIDENT_STORE.put, region, year, items)
+            result["done" if rows else "empty"] += 1
+            result["rows"] += rows
+        except Exception as e:
+            msg = str(e) or type(e).__name__
+            await asyncio.to_thread(ACCIDENT_STORE.fail, region, year, msg)
+            result["errors"].append({"region": region, "year": year, "error": msg})
+
+    async def region_jobs(region):
+        todo = [y for y in years if force or y >= this_year or (region, y) not in done]
+        result["skipped"] += len(years) - len(todo)
+        await asyncio.gather(*[run(region, y) for y in todo])
+        progress(f"  {region} {SIDO_CODES.get(region, '')}: {len(todo)}개 연도 수집, 누적 완료 {result['done']}건, 오류 {len(result['errors'])}건")
+
+    await asyncio.gather(*[region_jobs(r) for r in regions])
+    return result
+
+async def _fetch_accident(region_code: str, year: str, raw: bool = False):
+    items, pages = await taas_fetch_all(region_code, year)
+    await asyncio.to_thread(ACCIDENT_STORE.put, region_code, year, items)
+    out = {"status":"live","region":region_code,"year":year,"count":len(items),"data":[_accident_item(it) for it in items]}
+    if raw: out["raw"] = pages[0] if len(pages) == 1 else pages
+    return out
+
 @app.get("/api/accident/{region_code}")
-async def get_accident(region_code: str, year: str = "2024"):
-    """사고유형별 교통사고 통계 - region_code: 11=서울"""
+async def get_accident(region_code: str, year: str = "2024", raw: bool = False):
+    """사고유형별 교통사고 통계 - region_code: 11=서울 (raw=true 면 업스트림 원본 포함)"""
+    if not raw and await asyncio.to_thread(ACCIDENT_STORE.has, region_code, year):
+        data = await asyncio.to_thread(ACCIDENT_STORE.rollup, ("type",), region_code, year)
+        return {"status":"live","source":"store","region":region_code,"year":year,"count":len(data),"data":data}
     if DATA_GO_KR_KEY:
         try:
-            async with httpx.AsyncClient(timeout=30.0) as c:
-                r = await c.get("http://apis.data.go.kr/B552061/AccidentDeath/getRestTrafficAccidentDeath",
-                    params={"serviceKey":DATA_GO_KR_KEY,"searchYearCd":year,"siDo":region_code,"numOfRows":"50","pageNo":"1","type":"json"})
-                data = r.json()
-                items = []
-                try:
-                    raw = data.get("items",{}).get("item",[])
-                    if isinstance(raw, dict): raw = [raw]
-                    for item in raw:
-                        items.append({"type":item.get("acc_ty_nm",""),"accidents":item.get("occrrnc_cnt",0),"deaths":item.get("dth_dnv_cnt",0),"injuries":item.get("injpsn_cnt",0)})
-                except: pass
-                return {"status":"live","region":region_code,"year":year,"count":len(items),"data":items,"raw":data}
+            return await cached("accident", _fetch_accident, cacheable=lambda v: v["count"] > 0, region_code=region_code, year=year, raw=raw)
         except Exception as e:
             return {"status":"error","message":str(e)}
     return {"status":"sample","data":{"region":region_code,"total_accidents_rainy":847,"fatalities_rainy":23,"wet_road_accident_rate":0.23,
         "top_accident_spots":[{"name":"남산순환로","count":8},{"name":"한남IC","count":9},{"name":"동작대교램프","count":7}]}}
 
+@app.get("/api/accidents/rollup")
+async def get_accident_rollup(group_by: str = "region", region: str = "", year: str = "", type: str = ""):
+    """저장소 집계 - group_by: region,year,type 중 조합 (빈 값이면 전체 합계)"""
+    groups = tuple(g for g in group_by.split(",") if g)
+    if any(g not in ACCIDENT_GROUPS for g in groups) or len(set(groups)) != len(groups):
+        raise HTTPException(400, f"group_by 는 {','.join(ACCIDENT_GROUPS)} 중 조합")
+    rows = await asyncio.to_thread(ACCIDENT_STORE.rollup, groups, region, year, type)
+    return {"status": "success", "group_by": list(groups), "count": len(rows), "data": rows}
+
+@app.get("/api/accidents/store")
+async def get_accident_store():
+    return {"status": "success", "path": ACCIDENT_DB, **(await asyncio.to_thread(ACCIDENT_STORE.coverage)), "ingest": ingest_jobs("taas")}
+
+@app.post("/api/accidents/ingest")
+async def post_accident_ingest(request: Request):
+    """백그라운드 수집 시작 - {"regions": ["11"], "start_year": 2014, "end_year": 2024, "force": false} (regions 생략 시 17개 시도)"""
+    if not DATA_GO_KR_KEY:
+        return JSONResponse(status_code=400, content={"status": "error", "message": "data.go.kr 키 미설정"})
+    body = await request.json()
+    regions = [str(r) for r in body.get("regions") or SIDO_CODES]
+    now = datetime.now().year
+    years = [str(y) for y in range(int(body.get("start_year", now - 10)), int(body.get("end_year", now - 1)) + 1)]
+    concurrency, force = int(body.get("concurrency", TAAS_INGEST_CONCURRENCY)), bool(body.get("force", False))
+    job_id = hashlib.sha1(f"taas|{','.join(regions)}|{years[0] if years else ''}|{years[-1] if years else ''}".encode()).hexdigest()[:12]
+    return start_ingest_job(job_id, {"source": "taas", "regions": regions, "years": f"{years[0]}-{years[-1]}" if years else ""},
+                            lambda progress: ingest_accidents(regions, years, concurrency, force, progress))
+
 # ============================================
 #  TOPIS 서울시 실시간 교통 (열린데이터광장 citydata API)
 # ============================================
+TRAFFIC_AREAS_FILE   = os.getenv("TRAFFIC_AREAS_FILE", os.path.join(BASE_DIR, "data", "citydata_areas.txt"))
+TRAFFIC_CONCURRENCY  = int(os.getenv("TRAFFIC_CONCURRENCY", "10"))      # citydata 동시 호출 수
+TRAFFIC_AREA_TIMEOUT = float(os.getenv("TRAFFIC_AREA_TIMEOUT", "10"))   # 지역별 전체 타임아웃 (초)
+TRAFFIC_STATUSES = ("원활", "서행", "정체")
+
+def load_traffic_areas() -> list:
+    """조회 대상 지역 - TRAFFIC_AREAS(쉼표 구분) > TRAFFIC_AREAS_FILE > 기본 3개 지역"""
+    if os.getenv("TRAFFIC_AREAS"):
+        return [a.strip() for a in os.getenv("TRAFFIC_AREAS").split(",") if a.strip()]
+    if os.path.exists(TRAFFIC_AREAS_FILE):
+        with open(TRAFFIC_AREAS_FILE, encoding="utf-8") as f:
+            areas = [l.strip() for l in f if l.strip() and not l.lstrip().startswith("#")]
+        if areas: return list(dict.fromkeys(areas))
+    return ["강남역", "서울역", "홍대입구역"]
+
+TRAFFIC_AREAS = load_traffic_areas()
+TRAFFIC_AREA_SET = set(TRAFFIC_AREAS)
+CACHE_TTL["traffic_area"] = _cache_ttl("traffic_area", 60, 120)
+_traffic_sem = asyncio.Semaphore(TRAFFIC_CONCURRENCY)
+
+def _traffic_status(speed: float) -> str:
+    """속도에 따른 상태 결정"""
+    if speed >= 40: return "원활"
+    if speed >= 20: return "서행"
+    return "정체"
+
+async def _fetch_traffic_area(area: str) -> dict:
+    async with _traffic_sem:
+        started = time.monotonic()
+        url = f"{SEOUL_DATA_BASE_URL}/{SEOUL_DATA_KEY}/json/citydata/1/5/{urllib.parse.quote(area)}/"
+        r = await asyncio.wait_for(upstream("seoul").get(url), timeout=TRAFFIC_AREA_TIMEOUT)
+        r.raise_for_status()
+        road_list = r.json().get("CITYDATA", {}).get("ROAD_TRAFFIC_STTS", {}).get("ROAD_TRAFFIC_STTS", [])
+    roads = []
+    if isinstance(road_list, list):
+        for road in road_list:
+            spd = road.get("SPD", "0")
+            road_nm = road.get("ROAD_NM", "")
+            speed = float(spd) if spd else 0
+            if road_nm:
+                roads.append({"area": area, "road_name": f"{area} {road_nm}", "speed": speed, "status": _traffic_status(speed)})
+    return {"area": area, "status": "ok" if roads else "empty", "roads": roads,
+            "elapsed_ms": round((time.monotonic() - started) * 1000), "fetched_at": datetime.now().isoformat()}
+
+async def _traffic_area_result(area: str, fresh: bool = False) -> dict:
+    """지역별 결과 - 실패해도 예외 대신 상태로 반환 (부분 응답)
+    공유 모드에서는 리더가 갱신한 결과를 쓰고, 아직 없는 지역만 직접 조회하면서 리더에 수요로 알린다
+    (수요는 등록 지역만 - 임의 문자열로 리더의 갱신 대상이 늘지 않도록)"""
+    if SHARED_SNAPSHOTS and not fresh:
+        if area in TRAFFIC_AREA_SET: SHARED.want("traffic", area)
+        res = SHARED_TRAFFIC.get(area)
+        if res is not None and SHARED.age("traffic") < sum(CACHE_TTL["traffic_area"]): return res
+    try:
+        if fresh: return await _fetch_traffic_area(area)
+        return await cached("traffic_area", _fetch_traffic_area, area=area)
+    except asyncio.TimeoutError:
+        return {"area": area, "status": "timeout", "roads": []}
+    except httpx.HTTPStatusError as e:
+        return {"area": area, "status": "error", "message": f"HTTP {e.response.status_code}", "roads": []}
+    except Exception as e:
+        # 요청 URL 에 인증키가 포함되므로 예외 메시지 대신 유형만 노출
+        return {"area": area, "status": "error", "message": type(e).__name__, "roads": []}
+
+SHARED_TRAFFIC = {}   # 공유 모드: 리더가 갱신한 지역별 결과
+
+async def _refresh_shared_traffic() -> dict:
+    """리더 - 최근 요청된 지역만 새로 조회, 실패한 지역은 stale 허용 시간 안의 직전 결과 유지"""
+    areas = [a for a in await asyncio.to_thread(SHARED_STORE.demand, "traffic", time.time() - SHARED_DEMAND_TTL) if a in TRAFFIC_AREA_SET]
+    results = await asyncio.gather(*[_traffic_area_result(a, fresh=True) for a in areas])
+    keep_until = datetime.now() - timedelta(seconds=sum(CACHE_TTL["traffic_area"]))
+    merged = {}
+    for area, res in zip(areas, results):
+        prev = SHARED_TRAFFIC.get(area)
+        if res["status"] not in ("ok", "empty") and prev and prev.get("fetched_at", "") >= keep_until.isoformat(): res = prev
+        merged[area] = res
+    return merged
+
+def _apply_shared_traffic(data: dict):
+    SHARED_TRAFFIC.clear()
+    SHARED_TRAFFIC.update(data)
+
+if SEOUL_DATA_KEY:
+    SHARED.register("traffic", CACHE_TTL["traffic_area"][0], _refresh_shared_traffic, _apply_shared_traffic)
+
+@app.get("/api/traffic/areas")
+async def get_traffic_areas():
+    """실시간 교통 조회 대상 지역 목록"""
+    return {"status": "success", "count": len(TRAFFIC_AREAS), "areas": TRAFFIC_AREAS}
+
 @app.get("/api/traffic/realtime")
-async def get_realtime_traffic(start_idx: int = 1, end_idx: int = 100):
-    """서울시 실시간 도로 교통 정보 (citydata API)"""
-    import urllib.parse
-    
+async def get_realtime_traffic(area: str = "", status: str = "", per_area: int = 2, offset: int = 0, limit: int = 100, include_areas: bool = True):
+    """서울시 실시간 도로 교통 정보 (citydata API)
+    area: 쉼표 구분 지역 필터, status: 원활/서행/정체 필터, per_area: 지역별 도로 수(0=전체)"""
     if SEOUL_DATA_KEY:
-        try:
-            # 주요 지역 교통 정보 조회
-            areas = ["강남역", "서울역", "홍대입구역"]
-            all_traffic = []
-            
-            async with httpx.AsyncClient(timeout=15.0) as c:
-                for area in areas:
-                    try:
-                        encoded_area = urllib.parse.quote(area)
-                        url = f"http://openapi.seoul.go.kr:8088/{SEOUL_DATA_KEY}/json/citydata/1/5/{encoded_area}/"
-                        r = await c.get(url)
-                        if r.status_code == 200:
-                            data = r.json()
-                            citydata = data.get("CITYDATA", {})
-                            traffic_stts = citydata.get("ROAD_TRAFFIC_STTS", {})
-                            road_list = traffic_stts.get("ROAD_TRAFFIC_STTS", [])
-                            
-                            if isinstance(road_list, list):
-                                for road in road_list[:2]:  # 각 지역 상위 2개 도로
-                                    spd = road.get("SPD", "0")
-                                    road_nm = road.get("ROAD_NM", "")
-                                    
-                                    # 속도에 따른 상태 결정
-                                    speed = float(spd) if spd else 0
-                                    if speed >= 40:
-                                        status = "원활"
-                                    elif speed >= 20:
-                                        status = "서행"
-                                    else:
-                                        status = "정체"
-                                    
-                                    if road_nm:
-                                        all_traffic.append({
-                                            "road_name": f"{area} {road_nm}",
-                                            "speed": speed,
-                                            "status": status
-                                        })
-                    except Exception as e:
-                        print(f"Traffic API error for {area}: {e}")
-                        continue
-            
-            if all_traffic:
-                return {"status": "live", "source": "citydata", "timestamp": datetime.now().isoformat(), "data": all_traffic}
-        except Exception as e:
-            print(f"Traffic API error: {e}")
+        areas = [a.strip() for a in area.split(",") if a.strip()] or TRAFFIC_AREAS
+        statuses = {st.strip() for st in status.split(",") if st.strip() in TRAFFIC_STATUSES}
+        # 지역별 병렬 조회 (세마포어로 동시 호출 제한, 지역별 타임아웃)
+        results = await asyncio.gather(*[_traffic_area_result(a) for a in areas])
+        all_traffic = []
+        for res in results:
+            roads = res["roads"][:per_area] if per_area > 0 else res["roads"]
+            all_traffic.extend(r for r in roads if not statuses or r["status"] in statuses)
+        ok = sum(1 for res in results if res["status"] in ("ok", "empty"))
+        if all_traffic or ok:
+            resp = {"status": "live", "source": "citydata", "timestamp": datetime.now().isoformat(),
+                    "partial": ok < len(areas), "areas_requested": len(areas), "areas_ok": ok,
+                    "total": len(all_traffic), "offset": offset, "limit": limit,
+                    "data": all_traffic[offset:offset + limit]}
+            if include_areas:
+                resp["areas"] = [{k: v for k, v in res.items() if k != "roads"} | {"roads": len(res["roads"])} for res in results]
+            return resp
     
     # 폴백 샘플 데이터
     return {"status": "sample", "data": [
@@ -221,82 +2052,233 @@ FLOOD_INDICATOR_ZONES = [
     {"id": "FZ008", "name": "반포IC 지하차도", "lat": 37.5053, "lng": 127.0108, "priority": 1, "threshold_rain": 30, "history": "2022년, 2011년 침수"},
 ]
 
+FLOOD_ZONES_FILE = os.getenv("FLOOD_ZONES_FILE", "")   # CSV/GeoJSON 으로 구간 목록 교체
+
+def _load_flood_zones():
+    if FLOOD_ZONES_FILE and os.path.exists(FLOOD_ZONES_FILE):
+        # 경보 평가가 같은 리스트를 참조하므로 내용만 교체
+        FLOOD_INDICATOR_ZONES[:] = load_points_file(FLOOD_ZONES_FILE)
+        return FLOOD_INDICATOR_ZONES, FLOOD_ZONES_FILE
+    return FLOOD_INDICATOR_ZONES, "builtin"
+
+SPATIAL_LAYERS["flood_zones"] = SpatialLayer("flood_zones", _load_flood_zones)
+SPATIAL_LAYERS["flood_zones"].reload()
+
 @app.get("/api/flood/zones")
 async def get_flood_zones():
     """침수 선행 지표 구간 목록"""
     return {"status": "success", "count": len(FLOOD_INDICATOR_ZONES), "zones": FLOOD_INDICATOR_ZONES}
 
-@app.get("/api/flood/warning")
-async def get_flood_warning():
-    """침수 사전 경보 - 실시간 강우량 기반"""
+FLOOD_POLL_INTERVAL   = float(os.getenv("FLOOD_POLL_INTERVAL", "60"))    # 강우 폴링 주기 (초)
+FLOOD_SSE_HEARTBEAT   = float(os.getenv("FLOOD_SSE_HEARTBEAT", "20"))    # SSE 연결 유지용 주석 전송 주기
+FLOOD_SSE_QUEUE       = 32                                               # 구독자별 미전송 이벤트 한도
+
+ASOS_STATIONS_FILE = os.getenv("ASOS_STATIONS_FILE", os.path.join(BASE_DIR, "data", "asos_stations.csv"))
+# 강우 폴링 출처 - nowcast: 초단기실황(관측소 좌표의 격자, 매시 정시값을 HH:40 이후 제공 → 최대 약 1시간 40분 지연)
+#                asos: ASOS 시간자료(전일 23시까지만 제공 → 누적 구간이 전날 마지막 6시간에 머문다, 과거 재현용)
+FLOOD_RAIN_SOURCE = os.getenv("FLOOD_RAIN_SOURCE", "nowcast")
+NOWCAST_URL = f"{DATA_GO_KR_BASE_URL}/1360000/VilageFcstInfoService_2.0/getUltraSrtNcst"
+NOWCAST_DELAY_MIN = 40
+RAIN_WINDOWS = (1, 3, 6)                      # 누적 강수 구간 (시간)
+RAIN_RING_HOURS = 24                          # 관측소별 링버퍼 크기
+# 누적 구간별 임계값 배율 - 3시간·6시간 누적은 시간 임계값의 2배·3배를 같은 위험도로 본다
+FLOOD_WINDOW_FACTORS = np.array([float(v) for v in os.getenv("FLOOD_WINDOW_FACTORS", "1,2,3").split(",")])
+FLOOD_LEVELS = ("✅ 정상", "🔔 주의", "⚠️ 경고", "🚨 위험")
+FLOOD_LEVEL_STATUS = ("정상", "주의", "경고", "위험")
+FLOOD_LEVEL_MESSAGES = ("현재 침수 위험 없음", "강우량 증가 중, 모니터링 필요", "침수 가능성 높음, 주의 필요", "침수 임박! 즉시 우회 필요")
+
+def _hour_stamp(dt: datetime) -> int:
+    return int((dt - datetime(1970, 1, 1)).total_seconds() // 3600)
+
+def _rain_last_available() -> datetime:
+    """강우 폴링이 받을 수 있는 마지막 정시"""
+    if FLOOD_RAIN_SOURCE == "asos":
+        return min(datetime.now().replace(minute=0, second=0, microsecond=0), _asos_last_available("hourly"))
+    return (datetime.now() - timedelta(minutes=NOWCAST_DELAY_MIN)).replace(minute=0, second=0, microsecond=0)
+
+def kma_grid(lat: float, lng: float) -> tuple:
+    """위경도 → 기상청 동네예보 5km 격자 (nx, ny) - 람베르트 정각원추도법 (표준위도 30/60, 기준점 126E 38N = (43, 136))"""
+    rad = math.pi / 180
+    re = 6371.00877 / 5.0
+    slat1, slat2, olon, olat = 30.0 * rad, 60.0 * rad, 126.0 * rad, 38.0 * rad
+    sn = math.log(math.cos(slat1) / math.cos(slat2)) / math.log(math.tan(math.pi / 4 + slat2 / 2) / math.tan(math.pi / 4 + slat1 / 2))
+    sf = math.tan(math.pi / 4 + slat1 / 2) ** sn * math.cos(slat1) / sn
+    ro = re * sf / math.tan(math.pi / 4 + olat / 2) ** sn
+    ra = re * sf / math.tan(math.pi / 4 + lat * rad / 2) ** sn
+    theta = lng * rad - olon
+    if theta > math.pi: theta -= 2 * math.pi
+    if theta < -math.pi: theta += 2 * math.pi
+    theta *= sn
+    return int(ra * math.sin(theta) + 43 + 0.5), int(ro - ra * math.cos(theta) + 136 + 0.5)
+
+class RainRing:
+    """관측소 시간 강수 링버퍼 - 1h/3h/6h 누적을 새 시간값이 들어올 때 증분 갱신"""
+    def __init__(self, size: int = RAIN_RING_HOURS):
+        self.size = size
+        self.values = np.zeros(size)
+        self.hours = np.full(size, -1, dtype=np.int64)
+        self.latest = -1
+        self.sums = np.zeros(len(RAIN_WINDOWS))
+
+    def value_at(self, hour: int) -> float:
+        slot = hour % self.size
+        return float(self.values[slot]) if self.hours[slot] == hour else 0.0
+
+    def push(self, hour: int, rain: float):
+        if hour <= self.latest:
+            # 이미 지난 시각의 정정값: 그 시각을 포함하는 구간만 차이만큼 보정
+            if self.latest - hour >= self.size: return
+            delta = rain - self.value_at(hour)
+            for k, w in enumerate(RAIN_WINDOWS):
+                if self.latest - hour < w: self.sums[k] += delta
+            self.values[hour % self.size], self.hours[hour % self.size] = rain, hour
+            return
+        start = max(self.latest + 1, hour - max(RAIN_WINDOWS)) if self.latest >= 0 else hour
+        if self.latest >= 0 and start > self.latest + 1:
+            # 긴 공백: 건너뛴 시각은 무강수이므로 start 직전 시각 기준으로 누적을 다시 계산
+            self.sums[:] = [sum(self.value_at(h) for h in range(start - w, start)) for w in RAIN_WINDOWS]
+        for h in range(start, hour + 1):
+            v = rain if h == hour else 0.0                                  # 빠진 시각은 무강수로 채움
+            for k, w in enumerate(RAIN_WINDOWS):
+                self.sums[k] += v - self.value_at(h - w)
+            self.values[h % self.size], self.hours[h % self.size] = v, h
+        self.latest = hour
+        np.maximum(self.sums, 0, out=self.sums)   # 부동소수 오차 정리
+
+    def observed_at(self):
+        return (datetime(1970, 1, 1) + timedelta(hours=int(self.latest))).strftime("%Y-%m-%d %H:00") if self.latest >= 0 else None
+
+class RainfallNetwork:
+    """관측소 좌표 + 링버퍼 - 구간→최근접 관측소 매핑을 미리 계산하고, 필요한 관측소만 관측소당 1회 병렬 조회"""
+    def __init__(self, stations: list):
+        self.stations = stations
+        self.ids = [str(s["id"]) for s in stations]
+        self.index = SpatialIndex([float(s["lat"]) for s in stations], [float(s["lng"]) for s in stations])
+        self.rings = {sid: RainRing() for sid in self.ids}
+        self.grid = {sid: kma_grid(float(s["lat"]), float(s["lng"])) for sid, s in zip(self.ids, stations)}
+        self.errors = {}
+        self._zone_map = (None, None, None)   # (구간 레이어 적재 시각, 관측소 인덱스 배열, 거리 배열)
+
+    @classmethod
+    def from_file(cls, path: str):
+        stations = load_points_file(path) if os.path.exists(path) else [{"id": "108", "name": "서울", "lat": 37.5714, "lng": 126.9658}]
+        return cls(stations)
+
+    def zone_stations(self, zones: list, token) -> tuple:
+        if self._zone_map[0] != token or self._zone_map[1] is None or len(self._zone_map[1]) != len(zones):
+            pairs = [self.index.nearest(float(z["lat"]), float(z["lng"]), 1) for z in zones]
+            idx = np.array([int(i[0]) for i, _ in pairs], dtype=np.int64)
+            dist = np.array([float(d[0]) for _, d in pairs])
+            self._zone_map = (token, idx, dist)
+        return self._zone_map[1], self._zone_map[2]
+
+    async def _poll_station(self, sid: str):
+        ring = self.rings[sid]
+        end = _rain_last_available()
+        start = end - timedelta(hours=max(RAIN_WINDOWS) - 1)
+        if ring.latest >= 0:
+            start = max(start, datetime(1970, 1, 1) + timedelta(hours=int(ring.latest) + 1))
+        if start > end: return
+        if FLOOD_RAIN_SOURCE == "asos": await self._poll_asos(ring, sid, start, end)
+        else: await self._poll_nowcast(ring, sid, start, end)
+
+    async def _poll_nowcast(self, ring: RainRing, sid: str, start: datetime, end: datetime):
+        """초단기실황 RN1(1시간 강수) - 정시별 1회 호출, 처음엔 최대 6시간을 병렬로 채운다"""
+        nx, ny = self.grid[sid]
+        async def rn1(t: datetime):
+            r = await upstream("datagokr").get(NOWCAST_URL,
+                params={"serviceKey": DATA_GO_KR_KEY, "numOfRows": "10", "pageNo": "1", "dataType": "JSON",
+                        "base_date": t.strftime("%Y%m%d"), "base_time": t.strftime("%H00"), "nx": str(nx), "ny": str(ny)})
+            r.raise_for_status()
+            items = _datagokr_check(r.json()).get("response", {}).get("body", {}).get("items", {}).get("item", []) or []
+            if isinstance(items, dict): items = [items]
+            return next((it.get("obsrValue") for it in items if it.get("category") == "RN1"), None)
+        hours = [start + timedelta(hours=i) for i in range(int((end - start).total_seconds() // 3600) + 1)]
+        for t, v in zip(hours, await asyncio.gather(*[rn1(t) for t in hours])):
+            if v is not None: ring.push(_hour_stamp(t), _asos_num(v) or 0.0)   # "강수없음" 등 비수치는 무강수
+
+    async def _poll_asos(self, ring: RainRing, sid: str, start: datetime, end: datetime):
+        r = await upstream("datagokr").get(ASOS_KINDS["hourly"]["url"],
+            params={"serviceKey": DATA_GO_KR_KEY, "numOfRows": str(RAIN_RING_HOURS), "pageNo": "1", "dataType": "JSON",
+                    "dataCd": "ASOS", "dateCd": "HR", "startDt": start.strftime("%Y%m%d"), "startHh": start.strftime("%H"),
+                    "endDt": end.strftime("%Y%m%d"), "endHh": end.strftime("%H"), "stnIds": sid})
+        r.raise_for_status()
+        data = _datagokr_check(r.json())
+        items = data.get("response", {}).get("body", {}).get("items", {}).get("item", []) or []
+        if isinstance(items, dict): items = [items]
+        for item in sorted(items, key=lambda it: it.get("tm", "")):
+            try: hour = _hour_stamp(datetime.strptime(item["tm"], "%Y-%m-%d %H:%M"))
+            except (KeyError, ValueError): continue
+            rain_str = item.get("rn", "")
+            ring.push(hour, float(rain_str) if rain_str else 0.0)
+
+    async def poll(self, station_idx) -> dict:
+        """관측소별 병렬 조회 - 실패한 관측소는 직전 누적값 유지"""
+        sids = [self.ids[i] for i in sorted(set(int(i) for i in station_idx))]
+        results = await asyncio.gather(*[self._poll_station(sid) for sid in sids], return_exceptions=True)
+        self.errors = {sid: str(e) or type(e).__name__ for sid, e in zip(sids, results) if isinstance(e, Exception)}
+        if self.errors: log.warning("강수 관측소 조회 실패 %d/%d: %s", len(self.errors), len(sids), self.errors)
+        return self.errors
+
+    def accumulations(self) -> np.ndarray:
+        """관측소 x 누적구간 (S x W) 강수량"""
+        return np.array([self.rings[sid].sums for sid in self.ids]).reshape(len(self.ids), len(RAIN_WINDOWS))
+
+RAIN_NETWORK = RainfallNetwork.from_file(ASOS_STATIONS_FILE)
+
+def _evaluate_flood(acc: np.ndarray = None) -> dict:
+    """구간별 최근접 관측소의 1h/3h/6h 누적 강수로 전 구간 경보 레벨을 한 번에 결정"""
+    zones = FLOOD_INDICATOR_ZONES
+    st_idx, st_dist = RAIN_NETWORK.zone_stations(zones, SPATIAL_LAYERS["flood_zones"].loaded_at)
+    if acc is None: acc = RAIN_NETWORK.accumulations()
+    zone_acc = acc[st_idx] if len(zones) else np.zeros((0, len(RAIN_WINDOWS)))   # Z x W
+    thr = np.array([float(z["threshold_rain"]) for z in zones])
+    ratios = zone_acc / (thr[:, None] * FLOOD_WINDOW_FACTORS[None, :len(RAIN_WINDOWS)])
+    ratio = ratios.max(axis=1) if len(zones) else np.zeros(0)
+    trigger = ratios.argmax(axis=1) if len(zones) else np.zeros(0, dtype=int)
+    level = np.select([ratio >= 1.0, ratio >= 0.7, ratio >= 0.5], [3, 2, 1], 0)
+
     warnings = []
-    current_rain = 0
-    rain_status = "정상"
-    
-    # 실시간 강우량 확인 (ASOS)
-    if DATA_GO_KR_KEY:
-        try:
-            today = datetime.now().strftime("%Y%m%d")
-            async with httpx.AsyncClient(timeout=10.0) as c:
-                r = await c.get(f"http://apis.data.go.kr/1360000/AsosHourlyInfoService/getWthrDataList",
-                    params={"serviceKey": DATA_GO_KR_KEY, "numOfRows": "1", "dataType": "JSON",
-                            "dataCd": "ASOS", "dateCd": "HR", "startDt": today, "startHh": "00",
-                            "endDt": today, "endHh": "23", "stnIds": "108"})
-                data = r.json()
-                items = data.get("response", {}).get("body", {}).get("items", {}).get("item", [])
-                if items:
-                    last_item = items[-1] if isinstance(items, list) else items
-                    rain_str = last_item.get("rn", "0")
-                    current_rain = float(rain_str) if rain_str and rain_str != "" else 0
-        except:
-            pass
-    
-    # 경보 레벨 결정
-    for zone in FLOOD_INDICATOR_ZONES:
-        zone_warning = {
+    for i, zone in enumerate(zones):
+        st = RAIN_NETWORK.stations[st_idx[i]]
+        warnings.append({
             "zone_id": zone["id"],
             "zone_name": zone["name"],
             "lat": zone["lat"],
             "lng": zone["lng"],
             "priority": zone["priority"],
             "threshold": zone["threshold_rain"],
-            "current_rain": current_rain,
+            "current_rain": round(float(zone_acc[i, 0]), 1),
+            "rain_3h": round(float(zone_acc[i, 1]), 1),
+            "rain_6h": round(float(zone_acc[i, 2]), 1),
+            "trigger": f"{RAIN_WINDOWS[trigger[i]]}h" if level[i] else None,
+            "station_id": str(st["id"]),
+            "station_name": st.get("name", ""),
+            "station_distance_m": round(float(st_dist[i])),
             "history": zone["history"],
-            "level": "정상",
-            "message": ""
-        }
-        
-        if current_rain >= zone["threshold_rain"]:
-            zone_warning["level"] = "🚨 위험"
-            zone_warning["message"] = f"침수 임박! 즉시 우회 필요"
-            rain_status = "위험"
-        elif current_rain >= zone["threshold_rain"] * 0.7:
-            zone_warning["level"] = "⚠️ 경고"
-            zone_warning["message"] = f"침수 가능성 높음, 주의 필요"
-            if rain_status != "위험":
-                rain_status = "경고"
-        elif current_rain >= zone["threshold_rain"] * 0.5:
-            zone_warning["level"] = "🔔 주의"
-            zone_warning["message"] = f"강우량 증가 중, 모니터링 필요"
-            if rain_status not in ["위험", "경고"]:
-                rain_status = "주의"
-        else:
-            zone_warning["level"] = "✅ 정상"
-            zone_warning["message"] = "현재 침수 위험 없음"
-        
-        warnings.append(zone_warning)
-    
-    # 우선순위 1인 구간 중 위험/경고 상태 필터
-    priority1_alerts = [w for w in warnings if w["priority"] == 1 and w["level"] in ["🚨 위험", "⚠️ 경고"]]
-    
+            "level": FLOOD_LEVELS[level[i]],
+            "message": FLOOD_LEVEL_MESSAGES[level[i]],
+        })
+
+    top = int(level.max()) if len(level) else 0
+    rain_status = FLOOD_LEVEL_STATUS[top]
+    current_rain = round(float(zone_acc[:, 0].max()), 1) if len(zones) else 0
+    # 우선순위 1인 구간 중 위험/경고 상태
+    priority1_alerts = int(((np.array([z["priority"] for z in zones]) == 1) & (level >= 2)).sum()) if len(zones) else 0
+    used = sorted(set(int(i) for i in st_idx))
+
     return {
         "status": "success",
         "timestamp": datetime.now().isoformat(),
         "current_rain_mm": current_rain,
         "overall_status": rain_status,
         "total_zones": len(warnings),
-        "alert_zones": len([w for w in warnings if w["level"] != "✅ 정상"]),
-        "priority1_alerts": len(priority1_alerts),
+        "alert_zones": int((level > 0).sum()),
+        "priority1_alerts": priority1_alerts,
+        "stations": [{"station_id": RAIN_NETWORK.ids[i], "station_name": RAIN_NETWORK.stations[i].get("name", ""),
+                      **{f"rain_{w}h": round(float(acc[i, k]), 1) for k, w in enumerate(RAIN_WINDOWS)},
+                      "observed_at": RAIN_NETWORK.rings[RAIN_NETWORK.ids[i]].observed_at(),
+                      "error": RAIN_NETWORK.errors.get(RAIN_NETWORK.ids[i])} for i in used],
         "warnings": warnings,
         "message": f"현재 강우량 {current_rain}mm - " + (
             "🚨 침수 위험 구간 발생! 우회 권장" if rain_status == "위험" else
@@ -306,102 +2288,831 @@ async def get_flood_warning():
         )
     }
 
+class FloodMonitor:
+    """강우량을 주기적으로 한 번만 폴링해 경보 스냅샷을 유지하고, 레벨 변화만 구독자에게 푸시"""
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.snapshot = None
+        self.version = 0
+        self.polls = 0
+        self.last_error = None
+        self._lock = asyncio.Lock()
+        self._task = None
+        self._subscribers = set()
+
+    async def refresh(self) -> dict:
+        async with self._lock:
+            self.polls += 1
+            if DATA_GO_KR_KEY:
+                # 경보 구간이 참조하는 관측소만 조회 (실패한 관측소는 직전 누적값 유지)
+                st_idx, _ = RAIN_NETWORK.zone_stations(FLOOD_INDICATOR_ZONES, SPATIAL_LAYERS["flood_zones"].loaded_at)
+                errors = await RAIN_NETWORK.poll(st_idx)
+                self.last_error = "; ".join(f"{sid}: {e}" for sid, e in errors.items()) or None
+            self._apply(_evaluate_flood())
+            return self.snapshot
+
+    async def current(self) -> dict:
+        """최신 스냅샷 - 공유 모드 팔로워는 리더의 스냅샷을 먼저 기다리고, 끝내 없을 때만 직접 조회"""
+        if self.snapshot is None and not SHARED.leader: await SHARED.wait_for("flood")
+        return self.snapshot or await self.refresh()
+
+    def adopt(self, snap: dict):
+        """리더 워커가 만든 스냅샷 반영 - 레벨이 바뀐 구간은 이 워커의 구독자에게 그대로 푸시"""
+        if snap is not self.snapshot: self._apply(snap, snap.get("version"))
+
+    def _apply(self, snap: dict, version: int = None):
+        prev = self.snapshot
+        prev_levels = {w["zone_id"]: w["level"] for w in prev["warnings"]} if prev else {}
+        changes = [{**w, "previous_level": prev_levels.get(w["zone_id"])} for w in snap["warnings"] if prev_levels.get(w["zone_id"]) != w["level"]]
+        if version is not None: self.version = version
+        elif changes: self.version += 1
+        self.snapshot = {**snap, "version": self.version}
+        if prev is not None and changes:
+            self._publish("change", {"version": self.version, "timestamp": snap["timestamp"], "overall_status": snap["overall_status"],
+                                     "current_rain_mm": snap["current_rain_mm"], "alert_zones": snap["alert_zones"],
+                                     "priority1_alerts": snap["priority1_alerts"], "message": snap["message"], "changes": changes})
+
+    def _publish(self, event: str, data: dict):
+        for q in list(self._subscribers):
+            try:
+                q.put_nowait((event, data))
+            except asyncio.QueueFull:
+                # 느린 구독자는 밀린 이벤트를 버리고 전체 스냅샷으로 재동기화
+                while not q.empty(): q.get_nowait()
+                q.put_nowait(("snapshot", self.snapshot))
+
+    def subscribe(self) -> asyncio.Queue:
+        q = asyncio.Queue(maxsize=FLOOD_SSE_QUEUE)
+        self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q: asyncio.Queue):
+        self._subscribers.discard(q)
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                self.last_error = str(e)
+                log.warning("홍수 모니터 갱신 실패: %s", str(e) or type(e).__name__)
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try: await self._task
+            except asyncio.CancelledError: pass
+            self._task = None
+
+    def stats(self) -> dict:
+        task = SHARED._task if SHARED_SNAPSHOTS else self._task
+        running = task is not None and not task.done()
+        return {"interval": self.interval, "version": self.version, "polls": self.polls, "mode": SHARED.role,
+                "rain_source": FLOOD_RAIN_SOURCE, "rain_available_until": _rain_last_available().strftime("%Y-%m-%d %H:00"),
+                "subscribers": len(self._subscribers), "running": running,
+                "updated_at": self.snapshot["timestamp"] if self.snapshot else None, "last_error": self.last_error}
+
+FLOOD_MONITOR = FloodMonitor(FLOOD_POLL_INTERVAL)
+SHARED.register("flood", FLOOD_POLL_INTERVAL, FLOOD_MONITOR.refresh, FLOOD_MONITOR.adopt)
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.get("/api/flood/warning")
+async def get_flood_warning():
+    """침수 사전 경보 - 백그라운드 폴러가 유지하는 최신 스냅샷"""
+    return await FLOOD_MONITOR.current()
+
+@app.get("/api/flood/stream")
+async def stream_flood_warning(request: Request):
+    """침수 경보 SSE - 최초 전체 스냅샷 후 레벨 변화만 푸시"""
+    snapshot = await FLOOD_MONITOR.current()
+    q = FLOOD_MONITOR.subscribe()
+
+    async def events():
+        try:
+            yield "retry: 5000\n" + _sse("snapshot", snapshot)
+            while not await request.is_disconnected():
+                try:
+                    event, data = await asyncio.wait_for(q.get(), timeout=FLOOD_SSE_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                yield _sse(event, data)
+        finally:
+            FLOOD_MONITOR.unsubscribe(q)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/api/flood/monitor")
+async def get_flood_monitor():
+    """강우 폴러 상태"""
+    return {"status": "success", **FLOOD_MONITOR.stats()}
+
 # ============================================
 #  ITS CCTV 이미지 프록시
 # ============================================
+CCTV_FRAME_TTL       = float(os.getenv("CCTV_FRAME_TTL", "3"))                       # 프레임 재사용 시간 (초)
+CCTV_FRAME_CACHE_MB  = float(os.getenv("CCTV_FRAME_CACHE_MB", "64"))                 # 프레임 캐시 총 용량
+CCTV_FRAME_MAX_BYTES = int(os.getenv("CCTV_FRAME_MAX_BYTES", str(2 * 1024 * 1024)))  # 이보다 큰 응답(영상 스트림 등)은 캐시하지 않음
+CCTV_FRAME_WAIT      = float(os.getenv("CCTV_FRAME_WAIT", "10"))                     # 같은 카메라를 받는 요청을 기다리는 최대 시간
+CCTV_FRAMES = ByteLRU(int(CCTV_FRAME_CACHE_MB * 1024 * 1024), CCTV_FRAME_TTL)
+CCTV_FRAME_STATS = {"hits": 0, "misses": 0, "coalesced": 0, "not_modified": 0, "uncacheable": 0, "bytes_saved": 0, "bytes_streamed": 0}
+_frame_inflight = {}   # url -> Future(프레임 또는 None)
+
+def _frame_entry(body: bytes, content_type: str, etag: str, last_modified: str) -> dict:
+    return {"body": body, "content_type": content_type, "last_modified": last_modified,
+            "etag": etag or '"' + hashlib.sha1(body).hexdigest()[:20] + '"'}
+
+class _RelayResponse(StreamingResponse):
+    """스트리밍이 시작되지 않거나 중간에 끊겨도 on_close 를 반드시 실행 (업스트림 응답 닫기, 대기자 깨우기)"""
+    def __init__(self, content, on_close, **kwargs):
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.on_close()
+
+def _frame_response(entry: dict, request: Request) -> Response:
+    """캐시된 프레임 응답 - If-None-Match / If-Modified-Since 면 304"""
+    headers = {"Cache-Control": f"public, max-age={int(CCTV_FRAME_TTL)}", "ETag": entry["etag"], "Last-Modified": entry["last_modified"]}
+    inm, ims = request.headers.get("if-none-match"), request.headers.get("if-modified-since")
+    if inm:
+        fresh = inm.strip() == "*" or entry["etag"] in [t.strip() for t in inm.split(",")]
+    else:
+        try: fresh = bool(ims) and parsedate_to_datetime(ims) >= parsedate_to_datetime(entry["last_modified"])
+        except (TypeError, ValueError): fresh = False
+    if fresh:
+        CCTV_FRAME_STATS["not_modified"] += 1
+        CCTV_FRAME_STATS["bytes_saved"] += len(entry["body"])
+        return Response(status_code=304, headers=headers)
+    CCTV_FRAME_STATS["bytes_saved"] += len(entry["body"])
+    return Response(content=entry["body"], media_type=entry["content_type"], headers=headers)
+
 @app.get("/api/cctv-image")
-async def get_cctv_image(url: str):
-    """CCTV 이미지 프록시 - CORS 우회"""
-    import urllib.parse
+async def get_cctv_image(url: str, request: Request):
+    """CCTV 이미지 프록시 - CORS 우회 (프레임 캐시 + 스트리밍 전달)"""
+    # URL 디코딩 (이중 인코딩 방지)
+    decoded_url = urllib.parse.unquote(url)
+    while True:
+        entry = CCTV_FRAMES.get(decoded_url)
+        if entry is not None:
+            CCTV_FRAME_STATS["hits"] += 1
+            return _frame_response(entry, request)
+        pending = _frame_inflight.get(decoded_url)
+        if pending is None: break
+        # 같은 카메라를 이미 받는 중이면 그 결과를 기다렸다가 캐시에서 응답
+        CCTV_FRAME_STATS["coalesced"] += 1
+        try:
+            entry = await asyncio.wait_for(asyncio.shield(pending), CCTV_FRAME_WAIT)
+        except asyncio.TimeoutError:
+            log.warning("CCTV 프레임 대기 시간 초과 - 직접 조회 %s", decoded_url[:100])
+            break
+        if entry is None: break
+        CCTV_FRAME_STATS["hits"] += 1
+        return _frame_response(entry, request)
+
+    CCTV_FRAME_STATS["misses"] += 1
+    done = asyncio.get_running_loop().create_future()
+    _frame_inflight[decoded_url] = done
+    def finish(entry=None):
+        if _frame_inflight.get(decoded_url) is done: del _frame_inflight[decoded_url]
+        if not done.done(): done.set_result(entry)
     try:
-        # URL 디코딩 (이중 인코딩 방지)
-        decoded_url = urllib.parse.unquote(url)
-        async with httpx.AsyncClient(timeout=15.0, verify=False, follow_redirects=True) as c:
-            r = await c.get(decoded_url, headers={
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-                "Referer": "http://www.its.go.kr/",
-                "Accept": "image/webp,image/apng,image/*,*/*;q=0.8"
-            })
-            if r.status_code == 200:
-                from fastapi.responses import Response
-                content_type = r.headers.get("content-type", "image/jpeg")
-                return Response(content=r.content, media_type=content_type)
-            return JSONResponse(status_code=r.status_code, content={"error": f"Status {r.status_code}", "url": decoded_url[:100]})
+        c = upstream("cctv")
+        r = await c.send(c.build_request("GET", decoded_url, headers={
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+            "Referer": "http://www.its.go.kr/",
+            "Accept": "image/webp,image/apng,image/*,*/*;q=0.8"
+        }), stream=True)
     except Exception as e:
+        finish()
+        log.warning("CCTV 이미지 조회 실패 %s: %s", decoded_url[:100], str(e) or type(e).__name__)
         return JSONResponse(status_code=500, content={"error": str(e)})
+    if r.status_code != 200:
+        await r.aclose(); finish()
+        return JSONResponse(status_code=r.status_code, content={"error": f"Status {r.status_code}", "url": decoded_url[:100]})
+
+    content_type = r.headers.get("content-type", "image/jpeg")
+    last_modified = r.headers.get("last-modified") or formatdate(usegmt=True)
+    headers = {"Cache-Control": f"public, max-age={int(CCTV_FRAME_TTL)}", "Last-Modified": last_modified}
+    if r.headers.get("content-length"): headers["Content-Length"] = r.headers["content-length"]
+    if r.headers.get("etag"): headers["ETag"] = r.headers["etag"]
+
+    async def relay():
+        # 받는 즉시 클라이언트로 흘려보내고, 상한 이하 프레임이면 모아서 캐시에 저장
+        buf, size, complete = [], 0, False
+        try:
+            async for chunk in r.aiter_bytes():
+                size += len(chunk)
+                CCTV_FRAME_STATS["bytes_streamed"] += len(chunk)
+                if size <= CCTV_FRAME_MAX_BYTES: buf.append(chunk)
+                yield chunk
+            complete = True
+        finally:
+            await r.aclose()
+            entry = None
+            if complete and size <= CCTV_FRAME_MAX_BYTES:
+                entry = _frame_entry(b"".join(buf), content_type, r.headers.get("etag"), last_modified)
+                CCTV_FRAMES.put(decoded_url, entry)
+            elif complete:
+                CCTV_FRAME_STATS["uncacheable"] += 1
+            finish(entry)
+
+    async def close():
+        # relay() 가 끝까지 돌았으면 이미 처리됨 (aclose/finish 는 여러 번 불러도 안전)
+        await r.aclose()
+        finish()
+
+    return _RelayResponse(relay(), close, media_type=content_type, headers=headers)
+
+@app.get("/api/cctv-image/stats")
+async def get_cctv_image_stats():
+    """CCTV 프레임 캐시 통계"""
+    return {"status": "success", **CCTV_FRAME_STATS, **CCTV_FRAMES.stats(), "inflight": len(_frame_inflight)}
 
 # ============================================
 #  ITS CCTV
 # ============================================
+SAMPLE_CCTVS = [{"name":"남산1터널 입구","lat":37.553,"lng":126.985,"url":"","format":"image"},{"name":"강남역 교차로","lat":37.498,"lng":127.028,"url":"","format":"image"},
+    {"name":"올림픽대로 잠실대교","lat":37.519,"lng":127.078,"url":"","format":"image"},{"name":"북악터널 입구","lat":37.591,"lng":126.968,"url":"","format":"image"},
+    {"name":"신림사거리","lat":37.485,"lng":126.930,"url":"","format":"image"},{"name":"인왕산터널","lat":37.580,"lng":126.959,"url":"","format":"image"},
+    {"name":"내부순환 정릉입구","lat":37.604,"lng":127.010,"url":"","format":"image"},{"name":"동작대교 남단","lat":37.506,"lng":126.983,"url":"","format":"image"},
+    {"name":"한남IC","lat":37.535,"lng":127.002,"url":"","format":"image"},{"name":"사당역","lat":37.478,"lng":126.983,"url":"","format":"image"}]
+
+def _load_cctv_catalog():
+    # 키가 있으면 조회 결과가 누적되므로 현재 목록으로 인덱스만 재생성
+    return (CCTV_CATALOG.items, "its") if ITS_CCTV_KEY else (SAMPLE_CCTVS, "sample")
+
+# 조회된 CCTV 를 누적한 카탈로그 (공간 질의용) - 이름+좌표로 중복 제거
+CCTV_CATALOG = SpatialLayer("cctv", _load_cctv_catalog)
+CCTV_CATALOG.reload()
+SPATIAL_LAYERS["cctv"] = CCTV_CATALOG
+
+def _merge_cctv_catalog(cctvs: list):
+    if not cctvs: return
+    merged = {(c["name"], round(c["lat"], 5), round(c["lng"], 5)): c for c in CCTV_CATALOG.items}
+    merged.update({(c["name"], round(c["lat"], 5), round(c["lng"], 5)): c for c in cctvs})
+    CCTV_CATALOG.load(list(merged.values()), "its")
+
+async def _fetch_cctv(min_lat: float, min_lng: float, max_lat: float, max_lng: float) -> tuple:
+    """ITS cctvInfo 조회 → (CCTV 목록, 원본) - 예상 밖 응답이면 목록이 None"""
+    r = await upstream("its").get(f"{ITS_BASE_URL}/cctvInfo",
+        params={"apiKey":ITS_CCTV_KEY,"type":"ex","cctvType":"1","minX":str(min_lng),"maxX":str(max_lng),"minY":str(min_lat),"maxY":str(max_lat),"getType":"json"})
+    r.raise_for_status()
+    data = r.json()
+    if "response" in data and "data" in data["response"]:
+        return [{"name":item.get("cctvname",""),"lat":float(item.get("coordy",0)),"lng":float(item.get("coordx",0)),"url":item.get("cctvurl",""),"format":item.get("cctvformat","")}
+                for item in data["response"]["data"]], data
+    return None, data
+
+# 공유 모드: 리더가 이 범위의 카탈로그를 주기적으로 받아 두고, 범위 안 조회는 모든 워커가 카탈로그로 응답
+CCTV_CATALOG_INTERVAL = float(os.getenv("CCTV_CATALOG_INTERVAL", "600"))
+CCTV_CATALOG_BBOX = tuple(float(v) for v in os.getenv("CCTV_CATALOG_BBOX", "37.2,126.6,37.9,127.4").split(","))   # 수도권
+
+async def _refresh_shared_cctv() -> list:
+    cctvs, _ = await _fetch_cctv(*CCTV_CATALOG_BBOX)
+    if cctvs is None: raise RuntimeError("ITS cctvInfo 예상 밖 응답")
+    return cctvs
+
+if ITS_CCTV_KEY:
+    SHARED.register("cctv", CCTV_CATALOG_INTERVAL, _refresh_shared_cctv, lambda items: CCTV_CATALOG.load(items, "its"))
+
 @app.get("/api/cctv")
 async def get_cctv(lat: float = 37.55, lng: float = 126.98, radius: float = 0.2):
     if ITS_CCTV_KEY:
+        b = CCTV_CATALOG_BBOX
+        if (SHARED_SNAPSHOTS and SHARED.age("cctv") < 2 * CCTV_CATALOG_INTERVAL
+                and b[0] <= lat - radius and lat + radius <= b[2] and b[1] <= lng - radius and lng + radius <= b[3]):
+            cctvs = CCTV_CATALOG.rows(CCTV_CATALOG.index.bbox(lat - radius, lng - radius, lat + radius, lng + radius))
+            return {"status":"live","source":"shared","count":len(cctvs),"data":cctvs}
         try:
-            async with httpx.AsyncClient(timeout=60.0, verify=False) as c:
-                r = await c.get("https://openapi.its.go.kr:9443/cctvInfo",
-                    params={"apiKey":ITS_CCTV_KEY,"type":"ex","cctvType":"1","minX":str(lng-radius),"maxX":str(lng+radius),"minY":str(lat-radius),"maxY":str(lat+radius),"getType":"json"})
-                data = r.json(); cctvs = []
-                if "response" in data and "data" in data["response"]:
-                    for item in data["response"]["data"]:
-                        cctvs.append({"name":item.get("cctvname",""),"lat":float(item.get("coordy",0)),"lng":float(item.get("coordx",0)),"url":item.get("cctvurl",""),"format":item.get("cctvformat","")})
-                    return {"status":"live","count":len(cctvs),"data":cctvs}
-                return {"status":"live","count":0,"data":[],"raw":data}
+            cctvs, data = await _fetch_cctv(lat - radius, lng - radius, lat + radius, lng + radius)
+            if cctvs is not None:
+                _merge_cctv_catalog(cctvs)
+                return {"status":"live","count":len(cctvs),"data":cctvs}
+            return {"status":"live","count":0,"data":[],"raw":data}
         except httpx.TimeoutException:
-            pass
+            log.warning("ITS CCTV 목록 타임아웃 - 샘플로 대체")
         except Exception as e:
+            log.warning("ITS CCTV 목록 조회 실패: %s", str(e) or type(e).__name__)
             return {"status":"error","message":str(e),"key":ITS_CCTV_KEY[:8]+"..."}
-    samples = [{"name":"남산1터널 입구","lat":37.553,"lng":126.985,"url":"","format":"image"},{"name":"강남역 교차로","lat":37.498,"lng":127.028,"url":"","format":"image"},
-        {"name":"올림픽대로 잠실대교","lat":37.519,"lng":127.078,"url":"","format":"image"},{"name":"북악터널 입구","lat":37.591,"lng":126.968,"url":"","format":"image"},
-        {"name":"신림사거리","lat":37.485,"lng":126.930,"url":"","format":"image"},{"name":"인왕산터널","lat":37.580,"lng":126.959,"url":"","format":"image"},
-        {"name":"내부순환 정릉입구","lat":37.604,"lng":127.010,"url":"","format":"image"},{"name":"동작대교 남단","lat":37.506,"lng":126.983,"url":"","format":"image"},
-        {"name":"한남IC","lat":37.535,"lng":127.002,"url":"","format":"image"},{"name":"사당역","lat":37.478,"lng":126.983,"url":"","format":"image"}]
+    samples = SAMPLE_CCTVS
     return {"status":"sample","message":"ITS CCTV API 키 미설정 → 샘플","count":len(samples),"data":samples}
 
 # ============================================
 #  도로안전시설 점검
 # ============================================
+SAFETY_FACILITIES_FILE = os.getenv("SAFETY_FACILITIES_FILE", "")   # CSV/GeoJSON 시설 인벤토리
+SAMPLE_SAFETY_FACILITIES = [
+    {"name":"남산순환로 가드레일","lat":37.552,"lng":126.987,"type":"가드레일","status":"양호","last_check":"2025-09","grade":"B","issue":"부분 녹 발생, 도장 필요","photo":""},
+    {"name":"남산순환로 시선유도봉","lat":37.550,"lng":126.990,"type":"시선유도시설","status":"교체필요","last_check":"2025-06","grade":"D","issue":"반사체 마모 심각","photo":""},
+    {"name":"북악스카이웨이 가드레일","lat":37.594,"lng":126.966,"type":"가드레일","status":"주의","last_check":"2025-08","grade":"C","issue":"곡선부 높이 부족","photo":""},
+    {"name":"동작대교 충격흡수시설","lat":37.506,"lng":126.981,"type":"충격흡수시설","status":"교체필요","last_check":"2025-05","grade":"D","issue":"변형, 즉시 교체 필요","photo":""},
+    {"name":"한남IC 합류부 표지","lat":37.535,"lng":127.000,"type":"도로표지","status":"주의","last_check":"2025-07","grade":"C","issue":"반사 성능 저하","photo":""},
+    {"name":"강남역 배수구","lat":37.497,"lng":127.028,"type":"배수시설","status":"주의","last_check":"2025-09","grade":"C","issue":"낙엽 퇴적, 배수 용량 부족","photo":""},
+    {"name":"올림픽대로 조명시설","lat":37.517,"lng":127.076,"type":"조명시설","status":"교체필요","last_check":"2025-08","grade":"D","issue":"LED 3기 불량","photo":""},
+    {"name":"사당역 횡단보도 조명","lat":37.478,"lng":126.981,"type":"조명시설","status":"교체필요","last_check":"2025-07","grade":"D","issue":"조명 2기 불량","photo":""},
+    {"name":"우면산터널 배수로","lat":37.474,"lng":126.990,"type":"배수시설","status":"주의","last_check":"2025-08","grade":"C","issue":"토사 퇴적","photo":""},
+    {"name":"성산대교 이음장치","lat":37.549,"lng":126.911,"type":"교량시설","status":"주의","last_check":"2025-09","grade":"C","issue":"이음장치 마모","photo":""},
+    {"name":"광화문 보도블록","lat":37.573,"lng":126.976,"type":"보행시설","status":"주의","last_check":"2025-09","grade":"C","issue":"블록 들뜸 3개소","photo":""},
+]
+
+def _load_safety_facilities():
+    if SAFETY_FACILITIES_FILE and os.path.exists(SAFETY_FACILITIES_FILE):
+        return load_points_file(SAFETY_FACILITIES_FILE), SAFETY_FACILITIES_FILE
+    return SAMPLE_SAFETY_FACILITIES, "sample"
+
+SPATIAL_LAYERS["facilities"] = SpatialLayer("facilities", _load_safety_facilities)
+SPATIAL_LAYERS["facilities"].reload()
+
 @app.get("/api/safety-facilities")
-async def get_safety_facilities(lat: float = 37.55, lng: float = 126.98, radius: float = 0.05):
-    facilities = [
-        {"name":"남산순환로 가드레일","lat":37.552,"lng":126.987,"type":"가드레일","status":"양호","last_check":"2025-09","grade":"B","issue":"부분 녹 발생, 도장 필요","photo":""},
-        {"name":"남산순환로 시선유도봉","lat":37.550,"lng":126.990,"type":"시선유도시설","status":"교체필요","last_check":"2025-06","grade":"D","issue":"반사체 마모 심각","photo":""},
-        {"name":"북악스카이웨이 가드레일","lat":37.594,"lng":126.966,"type":"가드레일","status":"주의","last_check":"2025-08","grade":"C","issue":"곡선부 높이 부족","photo":""},
-        {"name":"동작대교 충격흡수시설","lat":37.506,"lng":126.981,"type":"충격흡수시설","status":"교체필요","last_check":"2025-05","grade":"D","issue":"변형, 즉시 교체 필요","photo":""},
-        {"name":"한남IC 합류부 표지","lat":37.535,"lng":127.000,"type":"도로표지","status":"주의","last_check":"2025-07","grade":"C","issue":"반사 성능 저하","photo":""},
-        {"name":"강남역 배수구","lat":37.497,"lng":127.028,"type":"배수시설","status":"주의","last_check":"2025-09","grade":"C","issue":"낙엽 퇴적, 배수 용량 부족","photo":""},
-        {"name":"올림픽대로 조명시설","lat":37.517,"lng":127.076,"type":"조명시설","status":"교체필요","last_check":"2025-08","grade":"D","issue":"LED 3기 불량","photo":""},
-        {"name":"사당역 횡단보도 조명","lat":37.478,"lng":126.981,"type":"조명시설","status":"교체필요","last_check":"2025-07","grade":"D","issue":"조명 2기 불량","photo":""},
-        {"name":"우면산터널 배수로","lat":37.474,"lng":126.990,"type":"배수시설","status":"주의","last_check":"2025-08","grade":"C","issue":"토사 퇴적","photo":""},
-        {"name":"성산대교 이음장치","lat":37.549,"lng":126.911,"type":"교량시설","status":"주의","last_check":"2025-09","grade":"C","issue":"이음장치 마모","photo":""},
-        {"name":"광화문 보도블록","lat":37.573,"lng":126.976,"type":"보행시설","status":"주의","last_check":"2025-09","grade":"C","issue":"블록 들뜸 3개소","photo":""},
-    ]
-    filtered = [f for f in facilities if abs(f["lat"]-lat)<=radius and abs(f["lng"]-lng)<=radius]
+async def get_safety_facilities(lat: float = 37.55, lng: float = 126.98, radius: float = 0.05, radius_m: float = 0):
+    """주변 도로안전시설 - radius_m 지정 시 실제 거리(m) 원형 검색, 아니면 ±radius(도) 사각 범위"""
+    layer = SPATIAL_LAYERS["facilities"]
+    if radius_m > 0:
+        filtered = layer.rows(*layer.index.radius(lat, lng, radius_m))
+    else:
+        filtered = layer.rows(layer.index.bbox(lat - radius, lng - radius, lat + radius, lng + radius))
     stats = {"total":len(filtered),"양호":0,"주의":0,"교체필요":0}
     for f in filtered:
-        if f["status"] in stats: stats[f["status"]] += 1
-    return {"status":"sample","stats":stats,"data":filtered}
+        # 인벤토리 파일에 상태 컬럼이 없을 수 있다
+        if f.get("status") in ("양호", "주의", "교체필요"): stats[f["status"]] += 1
+    return {"status":"sample" if layer.source == "sample" else "live","stats":stats,"data":filtered}
+
+# ============================================
+#  공간 질의 API (시설 / CCTV 카탈로그 / 침수 구간)
+# ============================================
+def _spatial_layer(layer: str):
+    if layer not in SPATIAL_LAYERS:
+        raise HTTPException(status_code=404, detail=f"레이어 없음: {layer} ({', '.join(SPATIAL_LAYERS)})")
+    return SPATIAL_LAYERS[layer]
+
+@app.get("/api/spatial/layers")
+async def get_spatial_layers():
+    return {"status": "success", "layers": {name: l.stats() for name, l in SPATIAL_LAYERS.items()}}
+
+@app.get("/api/spatial/{layer}/radius")
+async def spatial_radius(layer: str, lat: float, lng: float, radius_m: float = 1000, limit: int = 500):
+    """반경(m) 내 항목 - 가까운 순"""
+    l = _spatial_layer(layer)
+    idx, dist = l.index.radius(lat, lng, radius_m)
+    return {"status": "success", "layer": layer, "count": len(idx), "data": l.rows(idx[:limit], dist[:limit])}
+
+@app.get("/api/spatial/{layer}/nearest")
+async def spatial_nearest(layer: str, lat: float, lng: float, k: int = 5, max_m: float = float("inf")):
+    """k-최근접 항목"""
+    l = _spatial_layer(layer)
+    idx, dist = l.index.nearest(lat, lng, k, max_m)
+    return {"status": "success", "layer": layer, "count": len(idx), "data": l.rows(idx, dist)}
+
+@app.get("/api/spatial/{layer}/bbox")
+async def spatial_bbox(layer: str, min_lat: float, min_lng: float, max_lat: float, max_lng: float, limit: int = 5000):
+    """사각 범위 내 항목"""
+    l = _spatial_layer(layer)
+    idx = l.index.bbox(min_lat, min_lng, max_lat, max_lng)
+    return {"status": "success", "layer": layer, "count": len(idx), "data": l.rows(idx[:limit])}
+
+@app.post("/api/spatial/{layer}/reload")
+async def spatial_reload(layer: str):
+    """원본 파일에서 다시 적재하고 인덱스 재생성"""
+    l = _spatial_layer(layer)
+    await asyncio.to_thread(l.reload)
+    return {"status": "success", "layer": layer, **l.stats()}
+
+# ============================================
+#  구간 위험도 스코어링 엔진 (N2B)
+# ============================================
+# 후보 구간을 컬럼 배열로 보관하고 전 구간을 한 번의 벡터 연산으로 점수화한다.
+# 결과는 데이터/가중치 버전이 바뀔 때까지 캐시된다.
+SEGMENTS_CSV = os.getenv("SEGMENTS_CSV", os.path.join(BASE_DIR, "data", "segments.csv"))
+SEGMENT_FEATURES = ("slope", "rain_days", "accidents", "traffic", "impervious", "flood", "complaints")
+# 정규화 상한 (이 값 이상은 1.0) — 경사도 %, 연 폭우일, 우천사고 건/년, 교통량 대/일, 불투수면 %, 침수 회/10년, 소음민원 건/년
+SEGMENT_FEATURE_CAPS = {"slope": 8.0, "rain_days": 45, "accidents": 10, "traffic": 90000, "impervious": 100, "flood": 6, "complaints": 25}
+PAVEMENT_TYPES = ("drain", "quiet", "perm")
+PAVEMENT_NAMES = {"drain": "배수성", "quiet": "저소음", "perm": "투수성"}
+URGENCY_LEVELS = ("보통", "높음", "긴급")
+DEFAULT_SEGMENT_WEIGHTS = {
+    "drain": {"slope": 0.35, "rain_days": 0.25, "accidents": 0.30, "traffic": 0.05, "impervious": 0.05},
+    "quiet": {"traffic": 0.50, "complaints": 0.40, "accidents": 0.10},
+    "perm":  {"impervious": 0.45, "flood": 0.40, "rain_days": 0.15},
+}
+
+class SegmentStore:
+    """후보 구간 컬럼 저장소 + 벡터화 점수 엔진"""
+    def __init__(self):
+        self.ids = np.array([], dtype=object)
+        self.names = np.array([], dtype=object)
+        self.descs = np.array([], dtype=object)
+        self.lat = np.zeros(0)
+        self.lng = np.zeros(0)
+        self.fixed_type = np.zeros(0, dtype=np.int8)          # -1 = 자동 판정
+        self.features = np.zeros((0, len(SEGMENT_FEATURES)))  # N x F
+        self.weights = {t: dict(w) for t, w in DEFAULT_SEGMENT_WEIGHTS.items()}
+        self.data_version = 0
+        self.weights_version = 0
+        self.source = None
+        self._result = None   # (data_version, weights_version, 결과 배열)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @staticmethod
+    def parse_rows(rows) -> dict:
+        """CSV/JSON 행 목록 → 컬럼 배열"""
+        rows = list(rows)
+        def num(row, k):
+            try: return float(row.get(k) or 0)
+            except (TypeError, ValueError): return 0.0
+        return {
+            "ids": np.array([str(r.get("id") or i) for i, r in enumerate(rows)], dtype=object),
+            "names": np.array([r.get("name", "") for r in rows], dtype=object),
+            "descs": np.array([r.get("desc", "") for r in rows], dtype=object),
+            "lat": np.array([num(r, "lat") for r in rows]),
+            "lng": np.array([num(r, "lng") for r in rows]),
+            "fixed_type": np.array([PAVEMENT_TYPES.index(r["type"]) if r.get("type") in PAVEMENT_TYPES else -1 for r in rows], dtype=np.int8),
+            "features": np.array([[num(r, f) for f in SEGMENT_FEATURES] for r in rows], dtype=float).reshape(len(rows), len(SEGMENT_FEATURES)),
+        }
+
+    def load(self, cols: dict, source: str):
+        for k, v in cols.items(): setattr(self, k, v)
+        self.source = source
+        self.data_version += 1
+
+    def load_csv(self, path: str):
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            self.load(self.parse_rows(csv.DictReader(f)), path)
+
+    def set_weights(self, weights: dict):
+        for t, w in weights.items():
+            if t not in PAVEMENT_TYPES: raise ValueError(f"알 수 없는 포장 유형: {t}")
+            unknown = set(w) - set(SEGMENT_FEATURES)
+            if unknown: raise ValueError(f"알 수 없는 지표: {', '.join(sorted(unknown))}")
+            self.weights[t] = {k: float(v) for k, v in w.items()}
+        self.weights_version += 1
+
+    def weight_matrix(self) -> np.ndarray:
+        return np.array([[self.weights[t].get(f, 0.0) for f in SEGMENT_FEATURES] for t in PAVEMENT_TYPES])
+
+    @staticmethod
+    def score_arrays(features: np.ndarray, fixed_type: np.ndarray, W: np.ndarray) -> dict:
+        """N x F 지표 → 유형별 점수, 추천 유형, 비용·ROI·긴급도 (한 번의 벡터 연산)"""
+        caps = np.array([SEGMENT_FEATURE_CAPS[f] for f in SEGMENT_FEATURES], dtype=float)
+        X = np.clip(features / caps, 0.0, 1.0)
+        type_scores = X @ W.T * 100.0                                   # N x T
+        best = type_scores.argmax(axis=1).astype(np.int8)
+        t = np.where(fixed_type >= 0, fixed_type, best)
+        score = np.round(type_scores[np.arange(len(t)), t], 1)
+        f = {name: features[:, i] for i, name in enumerate(SEGMENT_FEATURES)}
+        # 프런트엔드 offlineAI 와 같은 산식
+        cost = np.round(score * np.array([0.08, 0.06, 0.04])[t], 1)
+        roi = np.clip(np.round(np.choose(t, [f["accidents"] * 1.2, f["complaints"] * 0.3, f["flood"] * 2.5]), 1), 2, 8)
+        urgency = np.select([score >= 90, score >= 80], [2, 1], 0).astype(np.int8)
+        return {"type": t, "best_type": best, "score": score, "type_scores": np.round(type_scores, 1),
+                "cost": cost, "roi": roi, "urgency": urgency}
+
+    def scored(self) -> dict:
+        key = (self.data_version, self.weights_version)
+        if self._result is None or self._result[0] != key:
+            self._result = (key, self.score_arrays(self.features, self.fixed_type, self.weight_matrix()))
+        return self._result[1]
+
+    def record(self, i: int, res: dict) -> dict:
+        t = PAVEMENT_TYPES[res["type"][i]]
+        ac, fl = self.features[i, SEGMENT_FEATURES.index("accidents")], self.features[i, SEGMENT_FEATURES.index("flood")]
+        improvement = (f"우천 사고 약 {round(ac * .35)}건 감소" if t == "drain" else
+                       "소음 3~8dB 저감, 민원 60% 감소" if t == "quiet" else f"침수 피해 {round(fl * .6)}회 감소")
+        return {"id": self.ids[i], "name": self.names[i], "lat": float(self.lat[i]), "lng": float(self.lng[i]),
+                "type": t, "recommendation": PAVEMENT_NAMES[t], "risk_score": float(res["score"][i]),
+                "urgency": URGENCY_LEVELS[res["urgency"][i]], "cost_억": float(res["cost"][i]), "roi": float(res["roi"][i]),
+                "improvement": improvement, "type_scores": dict(zip(PAVEMENT_TYPES, res["type_scores"][i].tolist())),
+                "features": dict(zip(SEGMENT_FEATURES, self.features[i].tolist())), "desc": self.descs[i]}
+
+    def summary(self, res: dict) -> dict:
+        return {"count": len(self), "mean_score": round(float(res["score"].mean()), 1) if len(self) else 0,
+                "by_type": {t: int((res["type"] == i).sum()) for i, t in enumerate(PAVEMENT_TYPES)},
+                "by_urgency": {u: int((res["urgency"] == i).sum()) for i, u in enumerate(URGENCY_LEVELS)}}
+
+SEGMENTS = SegmentStore()
+if os.path.exists(SEGMENTS_CSV): SEGMENTS.load_csv(SEGMENTS_CSV)
+
+def _segment_mask(res: dict, type: str = "", urgency: str = "", min_score: float = 0, bbox: str = "") -> np.ndarray:
+    mask = res["score"] >= min_score
+    if type in PAVEMENT_TYPES: mask &= res["type"] == PAVEMENT_TYPES.index(type)
+    if urgency in URGENCY_LEVELS: mask &= res["urgency"] == URGENCY_LEVELS.index(urgency)
+    if bbox:
+        min_lng, min_lat, max_lng, max_lat = (float(v) for v in bbox.split(","))
+        mask &= (SEGMENTS.lat >= min_lat) & (SEGMENTS.lat <= max_lat) & (SEGMENTS.lng >= min_lng) & (SEGMENTS.lng <= max_lng)
+    return mask
+
+@app.get("/api/segments/top")
+async def get_top_segments(k: int = 10, type: str = "", urgency: str = "", min_score: float = 0, bbox: str = ""):
+    """위험점수 상위 k개 구간 - type: drain/quiet/perm, urgency: 긴급/높음/보통, bbox: minLng,minLat,maxLng,maxLat"""
+    res = SEGMENTS.scored()
+    try:
+        idx = np.flatnonzero(_segment_mask(res, type, urgency, min_score, bbox))
+    except ValueError:
+        return JSONResponse(status_code=400, content={"error": "bbox 형식: minLng,minLat,maxLng,maxLat"})
+    matched = len(idx)
+    k = max(0, min(k, matched))
+    if 0 < k < len(idx):
+        idx = idx[np.argpartition(-res["score"][idx], k - 1)[:k]]
+    idx = idx[np.argsort(-res["score"][idx], kind="stable")][:k]
+    return {"status": "success", "data_version": SEGMENTS.data_version, "weights_version": SEGMENTS.weights_version,
+            "matched": matched, "count": len(idx),
+            "data": [SEGMENTS.record(i, res) for i in idx]}
+
+@app.post("/api/segments/score")
+async def score_segments(request: Request, offset: int = 0, limit: int = 1000):
+    """일괄 점수화 - body.segments 가 있으면 해당 구간만(저장 안 함), 없으면 적재된 전 구간
+    body.weights 로 가중치를 일시 변경해 시뮬레이션할 수 있다."""
+    body = await request.json() if await request.body() else {}
+    if not isinstance(body, dict):
+        return JSONResponse(status_code=400, content={"error": "본문은 JSON 객체여야 합니다"})
+    if body.get("segments") or body.get("weights"):
+        store = SegmentStore()
+        store.load(SegmentStore.parse_rows(body["segments"]) if body.get("segments") else
+                   {k: getattr(SEGMENTS, k) for k in ("ids", "names", "descs", "lat", "lng", "fixed_type", "features")}, "request")
+        store.weights = {t: dict(w) for t, w in SEGMENTS.weights.items()}
+        try:
+            if body.get("weights"): store.set_weights(body["weights"])
+        except ValueError as e:
+            return JSONResponse(status_code=400, content={"error": str(e)})
+    else:
+        store = SEGMENTS
+    res = store.scored()
+    order = np.argsort(-res["score"], kind="stable")[offset:offset + limit]
+    return {"status": "success", "data_version": store.data_version, "weights_version": store.weights_version,
+            "summary": store.summary(res), "offset": offset, "limit": limit, "data": [store.record(i, res) for i in order]}
+
+@app.post("/api/segments/load")
+async def load_segments(request: Request):
+    """후보 구간 CSV 일괄 적재 (본문 = CSV, 헤더: id,name,lat,lng,type,slope,rain_days,accidents,traffic,impervious,flood,complaints,desc)"""
+    text = (await request.body()).decode("utf-8-sig")
+    cols = await asyncio.to_thread(lambda: SegmentStore.parse_rows(csv.DictReader(io.StringIO(text))))
+    if not len(cols["ids"]):
+        return JSONResponse(status_code=400, content={"error": "CSV 행 없음"})
+    SEGMENTS.load(cols, "upload")
+    return {"status": "success", "count": len(SEGMENTS), "data_version": SEGMENTS.data_version}
+
+@app.get("/api/segments/weights")
+async def get_segment_weights():
+    return {"status": "success", "weights_version": SEGMENTS.weights_version, "caps": SEGMENT_FEATURE_CAPS, "weights": SEGMENTS.weights}
+
+@app.put("/api/segments/weights")
+async def put_segment_weights(request: Request):
+    """유형별 지표 가중치 변경 - {"drain": {"slope": 0.4, ...}, ...}"""
+    try:
+        SEGMENTS.set_weights(await request.json())
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    return {"status": "success", "weights_version": SEGMENTS.weights_version, "weights": SEGMENTS.weights}
 
 # ============================================
 #  시스템 상태
 # ============================================
+def _link_status(has_key: bool, upstream_name: str, no_key: str) -> str:
+    """키가 있어도 최근 호출이 연속 실패 중이면 error"""
+    if not has_key: return no_key
+    return "error" if METRICS.health(upstream_name)["state"] == "down" else "connected"
+
 @app.get("/api/status")
 async def status():
     return {
-        "claude_ai": "connected" if ANTHROPIC_API_KEY != "여기에_API_키_입력" else "no_key",
-        "vworld": "connected" if VWORLD_API_KEY else "unavailable",
-        "weather": "connected" if DATA_GO_KR_KEY else "sample",
-        "taas": "connected" if DATA_GO_KR_KEY else "sample",
-        "topis": "connected" if SEOUL_DATA_KEY else "sample",
-        "cctv": "connected" if ITS_CCTV_KEY else "sample",
+        "claude_ai": _link_status(ANTHROPIC_API_KEY != "여기에_API_키_입력", "anthropic", "no_key"),
+        "vworld": _link_status(bool(VWORLD_API_KEY), "vworld", "unavailable"),
+        "weather": _link_status(bool(DATA_GO_KR_KEY), "datagokr", "sample"),
+        "taas": _link_status(bool(DATA_GO_KR_KEY), "datagokr", "sample"),
+        "topis": _link_status(bool(SEOUL_DATA_KEY), "seoul", "sample"),
+        "cctv": _link_status(bool(ITS_CCTV_KEY), "its", "sample"),
         "safety": "sample",
+        "upstreams": {name: METRICS.health(name) for name in UPSTREAM_CONFIG},
     }
 
+@app.get("/api/metrics")
+async def get_metrics():
+    """Prometheus 텍스트 형식 메트릭 (엔드포인트/업스트림 + 풀/캐시 게이지)"""
+    gauges = ["# TYPE pavement_upstream_in_flight gauge"]
+    for name, c in UPSTREAMS.items():
+        t = UPSTREAM_TRANSPORTS.get(name)
+        if t is not None and not c.is_closed: gauges.append(f'pavement_upstream_in_flight{{upstream="{name}"}} {t.in_flight}')
+    for prefix, stats in (("response_cache", RESPONSE_CACHE.stats()), ("cctv_frames", {**CCTV_FRAME_STATS, **CCTV_FRAMES.stats()}),
+                          ("tiles", {**TILE_STATS, **TILE_MEM.stats()}), ("analyze", ANALYZE_LIMITER.stats())):
+        gauges += [f"pavement_{prefix}_{k} {v}" for k, v in stats.items() if isinstance(v, (int, float)) and not isinstance(v, bool)]
+    gauges.append(f"pavement_flood_subscribers {len(FLOOD_MONITOR._subscribers)}")
+    return Response(content=METRICS.render() + "\n".join(gauges) + "\n", media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/api/profiler")
+async def get_profiler(limit: int = 30, format: str = "json"):
+    """샘플링 프로파일러 결과 - format=folded 면 flamegraph 용 접힌 스택"""
+    if format == "folded":
+        return Response(content=PROFILER.folded(), media_type="text/plain; charset=utf-8")
+    return {"status": "success", **PROFILER.report(limit)}
+
+@app.post("/api/profiler")
+async def post_profiler(request: Request):
+    """{"enabled": true, "interval_ms": 5, "duration_s": 30} 로 시작, {"enabled": false} 로 중지"""
+    body = await request.json()
+    if body.get("enabled", True):
+        PROFILER.start(float(body.get("interval_ms", 10)) / 1000, float(body.get("duration_s", 60)), threading.get_ident())
+    else:
+        await asyncio.to_thread(PROFILER.stop)
+    return {"status": "success", "running": PROFILER.running, "samples": PROFILER.total}
+
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    """응답 캐시 통계"""
+    return {"status": "success", "ttl": {k: {"ttl": t, "stale": st} for k, (t, st) in CACHE_TTL.items()}, **RESPONSE_CACHE.stats()}
+
+@app.get("/api/upstream/pools")
+async def get_upstream_pools():
+    """업스트림 커넥션 풀 통계 (풀 크기 조정용)"""
+    pools = {}
+    for name, cfg in UPSTREAM_CONFIG.items():
+        c, t = UPSTREAMS.get(name), UPSTREAM_TRANSPORTS.get(name)
+        stats = t.stats() if c is not None and t is not None and not c.is_closed else {"open": 0, "idle": 0, "active": 0, "queued": 0}
+        pools[name] = {"timeout": cfg["timeout"], "http2": cfg["http2"], **stats}
+    return {"status": "success", "http2_available": HTTP2_AVAILABLE, "pools": pools}
+
+# ============================================
+#  대시보드 부트스트랩 (초기 화면 한 번에)
+# ============================================
+ORJSON_AVAILABLE = importlib.util.find_spec("orjson") is not None
+BROTLI_AVAILABLE = importlib.util.find_spec("brotli") is not None
+if ORJSON_AVAILABLE: import orjson
+if BROTLI_AVAILABLE: import brotli
+
+DASHBOARD_SECTIONS = ("status", "tiles", "weather", "traffic", "safety", "flood")
+DASHBOARD_DEADLINE = float(os.getenv("DASHBOARD_DEADLINE", "1.5"))  # 섹션별 마감(초), DASHBOARD_DEADLINE_<섹션> 으로 개별 지정
+DASHBOARD_DEADLINES = {s: float(os.getenv(f"DASHBOARD_DEADLINE_{s.upper()}", DASHBOARD_DEADLINE)) for s in DASHBOARD_SECTIONS}
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))   # 이보다 작은 응답은 압축하지 않음
+DASHBOARD_LAST = OrderedDict()   # (섹션, 파라미터...) -> (완료 시각, 마지막 정상 결과)
+DASHBOARD_INFLIGHT = {}          # 같은 섹션 동시 요청은 하나의 태스크를 공유 (마감 후에도 계속 실행)
+
+def _json_default(o):
+    if isinstance(o, np.generic): return o.item()
+    if isinstance(o, np.ndarray): return o.tolist()
+    if isinstance(o, datetime): return o.isoformat()
+    raise TypeError(f"JSON 직렬화 불가: {type(o).__name__}")
+
+def json_bytes(data) -> bytes:
+    """orjson 이 있으면 사용 (numpy 포함), 없으면 표준 json 압축 형식"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data, default=_json_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=_json_default).encode()
+
+def compact_response(request: Request, data, min_bytes: int = COMPRESS_MIN_BYTES) -> Response:
+    """빠른 JSON 직렬화 + Accept-Encoding 에 따라 br(가능 시) / gzip 압축"""
+    body, headers = json_bytes(data), {"vary": "accept-encoding"}
+    if len(body) >= min_bytes:
+        accept = {t.split(";")[0].strip() for t in request.headers.get("accept-encoding", "").lower().split(",")}
+        if BROTLI_AVAILABLE and "br" in accept:
+            body, headers["content-encoding"] = brotli.compress(body, quality=5), "br"
+        elif "gzip" in accept:
+            body, headers["content-encoding"] = gzip.compress(body, compresslevel=6), "gzip"
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def _dashboard_done(key: tuple, task: asyncio.Task):
+    DASHBOARD_INFLIGHT.pop(key, None)
+    if task.cancelled() or task.exception() is not None: return
+    data = task.result()
+    if isinstance(data, dict) and data.get("status") == "error": return
+    DASHBOARD_LAST[key] = (time.time(), data)
+    DASHBOARD_LAST.move_to_end(key)
+    while len(DASHBOARD_LAST) > 256: DASHBOARD_LAST.popitem(last=False)
+
+async def _dashboard_section(key: tuple, make, deadline: float) -> dict:
+    """마감 안에 끝나면 ok, 넘기면 마지막 정상값(stale) 또는 timeout - 늦은 태스크는 끝까지 돌아 다음 요청에 쓰인다"""
+    t0 = time.perf_counter()
+    task = DASHBOARD_INFLIGHT.get(key)
+    if task is None:
+        task = DASHBOARD_INFLIGHT[key] = asyncio.ensure_future(make())
+        task.add_done_callback(lambda t: _dashboard_done(key, t))
+    try:
+        data = await asyncio.wait_for(asyncio.shield(task), deadline)
+        state = "error" if isinstance(data, dict) and data.get("status") == "error" else "ok"
+    except asyncio.TimeoutError:
+        data, state = None, "timeout"
+    except Exception as e:
+        log.warning("dashboard section %s failed: %s", key[0], e)
+        data, state = {"status": "error", "message": str(e)}, "error"
+    elapsed = round((time.perf_counter() - t0) * 1000, 1)
+    if state != "ok" and key in DASHBOARD_LAST:
+        at, last = DASHBOARD_LAST[key]
+        return {"status": "stale", "reason": state, "age_s": round(time.time() - at, 1), "elapsed_ms": elapsed, "data": last}
+    return {"status": state, "elapsed_ms": elapsed, **({"data": data} if data is not None else {"deadline_ms": round(deadline * 1000)})}
+
+@app.get("/api/dashboard")
+async def get_dashboard(request: Request, sections: str = "", station: str = "108", traffic_area: str = "강남역,서울역,홍대입구역",
+                        lat: float = 37.5665, lng: float = 126.978, radius: float = 0.15, deadline_ms: int = 0):
+    """초기 화면 묶음 - 섹션을 병렬 실행해 한 응답으로 반환 (섹션: status,tiles,weather,traffic,safety,flood)
+    마감을 넘긴 섹션은 마지막 정상값을 stale 로, 없으면 timeout 으로 표시 (data 없음 → 개별 API 로 보충)"""
+    names = [s.strip() for s in sections.split(",") if s.strip()] or list(DASHBOARD_SECTIONS)
+    unknown = [s for s in names if s not in DASHBOARD_SECTIONS]
+    if unknown:
+        return JSONResponse(status_code=400, content={"error": f"알 수 없는 섹션: {', '.join(unknown)}", "sections": list(DASHBOARD_SECTIONS)})
+    specs = {
+        "status": ((), status),
+        "tiles": ((), get_vworld_tile_info),
+        "weather": ((station,), lambda: get_weather(station)),
+        "traffic": ((traffic_area,), lambda: get_realtime_traffic(area=traffic_area, include_areas=False)),
+        "safety": ((lat, lng, radius), lambda: get_safety_facilities(lat=lat, lng=lng, radius=radius)),
+        "flood": ((), get_flood_warning),
+    }
+    t0 = time.perf_counter()
+    results = await asyncio.gather(*[_dashboard_section((name, *specs[name][0]), specs[name][1],
+                                                        deadline_ms / 1000 if deadline_ms > 0 else DASHBOARD_DEADLINES[name]) for name in names])
+    return compact_response(request, {"status": "success", "timestamp": datetime.now().isoformat(),
+                                      "elapsed_ms": round((time.perf_counter() - t0) * 1000, 1), "sections": dict(zip(names, results))})
+
+@app.get("/api/shared")
+async def get_shared():
+    """워커 간 공유 스냅샷 상태 (이 워커의 역할, 스냅샷 버전/나이)"""
+    return {"status": "success", **SHARED.stats()}
+
 @app.get("/")
 async def root():
     if os.path.exists("index.html"): return FileResponse("index.html")
     return {"message": "index.html 필요"}
 
+def run_command(argv: list) -> int:
+    """관리 명령 - python app.py <command> ..."""
+    import argparse
+    parser = argparse.ArgumentParser(prog="python app.py")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("seed-tiles", help="VWorld 타일을 미리 받아 로컬 MBTiles 에 저장")
+    p.add_argument("--layers", default="Base", help="쉼표 구분 레이어 (Base,Satellite,Hybrid,midnight,white)")
+    p.add_argument("--zooms", default="10-14", help="줌 레벨 범위 또는 목록 (예: 10-14 또는 11,13)")
+    p.add_argument("--bbox", default=",".join(map(str, SEOUL_BBOX)), help="min_lat,min_lng,max_lat,max_lng (기본: 서울)")
+    p.add_argument("--concurrency", type=int, default=8)
+    p = sub.add_parser("ingest-weather", help="ASOS 일/시간자료를 로컬 저장소로 수집 (없는 날짜만)")
+    p.add_argument("--stations", default="", help="쉼표 구분 지점번호 (기본: data/asos_stations.csv 전체)")
+    p.add_argument("--years", default=f"{datetime.now().year - 10}-{datetime.now().year}", help="연도 범위 (예: 1995-2024)")
+    p.add_argument("--kind", default="daily", choices=list(ASOS_KINDS))
+    p.add_argument("--concurrency", type=int, default=ASOS_INGEST_CONCURRENCY)
+    p = sub.add_parser("ingest-accidents", help="TAAS 사고유형별 통계를 시도 x 연도로 수집 (완료된 조합은 건너뜀)")
+    p.add_argument("--regions", default="", help="쉼표 구분 시도 코드 (기본: 17개 시도 전체)")
+    p.add_argument("--years", default=f"{datetime.now().year - 10}-{datetime.now().year - 1}", help="연도 범위 (예: 2014-2024)")
+    p.add_argument("--concurrency", type=int, default=TAAS_INGEST_CONCURRENCY)
+    p.add_argument("--force", action="store_true", help="완료된 조합도 다시 수집")
+    args = parser.parse_args(argv)
+
+    if args.command == "seed-tiles":
+        if not VWORLD_API_KEY:
+            print("VWORLD_API_KEY 미설정"); return 1
+        layers = [l for l in args.layers.split(",") if l]
+        unknown = [l for l in layers if l not in TILE_LAYERS]
+        if unknown:
+            print(f"알 수 없는 레이어: {', '.join(unknown)}"); return 1
+        zooms = [z for part in args.zooms.split(",") for z in
+                 (range(int(part.split("-")[0]), int(part.split("-")[1]) + 1) if "-" in part else [int(part)])]
+        bbox = tuple(float(v) for v in args.bbox.split(","))
+        async def main():
+            try: return await seed_tiles(layers, zooms, bbox, args.concurrency)
+            finally: await upstream("vworld").aclose()
+        print(f"타일 시드 완료: {asyncio.run(main())}")
+        TILE_STORE.close()
+    elif args.command == "ingest-weather":
+        if not DATA_GO_KR_KEY:
+            print("DATA_GO_KR_KEY 미설정"); return 1
+        stations = [s for s in args.stations.split(",") if s] or RAIN_NETWORK.ids
+        y0, _, y1 = args.years.partition("-")
+        async def main():
+            try: return await ingest_asos(stations, datetime(int(y0), 1, 1), datetime(int(y1 or y0), 12, 31, 23), args.kind, args.concurrency)
+            finally: await upstream("datagokr").aclose()
+        result = asyncio.run(main())
+        WEATHER_STORE.close()
+        for err in result["errors"]: print(f"  실패 {err['station']} {err['start']}~{err['end']}: {err['error']}")
+        print(f"ASOS 수집 완료: 요청 구간 {result['requests']}개, 저장 {result['stored']}행, 기존 {result['skipped']}행, 실패 {len(result['errors'])}건")
+        return 1 if result["errors"] else 0
+    elif args.command == "ingest-accidents":
+        if not DATA_GO_KR_KEY:
+            print("DATA_GO_KR_KEY 미설정"); return 1
+        regions = [r for r in args.regions.split(",") if r] or list(SIDO_CODES)
+        y0, _, y1 = args.years.partition("-")
+        async def main():
+            try: return await ingest_accidents(regions, [str(y) for y in range(int(y0), int(y1 or y0) + 1)], args.concurrency, args.force)
+            finally: await upstream("datagokr").aclose()
+        result = asyncio.run(main())
+        ACCIDENT_STORE.close()
+        for err in result["errors"]: print(f"  실패 {err['region']} {err['year']}: {err['error']}")
+        print(f"TAAS 수집 완료: 대상 {result['requested']}건, 완료 {result['done']}건, 자료 없음 {result['empty']}건, 기존 {result['skipped']}건, 실패 {len(result['errors'])}건 (다시 실행하면 실패분만 이어서 수집)")
+        return 1 if result["errors"] else 0
+    return 0
+
 if __name__ == "__main__":
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    if len(sys.argv) > 1:
+        sys.exit(run_command(sys.argv[1:]))
     import uvicorn
     k = ANTHROPIC_API_KEY != "여기에_API_키_입력"
     print("\n" + "="*55)
@@ -413,5 +3124,11 @@ if __name__ == "__main__":
     print(f"  🚗 TAAS 사고  : {'✅' if DATA_GO_KR_KEY else '⬜'}")
     print(f"  🚦 TOPIS 교통 : {'✅' if SEOUL_DATA_KEY else '⬜'}")
     print(f"  📹 ITS CCTV   : {'✅' if ITS_CCTV_KEY else '⬜'}")
+    if WORKERS > 1:
+        print(f"  ⚙️  워커     : {WORKERS}개 (공유 스냅샷 {'✅' if SHARED_SNAPSHOTS else '⬜'})")
     print(f"\n  🌐 http://localhost:8000\n{'='*55}\n")
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    if WORKERS > 1:
+        # 멀티 프로세스는 import 문자열이 필요 - 워커마다 app 모듈을 새로 적재하고 리더 하나가 업스트림을 갱신
+        uvicorn.run("app:app", host="0.0.0.0", port=8000, workers=WORKERS, app_dir=BASE_DIR)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
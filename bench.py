@@ -0,0 +1,227 @@
+"""
+========================================================
+ 부하 벤치마크 - /api 엔드포인트별 처리량 / 지연 분위수
+========================================================
+ 시나리오마다 동시 사용자 N 명이 정해진 시간 동안 요청을 반복하고
+ 처리량(req/s), 오류 수, p50/p95/p99 지연을 결과 JSON 에 남긴다.
+
+    # 대역 서버 + app 을 자동으로 띄워서 전체 실행 (외부 API 호출 없음)
+    python bench.py --spawn --duration 10 --concurrency 32 --out bench_results/latest.json
+
+    # 캐시를 끈 상태(매 요청 업스트림 호출)로 홍수/교통/CCTV 만
+    python bench.py --spawn --cold --only flood_warning,traffic_all,cctv_image
+
+    # 이미 떠 있는 서버 대상 + 이전 결과와 비교 (p95 또는 처리량이 threshold 이상 나빠지면 종료 코드 1)
+    python bench.py --base-url http://127.0.0.1:8000 --compare bench_results/main.json --threshold 0.2
+
+ --mock-args 로 대역 서버 설정 전달: --mock-args "--latency 120 --error-rate 0.02 --set seoul:rate=50"
+========================================================
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import shlex
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import httpx
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def _areas() -> list:
+    path = os.path.join(BASE_DIR, "data", "citydata_areas.txt")
+    if not os.path.exists(path): return ["강남역", "서울역", "홍대입구역"]
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+AREAS = _areas()
+
+def _seoul_point(r: random.Random) -> tuple:
+    return round(r.uniform(37.45, 37.68), 5), round(r.uniform(126.85, 127.15), 5)
+
+def _tile_path(r: random.Random) -> str:
+    z = r.randint(11, 14)
+    lat, lng = _seoul_point(r)
+    n = 1 << z
+    x = int((lng + 180) / 360 * n)
+    y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)
+    return f"/api/tiles/Base/{z}/{x}/{y}"
+
+def _cctv_image(r: random.Random, mock_url: str) -> str:
+    # 대역 서버의 가상 카메라 (약 1km 격자)
+    return f"/api/cctv-image?url={mock_url}/cctv/{r.randint(3745, 3768)}_{r.randint(12685, 12715)}.jpg"
+
+def _analyze_body(r: random.Random, stream: bool) -> dict:
+    return {"messages": [{"role": "user", "content": f"구간 {r.randint(1, 50)} 포장 대안 분석"}], "max_tokens": 80, "stream": stream}
+
+# name -> (method, path 생성기(r, mock_url), body 생성기 또는 None, kind)
+#   kind: "full" = 본문 끝까지, "first_event" = SSE 첫 이벤트까지 (연결 후 첫 데이터 지연)
+SCENARIOS = {
+    "status":          ("GET", lambda r, m: "/api/status", None, "full"),
+    "dashboard":       ("GET", lambda r, m: "/api/dashboard", None, "full"),
+    "flood_warning":   ("GET", lambda r, m: "/api/flood/warning", None, "full"),
+    "flood_stream":    ("GET", lambda r, m: "/api/flood/stream", None, "first_event"),
+    "traffic_area":    ("GET", lambda r, m: f"/api/traffic/realtime?area={r.choice(AREAS)}&include_areas=false", None, "full"),
+    "traffic_all":     ("GET", lambda r, m: "/api/traffic/realtime?include_areas=false", None, "full"),
+    "cctv_list":       ("GET", lambda r, m: "/api/cctv?lat={}&lng={}&radius=0.05".format(*_seoul_point(r)), None, "full"),
+    "cctv_image":      ("GET", _cctv_image, None, "full"),
+    "weather":         ("GET", lambda r, m: "/api/weather/108", None, "full"),
+    "weather_daily":   ("GET", lambda r, m: f"/api/weather-daily/108?start_date={r.randint(2015, 2023)}0101&end_date={r.randint(2015, 2023)}1231", None, "full"),
+    "accident":        ("GET", lambda r, m: f"/api/accident/11?year={r.randint(2014, 2023)}", None, "full"),
+    "geocode":         ("GET", lambda r, m: f"/api/vworld/geocode?address=서울 중구 세종대로 {r.randint(1, 300)}", None, "full"),
+    "tiles":           ("GET", lambda r, m: _tile_path(r), None, "full"),
+    "segments_top":    ("GET", lambda r, m: "/api/segments/top?k=20", None, "full"),
+    "spatial_radius":  ("GET", lambda r, m: "/api/spatial/facilities/radius?lat={}&lng={}&radius_m=3000".format(*_seoul_point(r)), None, "full"),
+    "analyze":         ("POST", lambda r, m: "/api/analyze", lambda r: _analyze_body(r, False), "full"),
+    "analyze_stream":  ("POST", lambda r, m: "/api/analyze", lambda r: _analyze_body(r, True), "first_event"),
+}
+
+async def run_scenario(client: httpx.AsyncClient, name: str, concurrency: int, duration: float, mock_url: str, seed: int) -> dict:
+    method, path_fn, body_fn, kind = SCENARIOS[name]
+    latencies, statuses, errors = [], {}, 0
+    deadline = time.monotonic() + duration
+
+    async def worker(i: int):
+        nonlocal errors
+        r = random.Random(seed * 1000 + i)
+        while time.monotonic() < deadline:
+            path, body = path_fn(r, mock_url), body_fn(r) if body_fn else None
+            started = time.perf_counter()
+            try:
+                async with client.stream(method, path, json=body) as resp:
+                    if kind == "first_event":
+                        async for _ in resp.aiter_raw(): break
+                    else:
+                        await resp.aread()
+                latencies.append(time.perf_counter() - started)
+                statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+                if resp.status_code >= 400: errors += 1
+            except httpx.HTTPError as e:
+                errors += 1
+                statuses[type(e).__name__] = statuses.get(type(e).__name__, 0) + 1
+
+    started = time.monotonic()
+    await asyncio.gather(*[worker(i) for i in range(concurrency)])
+    elapsed = time.monotonic() - started
+    ms = np.array(latencies) * 1000
+    pct = np.percentile(ms, [50, 95, 99]) if len(ms) else [0, 0, 0]
+    return {"requests": len(latencies), "errors": errors, "status": {str(k): v for k, v in sorted(statuses.items(), key=str)},
+            "rps": round(len(latencies) / elapsed, 1), "mean_ms": round(float(ms.mean()), 2) if len(ms) else 0,
+            "p50_ms": round(float(pct[0]), 2), "p95_ms": round(float(pct[1]), 2), "p99_ms": round(float(pct[2]), 2),
+            "max_ms": round(float(ms.max()), 2) if len(ms) else 0}
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """p95 증가 또는 처리량 감소가 threshold(비율) 를 넘는 시나리오"""
+    regressions = []
+    print(f"\n{'시나리오':<16}{'rps':>10}{'(기준)':>10}{'p95 ms':>10}{'(기준)':>10}  판정")
+    for name, cur in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            print(f"{name:<16}{cur['rps']:>10}{'-':>10}{cur['p95_ms']:>10}{'-':>10}  신규"); continue
+        slower = base["p95_ms"] > 0 and cur["p95_ms"] > base["p95_ms"] * (1 + threshold)
+        fewer = base["rps"] > 0 and cur["rps"] < base["rps"] * (1 - threshold)
+        if slower or fewer: regressions.append(name)
+        print(f"{name:<16}{cur['rps']:>10}{base['rps']:>10}{cur['p95_ms']:>10}{base['p95_ms']:>10}  {'회귀' if slower or fewer else 'OK'}")
+    return regressions
+
+def _git_commit() -> str:
+    try: return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True, text=True, timeout=5).stdout.strip()
+    except (OSError, subprocess.SubprocessError): return ""
+
+def _wait_ready(url: str, proc: subprocess.Popen, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None: raise SystemExit(f"서버 종료됨: {url} (exit {proc.returncode})")
+        try:
+            httpx.get(url, timeout=1.0); return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise SystemExit(f"서버 응답 없음: {url}")
+
+def spawn(args) -> tuple:
+    """대역 서버와 app.py 를 자식 프로세스로 실행 → (app 주소, 대역 서버 주소, 프로세스 목록)"""
+    sys.path.insert(0, BASE_DIR)
+    from mock_upstream import mock_env
+    mock_url, app_url = f"http://127.0.0.1:{args.mock_port}", f"http://127.0.0.1:{args.app_port}"
+    mock = subprocess.Popen([sys.executable, os.path.join(BASE_DIR, "mock_upstream.py"), "--port", str(args.mock_port), *shlex.split(args.mock_args)],
+                            stdout=subprocess.DEVNULL)
+    _wait_ready(f"{mock_url}/_mock/stats", mock)
+    env = {**os.environ, **mock_env(mock_url), "STORE_DIR": tempfile.mkdtemp(prefix="bench-store-")}
+    if args.cold:
+        # 응답 캐시/프레임 캐시를 끄고 매 요청 업스트림 경로를 타게 한다
+        for name in ("WEATHER", "WEATHER_DAILY", "ACCIDENT", "GEOCODE", "REVERSE_GEOCODE", "TRAFFIC_AREA", "ANALYZE"):
+            env[f"CACHE_TTL_{name}"] = env[f"CACHE_STALE_{name}"] = "0"
+        env["CCTV_FRAME_TTL"] = "0.001"   # 0 은 만료 없음
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "app:app", "--port", str(args.app_port), "--log-level", "warning"],
+                              cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL)
+    _wait_ready(f"{app_url}/api/status", server)
+    return app_url, mock_url, [server, mock]
+
+async def main(args) -> int:
+    procs = []
+    app_url, mock_url = args.base_url, args.mock_url
+    if args.spawn:
+        app_url, mock_url, procs = spawn(args)
+    names = [n for n in (args.only.split(",") if args.only else SCENARIOS) if n]
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        print(f"알 수 없는 시나리오: {', '.join(unknown)} (가능: {', '.join(SCENARIOS)})"); return 2
+    results = {}
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=app_url, limits=limits, timeout=args.timeout) as client:
+            for name in names:
+                if args.warmup > 0: await run_scenario(client, name, args.concurrency, args.warmup, mock_url, args.seed + 1)
+                res = results[name] = await run_scenario(client, name, args.concurrency, args.duration, mock_url, args.seed)
+                print(f"  {name:<16} {res['rps']:>8} req/s  p50 {res['p50_ms']:>8} ms  p95 {res['p95_ms']:>8} ms  "
+                      f"p99 {res['p99_ms']:>8} ms  오류 {res['errors']}")
+    finally:
+        for p in procs:
+            p.terminate()
+            try: p.wait(timeout=10)
+            except subprocess.TimeoutExpired: p.kill()
+
+    report = {"meta": {"timestamp": datetime.now().isoformat(timespec="seconds"), "commit": _git_commit(), "base_url": app_url,
+                       "spawned": args.spawn, "cold": args.cold, "mock_args": args.mock_args if args.spawn else "",
+                       "concurrency": args.concurrency, "duration_s": args.duration, "warmup_s": args.warmup,
+                       "python": platform.python_version(), "platform": platform.platform()},
+              "results": results}
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f: json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n결과 저장: {args.out}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f: baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"\n회귀 {len(regressions)}건: {', '.join(regressions)}"); return 1
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python bench.py")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--mock-url", default="http://127.0.0.1:9000", help="cctv_image 시나리오가 쓸 대역 서버 주소")
+    parser.add_argument("--spawn", action="store_true", help="대역 서버 + app 을 직접 띄워서 실행")
+    parser.add_argument("--app-port", type=int, default=8765)
+    parser.add_argument("--mock-port", type=int, default=9765)
+    parser.add_argument("--mock-args", default="", help="mock_upstream.py 에 넘길 인자")
+    parser.add_argument("--cold", action="store_true", help="(--spawn) 응답 캐시 비활성화")
+    parser.add_argument("--only", default="", help="쉼표 구분 시나리오")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=5.0, help="시나리오별 측정 시간 (초)")
+    parser.add_argument("--warmup", type=float, default=1.0, help="시나리오별 워밍업 시간 (초, 집계 제외)")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", default=os.path.join("bench_results", f"{datetime.now():%Y%m%d-%H%M%S}.json"))
+    parser.add_argument("--compare", default="", help="비교할 이전 결과 JSON")
+    parser.add_argument("--threshold", type=float, default=0.2, help="회귀 판정 비율 (0.2 = 20%%)")
+    sys.exit(asyncio.run(main(parser.parse_args())))
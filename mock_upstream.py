@@ -0,0 +1,301 @@
+"""
+========================================================
+ 업스트림 대역 서버 (부하 테스트 / 오프라인 개발용)
+========================================================
+ app.py 가 호출하는 외부 API 를 한 프로세스에서 흉내낸다.
+    - data.go.kr   : ASOS 시간/일자료, 초단기실황, TAAS 사고유형별 통계 (페이지 처리 포함)
+    - 서울 citydata : 지역별 도로 소통 현황
+    - ITS          : CCTV 목록 (cctvurl 은 이 서버의 /cctv/{id}.jpg)
+    - VWorld       : 주소 ↔ 좌표, WMTS 타일
+    - Anthropic    : /v1/messages (stream=true 면 SSE)
+
+ 업스트림별 지연(ms) / 지터(ms) / 오류율 / 초당 요청 제한(초과 시 429)을 조정할 수 있다.
+    python mock_upstream.py --port 9000 --latency 80 --jitter 40 --error-rate 0.01
+    python mock_upstream.py --set seoul:latency=300,rate=20 --set anthropic:latency=600,token_ms=15
+
+ --fixtures DIR 에 <경로 이름>.json (asos_hourly, asos_daily, ultra_srt_ncst, taas, citydata, cctv, geocode,
+ reverse_geocode, messages) 이 있으면 합성 응답 대신 그 파일(녹화된 실제 응답)을 그대로 돌려준다.
+
+ app.py 연결: mock_env("http://127.0.0.1:9000") 의 환경변수로 실행 (bench.py --spawn 이 자동 처리)
+========================================================
+"""
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+import zlib
+from datetime import datetime, timedelta
+from email.utils import formatdate
+
+UPSTREAM_NAMES = ("datagokr", "seoul", "its", "vworld", "cctv", "anthropic")
+DEFAULT_PROFILE = {"latency": 50.0, "jitter": 20.0, "error_rate": 0.0, "rate": 0.0, "token_ms": 10.0}
+
+PROFILES = {name: dict(DEFAULT_PROFILE) for name in UPSTREAM_NAMES}
+FIXTURES_DIR = ""
+STATS = {name: {"requests": 0, "errors": 0, "rate_limited": 0} for name in UPSTREAM_NAMES}
+
+def mock_env(base_url: str) -> dict:
+    """app.py 를 이 서버로 연결하는 환경변수"""
+    return {"DATA_GO_KR_BASE_URL": base_url, "SEOUL_DATA_BASE_URL": base_url, "ITS_BASE_URL": base_url,
+            "VWORLD_BASE_URL": base_url, "ANTHROPIC_BASE_URL": base_url,
+            "DATA_GO_KR_KEY": "mock", "SEOUL_DATA_KEY": "mock", "ITS_CCTV_KEY": "mock", "VWORLD_API_KEY": "mock", "ANTHROPIC_API_KEY": "mock"}
+
+class TokenBucket:
+    """초당 rate 개 요청 허용 (순간 최대 rate 개)"""
+    def __init__(self):
+        self.tokens, self.updated = 0.0, time.monotonic()
+
+    def take(self, rate: float) -> bool:
+        if rate <= 0: return True
+        now = time.monotonic()
+        self.tokens = min(rate, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        if self.tokens < 1: return False
+        self.tokens -= 1
+        return True
+
+BUCKETS = {name: TokenBucket() for name in UPSTREAM_NAMES}
+
+async def gate(name: str):
+    """지연 + 요청 제한 + 오류 주입 - 오류 응답이면 Response, 정상이면 None"""
+    p = PROFILES[name]
+    STATS[name]["requests"] += 1
+    if not BUCKETS[name].take(p["rate"]):
+        STATS[name]["rate_limited"] += 1
+        return JSONResponse(status_code=429, content={"error": "rate limited"}, headers={"Retry-After": "1"})
+    await asyncio.sleep(max(0.0, random.gauss(p["latency"], p["jitter"])) / 1000)
+    if random.random() < p["error_rate"]:
+        STATS[name]["errors"] += 1
+        return JSONResponse(status_code=random.choice((500, 502, 503)), content={"error": "injected"})
+    return None
+
+def fixture(name: str):
+    path = os.path.join(FIXTURES_DIR, f"{name}.json") if FIXTURES_DIR else ""
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as f: return json.load(f)
+    return None
+
+def rng_for(*key) -> random.Random:
+    """같은 입력이면 같은 합성 값 (프로세스 간에도 동일)"""
+    return random.Random(zlib.crc32("|".join(map(str, key)).encode()))
+
+app = FastAPI(title="업스트림 대역 서버")
+
+# ---------- data.go.kr ----------
+def _datagokr_page(items: list, params) -> dict:
+    rows, page = int(params.get("numOfRows", 10)), int(params.get("pageNo", 1))
+    chunk = items[(page - 1) * rows: page * rows]
+    return {"response": {"header": {"resultCode": "00" if items else "03", "resultMsg": "NORMAL_SERVICE" if items else "NO_DATA"},
+                         "body": {"dataType": "JSON", "items": {"item": chunk} if chunk else "", "pageNo": page, "numOfRows": rows, "totalCount": len(items)}}}
+
+def _rain(stn, t: datetime, hourly: bool) -> float:
+    """여름철에 몰리는 지수분포 강수 (강수 확률 = 계절 가중)"""
+    r = rng_for(stn, t.isoformat())
+    season = 0.15 + 0.35 * max(0.0, 1 - abs(t.month - 7.5) / 4)
+    if r.random() > season: return 0.0
+    return round(r.expovariate(1 / (3.0 if hourly else 18.0)), 1)
+
+@app.get("/1360000/AsosHourlyInfoService/getWthrDataList")
+async def asos_hourly(request: Request):
+    if (err := await gate("datagokr")) is not None: return err
+    if (fx := fixture("asos_hourly")) is not None: return fx
+    q = request.query_params
+    t = datetime.strptime(q["startDt"] + q.get("startHh", "00"), "%Y%m%d%H")
+    end = min(datetime.strptime(q["endDt"] + q.get("endHh", "23"), "%Y%m%d%H"), datetime.now())
+    items = []
+    while t <= end:
+        rain = _rain(q.get("stnIds"), t, True)
+        r = rng_for(q.get("stnIds"), t.isoformat(), "ta")
+        items.append({"tm": t.strftime("%Y-%m-%d %H:%M"), "stnId": q.get("stnIds"), "ta": f"{r.uniform(-5, 30):.1f}",
+                      "rn": f"{rain:g}" if rain else "", "hm": str(r.randint(30, 95)), "ws": f"{r.uniform(0, 8):.1f}"})
+        t += timedelta(hours=1)
+    return _datagokr_page(items, q)
+
+@app.get("/1360000/VilageFcstInfoService_2.0/getUltraSrtNcst")
+async def ultra_srt_ncst(request: Request):
+    """초단기실황 - 격자(nx, ny) 정시 관측 (아직 발표 전 시각은 자료 없음)"""
+    if (err := await gate("datagokr")) is not None: return err
+    if (fx := fixture("ultra_srt_ncst")) is not None: return fx
+    q = request.query_params
+    t = datetime.strptime(q["base_date"] + q["base_time"][:2], "%Y%m%d%H")
+    if t > datetime.now() - timedelta(minutes=40): return _datagokr_page([], q)
+    grid = f"{q.get('nx')},{q.get('ny')}"
+    r = rng_for(grid, t.isoformat(), "ta")
+    values = {"RN1": f"{_rain(grid, t, True):g}", "T1H": f"{r.uniform(-5, 30):.1f}", "REH": str(r.randint(30, 95)), "WSD": f"{r.uniform(0, 8):.1f}"}
+    return _datagokr_page([{"baseDate": q["base_date"], "baseTime": q["base_time"], "category": k, "nx": q.get("nx"), "ny": q.get("ny"), "obsrValue": v}
+                           for k, v in values.items()], q)
+
+@app.get("/1360000/AsosDalyInfoService/getWthrDataList")
+async def asos_daily(request: Request):
+    if (err := await gate("datagokr")) is not None: return err
+    if (fx := fixture("asos_daily")) is not None: return fx
+    q = request.query_params
+    t, end = datetime.strptime(q["startDt"], "%Y%m%d"), min(datetime.strptime(q["endDt"], "%Y%m%d"), datetime.now())
+    items = []
+    while t <= end:
+        rain = _rain(q.get("stnIds"), t, False)
+        r = rng_for(q.get("stnIds"), t.isoformat(), "ta")
+        avg = r.uniform(-5, 28)
+        items.append({"tm": t.strftime("%Y-%m-%d"), "stnId": q.get("stnIds"), "avgTa": f"{avg:.1f}", "maxTa": f"{avg + 4:.1f}", "minTa": f"{avg - 4:.1f}",
+                      "sumRn": f"{rain:g}" if rain else "", "avgRhm": f"{r.uniform(30, 95):.1f}"})
+        t += timedelta(days=1)
+    return _datagokr_page(items, q)
+
+ACCIDENT_TYPES = ("차대사람-횡단중", "차대사람-기타", "차대차-정면충돌", "차대차-측면충돌", "차대차-추돌", "차대차-기타",
+                  "차량단독-공작물충돌", "차량단독-전도전복", "차량단독-기타", "철길건널목")
+
+@app.get("/B552061/AccidentDeath/getRestTrafficAccidentDeath")
+async def taas(request: Request):
+    if (err := await gate("datagokr")) is not None: return err
+    if (fx := fixture("taas")) is not None: return fx
+    q = request.query_params
+    items = []
+    for t in ACCIDENT_TYPES:
+        r = rng_for(q.get("siDo"), q.get("searchYearCd"), t)
+        n = r.randint(20, 900)
+        items.append({"acc_ty_nm": t, "occrrnc_cnt": n, "dth_dnv_cnt": r.randint(0, n // 40 + 1), "injpsn_cnt": int(n * r.uniform(1.1, 1.6))})
+    rows, page = int(q.get("numOfRows", 10)), int(q.get("pageNo", 1))
+    return {"resultCode": "00", "resultMsg": "NORMAL_CODE", "totalCount": len(items), "numOfRows": rows, "pageNo": page,
+            "items": {"item": items[(page - 1) * rows: page * rows]}}
+
+# ---------- 서울 citydata ----------
+@app.get("/{key}/json/citydata/{start}/{end}/{area}/")
+async def citydata(key: str, start: int, end: int, area: str):
+    if (err := await gate("seoul")) is not None: return err
+    if (fx := fixture("citydata")) is not None: return fx
+    r = rng_for(area, int(time.time() // 60))   # 1분마다 소통 상태가 바뀐다
+    roads = [{"ROAD_NM": f"{area}로{i + 1}", "START_ND_NM": "시점", "END_ND_NM": "종점", "SPD": str(r.randint(5, 70)),
+              "ROAD_TRAFFIC_IDX": "", "DIST": str(r.randint(200, 1500))} for i in range(r.randint(4, 12))]
+    return {"CITYDATA": {"AREA_NM": area, "ROAD_TRAFFIC_STTS": {"AVG_ROAD_DATA": {}, "ROAD_TRAFFIC_STTS": roads}},
+            "RESULT": {"RESULT.CODE": "INFO-000", "RESULT.MESSAGE": "정상 처리되었습니다"}}
+
+# ---------- ITS CCTV ----------
+CCTV_GRID = 0.01   # 약 1km 간격 가상 카메라
+CCTV_FRAME_BYTES = 40 * 1024
+
+@app.get("/cctvInfo")
+async def cctv_info(request: Request, minX: float, maxX: float, minY: float, maxY: float):
+    if (err := await gate("its")) is not None: return err
+    if (fx := fixture("cctv")) is not None: return fx
+    base = str(request.base_url).rstrip("/")
+    data = []
+    for i in range(int(minY / CCTV_GRID) + 1, int(maxY / CCTV_GRID) + 1):
+        for j in range(int(minX / CCTV_GRID) + 1, int(maxX / CCTV_GRID) + 1):
+            if rng_for("cctv", i, j).random() > 0.3: continue
+            cid = f"{i}_{j}"
+            data.append({"cctvname": f"가상CCTV {cid}", "coordy": f"{i * CCTV_GRID:.5f}", "coordx": f"{j * CCTV_GRID:.5f}",
+                         "cctvurl": f"{base}/cctv/{cid}.jpg", "cctvformat": "JPEG", "cctvtype": 1})
+    return {"response": {"coordtype": 1, "datacount": len(data), "data": data}}
+
+@app.get("/cctv/{cid}.jpg")
+async def cctv_frame(cid: str):
+    if (err := await gate("cctv")) is not None: return err
+    second = int(time.time())
+    body = b"\xff\xd8\xff\xe0" + hashlib.sha256(f"{cid}|{second}".encode()).digest() * (CCTV_FRAME_BYTES // 32) + b"\xff\xd9"
+    return Response(content=body, media_type="image/jpeg",
+                    headers={"Last-Modified": formatdate(second, usegmt=True)})
+
+# ---------- VWorld ----------
+@app.get("/req/address")
+async def vworld_address(request: Request):
+    if (err := await gate("vworld")) is not None: return err
+    q = request.query_params
+    if q.get("request") == "getaddr":
+        if (fx := fixture("reverse_geocode")) is not None: return fx
+        r = rng_for(q.get("point"))
+        return {"response": {"status": "OK", "result": [{"type": "road", "text": f"서울특별시 중구 가상로 {r.randint(1, 300)}",
+                                                          "structure": {"level1": "서울특별시", "level2": "중구"}}]}}
+    if (fx := fixture("geocode")) is not None: return fx
+    r = rng_for(q.get("address"))
+    return {"response": {"status": "OK", "input": {"address": q.get("address")},
+                         "result": {"crs": "EPSG:4326", "point": {"x": f"{r.uniform(126.8, 127.15):.6f}", "y": f"{r.uniform(37.45, 37.68):.6f}"}}}}
+
+TILE_PNG = bytes.fromhex("89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+                         "1f15c4890000000d49444154789c6360000002000154a24f5d0000000049454e44ae426082")
+
+@app.get("/req/wmts/1.0.0/{key}/{layer}/{z}/{y}/{x}.{ext}")
+async def vworld_tile(key: str, layer: str, z: int, y: int, x: int, ext: str):
+    if (err := await gate("vworld")) is not None: return err
+    return Response(content=TILE_PNG, media_type="image/jpeg" if ext == "jpeg" else "image/png")
+
+# ---------- Anthropic ----------
+def _message_text(payload: dict) -> str:
+    prompt = json.dumps(payload.get("messages", []), ensure_ascii=False)
+    r = rng_for(prompt)
+    words = ["배수성", "포장", "구간", "강우", "사고", "위험", "우선", "시공", "권장", "유지보수", "예산", "효과"]
+    return " ".join(r.choice(words) for _ in range(min(int(payload.get("max_tokens", 200)), 120)))
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/v1/messages")
+async def messages(request: Request):
+    if (err := await gate("anthropic")) is not None: return err
+    payload = await request.json()
+    if (fx := fixture("messages")) is not None and not payload.get("stream"): return fx
+    text = _message_text(payload)
+    msg = {"id": "msg_mock_" + hashlib.sha1(text.encode()).hexdigest()[:16], "type": "message", "role": "assistant",
+           "model": payload.get("model", "mock"), "content": [{"type": "text", "text": text}], "stop_reason": "end_turn",
+           "stop_sequence": None, "usage": {"input_tokens": len(json.dumps(payload)) // 4, "output_tokens": len(text.split())}}
+    if not payload.get("stream"): return msg
+
+    async def events():
+        yield _sse("message_start", {"type": "message_start", "message": {**msg, "content": [], "stop_reason": None, "usage": {**msg["usage"], "output_tokens": 1}}})
+        yield _sse("content_block_start", {"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}})
+        for word in text.split(" "):
+            await asyncio.sleep(PROFILES["anthropic"]["token_ms"] / 1000)
+            yield _sse("content_block_delta", {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": word + " "}})
+        yield _sse("content_block_stop", {"type": "content_block_stop", "index": 0})
+        yield _sse("message_delta", {"type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None}, "usage": {"output_tokens": msg["usage"]["output_tokens"]}})
+        yield _sse("message_stop", {"type": "message_stop"})
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+# ---------- 대역 서버 제어 ----------
+@app.get("/_mock/stats")
+async def mock_stats():
+    return {"profiles": PROFILES, "stats": STATS}
+
+@app.put("/_mock/profile/{name}")
+async def put_mock_profile(name: str, request: Request):
+    """실행 중 프로필 변경 - {"latency": 300, "error_rate": 0.1}"""
+    if name not in PROFILES: return JSONResponse(status_code=404, content={"error": f"알 수 없는 업스트림: {name}"})
+    body = await request.json()
+    PROFILES[name].update({k: float(v) for k, v in body.items() if k in DEFAULT_PROFILE})
+    return {"name": name, "profile": PROFILES[name]}
+
+def apply_settings(values: list):
+    """--set name:key=val,key=val (name=all 이면 전체)"""
+    for spec in values:
+        name, _, pairs = spec.partition(":")
+        targets = UPSTREAM_NAMES if name == "all" else [name]
+        for target in targets:
+            if target not in PROFILES: raise SystemExit(f"알 수 없는 업스트림: {target} ({', '.join(UPSTREAM_NAMES)})")
+            for pair in filter(None, pairs.split(",")):
+                k, _, v = pair.partition("=")
+                if k not in DEFAULT_PROFILE: raise SystemExit(f"알 수 없는 항목: {k} ({', '.join(DEFAULT_PROFILE)})")
+                PROFILES[target][k] = float(v)
+
+if __name__ == "__main__":
+    import argparse
+    import uvicorn
+    parser = argparse.ArgumentParser(prog="python mock_upstream.py")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency", type=float, default=DEFAULT_PROFILE["latency"], help="평균 지연 (ms)")
+    parser.add_argument("--jitter", type=float, default=DEFAULT_PROFILE["jitter"], help="지연 표준편차 (ms)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="5xx 주입 비율 (0~1)")
+    parser.add_argument("--rate", type=float, default=0.0, help="업스트림별 초당 요청 제한 (0=무제한)")
+    parser.add_argument("--set", action="append", default=[], metavar="NAME:KEY=VAL,...", help="업스트림별 설정 (예: seoul:latency=300,rate=20)")
+    parser.add_argument("--fixtures", default="", help="녹화 응답 디렉터리")
+    args = parser.parse_args()
+    apply_settings([f"all:latency={args.latency},jitter={args.jitter},error_rate={args.error_rate},rate={args.rate}"] + args.set)
+    FIXTURES_DIR = args.fixtures
+    print(f"업스트림 대역 서버 http://{args.host}:{args.port}")
+    for name, p in PROFILES.items(): print(f"  {name:<10} {p}")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")